@@ -4,6 +4,7 @@ from sqlalchemy import desc
 from app.db.session import get_db
 from app.db import models
 from app.api.auth import get_current_agent
+from app.engine.adversarial import duel_participants
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import datetime
@@ -114,6 +115,10 @@ async def submit_decision(
     if datetime.datetime.utcnow() > comp.lock_time:
         raise HTTPException(status_code=400, detail="Competition is locked")
 
+    # Duels only take decisions from their paired agents
+    if comp.scoring_type == "duel" and str(agent.id) not in duel_participants(comp.input_schema):
+        raise HTTPException(status_code=403, detail="You are not paired in this duel")
+
     # 3. Check Duplicate Submission
     existing = db.query(models.Submission).filter(
         models.Submission.competition_id == comp.id,
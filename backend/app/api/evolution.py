@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.db import models
+from app.engine.code_store import get_code_store
 from pydantic import BaseModel
 import shutil
 import os
@@ -81,119 +83,178 @@ async def claim_agent(agent_id: str, claim_token: str, db: Session = Depends(get
 
 @router.post("/submit")
 async def submit_agent(req: SubmitRequest, db: Session = Depends(get_db)):
+    from app.engine.lineage import record_birth
+    from app.engine.manifest_v1 import save_runtime, validate_manifest
     from app.engine.submission_auditor import SubmissionAuditor
-    
-    # 1. Validate agent and token (mock token check)
-    agent = db.query(models.Agent).filter(models.Agent.agent_id == req.agent_id).first()
-    
+
+    # 1. Validate agent and token (an active key of this agent)
+    agent = db.query(models.Agent).filter(models.Agent.id == req.agent_id).first()
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
-    
-    if not agent.is_claimed:
-        raise HTTPException(status_code=403, detail="Agent must be claimed by a human before submission.")
-
-    # Update manifest and status
-    agent.persona = req.manifest.get("description", agent.persona)
-    agent.manifest = req.manifest
-    agent.submission_status = "VALIDATING"
-    
-    db.commit()
+    key = db.query(models.AgentKey).filter(
+        models.AgentKey.agent_id == agent.id,
+        models.AgentKey.api_key == req.agent_token,
+        models.AgentKey.revoked_at == None
+    ).first()
+    if not key:
+        raise HTTPException(status_code=403, detail="Invalid or revoked agent token")
 
-    # 2. Save code temporarily for audit
-    agents_dir = os.path.join(os.getcwd(), "agents")
-    os.makedirs(agents_dir, exist_ok=True)
-    code_path = os.path.join(agents_dir, f"{req.agent_id}.py")
-    with open(code_path, "w") as f:
-        f.write(req.code)
-
-    # 3. Run Auditor
-    auditor = SubmissionAuditor(db)
-    passed, msg = auditor.audit_submission(req.agent_id, code_path, req.manifest)
-
-    if passed:
-        agent.submission_status = "APPROVED"
-        # Create a welcome post in the social feed
-        welcome_post = models.Post(
-            agent_id=req.agent_id,
-            content=f"Hello Arena! I am {req.agent_id}. Manifest: {req.manifest.get('description')}"
-        )
-        db.add(welcome_post)
-        db.commit()
-        return {"status": "success", "message": "Agent approved and active!"}
-    else:
-        agent.submission_status = "REJECTED"
-        db.commit()
-        # Clean up code if rejected? Or keep for debugging?
+    # 2. Audit the code before anything is stored
+    is_valid_manifest, manifest = validate_manifest(req.manifest)
+    if not is_valid_manifest:
+        return {"status": "rejected", "detail": f"Manifest Error: {manifest}"}
+    passed, msg = SubmissionAuditor(db).audit_code(req.code)
+    if not passed:
         return {"status": "rejected", "detail": msg}
 
+    # 3. Store it (content-addressed: identical code shares the blob and its verdict) and point the agent at it
+    store = get_code_store()
+    code_hash = store.assign(db, agent.id, req.code)
+    store.record_verdict(db, code_hash, True, msg)
+    runtime = save_runtime(db, agent.id, manifest)
+    agent.description = req.manifest.get("description", agent.description)
+    if db.query(models.AgentLineage.agent_id).filter(models.AgentLineage.agent_id == agent.id).first() is None:
+        record_birth(db, agent.id, None, "submission")
+
+    # Create a welcome post in the social feed
+    db.add(models.Post(
+        agent_id=agent.id,
+        content=f"Hello Arena! I am {agent.name}. Manifest: {req.manifest.get('description')}"
+    ))
+    db.commit()
+    return {"status": "success", "message": "Agent approved and active!", "code_hash": code_hash, **runtime}
+
 @router.post("/fork")
 async def fork_agent(req: ForkRequest, db: Session = Depends(get_db)):
+    from app.engine.lineage import record_birth
+    from app.engine.manifest_v1 import copy_runtime
+
     # 1. Fetch parent agent
-    parent = db.query(models.Agent).filter(models.Agent.agent_id == req.agent_id).first()
+    parent = db.query(models.Agent).filter(models.Agent.id == req.agent_id).first()
     if not parent:
         raise HTTPException(status_code=404, detail="Parent agent not found")
 
-    # 2. Create new agent ID
-    new_agent_id = f"{req.agent_id}_fork_{uuid.uuid4().hex[:4]}"
-    
-    # 3. Clone agent record
+    # 2. Clone agent record
     new_agent = models.Agent(
-        agent_id=new_agent_id,
-        owner_user=req.owner_user,
-        persona=f"Cloned from {req.agent_id}. Baseline status.",
-        trust_score=parent.trust_score * 0.9,
-        parent_agent_id=req.agent_id,
-        generation=parent.generation + 1
+        name=f"{parent.name}_fork_{uuid.uuid4().hex[:4]}",
+        description=f"Cloned from {parent.name} by {req.owner_user}. Baseline status."
     )
-    
-    # 4. Clone the file (In this MVP we assume the parent file exists in agents/ or we just mock it)
-    # For now, let's just commit the DB change.
-    
     db.add(new_agent)
+    db.flush()
+    lineage = record_birth(db, new_agent.id, parent.id, "fork")
+
+    # 3. Share the parent's strategy code (a reference to the same blob, nothing is copied)
+    get_code_store().link(db, new_agent.id, parent.id)
+    copy_runtime(db, new_agent.id, parent.id)
+
     db.commit()
-    db.refresh(new_agent)
     
     return {
         "status": "success",
-        "new_agent_id": new_agent_id,
+        "new_agent_id": str(new_agent.id),
         "parent_agent_id": req.agent_id,
-        "generation": new_agent.generation
+        "generation": lineage.generation
     }
 
 @router.post("/mutate")
 async def mutate_agent(req: MutateRequest, db: Session = Depends(get_db)):
+    from app.engine.lineage import generation_of
     from app.engine.mutation import MutationEngine
     engine = MutationEngine(db)
     
-    new_agent = engine.apply_mutation(req.agent_id, req.owner_user, req.mutated_code)
+    new_agent, msg = await engine.apply_mutation(req.agent_id, req.owner_user, req.mutated_code)
     if not new_agent:
-        raise HTTPException(status_code=400, detail="Mutation failed")
+        raise HTTPException(status_code=400, detail=f"Mutation failed: {msg}")
         
     return {
         "status": "success",
-        "new_agent_id": new_agent.agent_id,
+        "new_agent_id": str(new_agent.id),
         "parent_agent_id": req.agent_id,
-        "generation": new_agent.generation
+        "generation": generation_of(db, new_agent.id)
     }
 
+def _lineage_node(agent, generation, parent_id, depth=None):
+    node = {
+        "agent_id": str(agent.id),
+        "persona": agent.description,
+        "generation": generation or 0,
+        "parent_id": str(parent_id) if parent_id else None,
+        "created_at": agent.created_at
+    }
+    if depth is not None:
+        node["depth"] = depth
+    return node
+
 @router.get("/lineage/{agent_id}")
 async def get_lineage(agent_id: str, db: Session = Depends(get_db)):
-    # Recursively fetch lineage
-    lineage = []
-    curr_id = agent_id
-    while curr_id:
-        agent = db.query(models.Agent).filter(models.Agent.agent_id == curr_id).first()
-        if not agent:
-            break
-        lineage.append({
-            "agent_id": agent.agent_id,
-            "persona": agent.persona,
-            "generation": agent.generation,
-            "parent_id": agent.parent_agent_id,
-            "created_at": agent.created_at
-        })
-        curr_id = agent.parent_agent_id
-    return lineage
+    # Agent first, then its ancestors nearest first: one query over the lineage closure
+    rows = db.query(models.Agent, models.AgentLineage.generation, models.AgentLineage.parent_agent_id)\
+        .join(models.AgentAncestry, models.AgentAncestry.ancestor_id == models.Agent.id)\
+        .outerjoin(models.AgentLineage, models.AgentLineage.agent_id == models.Agent.id)\
+        .filter(models.AgentAncestry.descendant_id == agent_id)\
+        .order_by(models.AgentAncestry.depth)\
+        .all()
+    if not rows:
+        # Agents without lineage records are their own one-node lineage
+        agent = db.query(models.Agent).filter(models.Agent.id == agent_id).first()
+        return [_lineage_node(agent, 0, None)] if agent else []
+    return [_lineage_node(agent, generation, parent_id) for agent, generation, parent_id in rows]
+
+@router.get("/descendants/{agent_id}")
+async def get_descendants(agent_id: str, max_depth: int = None, db: Session = Depends(get_db)):
+    query = db.query(models.Agent, models.AgentLineage.generation, models.AgentLineage.parent_agent_id, models.AgentAncestry.depth)\
+        .join(models.AgentAncestry, models.AgentAncestry.descendant_id == models.Agent.id)\
+        .outerjoin(models.AgentLineage, models.AgentLineage.agent_id == models.Agent.id)\
+        .filter(models.AgentAncestry.ancestor_id == agent_id, models.AgentAncestry.depth > 0)
+    if max_depth is not None:
+        query = query.filter(models.AgentAncestry.depth <= max_depth)
+    rows = query.order_by(models.AgentAncestry.depth, models.Agent.created_at).all()
+    return [_lineage_node(agent, generation, parent_id, depth) for agent, generation, parent_id, depth in rows]
+
+@router.get("/family/{agent_id}/performance")
+async def get_family_performance(agent_id: str, db: Session = Depends(get_db)):
+    """Settled PnL and evolution fitness of an agent and all its descendants, per depth below it."""
+    Ancestry = models.AgentAncestry
+    family = select(Ancestry.descendant_id).where(Ancestry.ancestor_id == agent_id)
+    pnl = db.query(
+        models.LedgerEvent.agent_id.label("agent_id"),
+        func.sum(models.LedgerEvent.amount).label("pnl"),
+        func.count(models.LedgerEvent.id).label("settlements")
+    ).filter(models.LedgerEvent.event_type == "SETTLE", models.LedgerEvent.agent_id.in_(family))\
+        .group_by(models.LedgerEvent.agent_id).subquery()
+    rows = db.query(
+        Ancestry.depth,
+        func.count(Ancestry.descendant_id),
+        func.sum(pnl.c.pnl),
+        func.sum(pnl.c.settlements),
+        func.avg(models.AgentLineage.fitness),
+        func.max(models.AgentLineage.fitness)
+    ).outerjoin(pnl, pnl.c.agent_id == Ancestry.descendant_id)\
+        .outerjoin(models.AgentLineage, models.AgentLineage.agent_id == Ancestry.descendant_id)\
+        .filter(Ancestry.ancestor_id == agent_id)\
+        .group_by(Ancestry.depth).order_by(Ancestry.depth).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="No lineage recorded for this agent")
+
+    levels = [{
+        "depth": depth,
+        "members": members,
+        "total_pnl": float(total_pnl or 0.0),
+        "settlements": int(settlements or 0),
+        "avg_fitness": avg_fitness,
+        "best_fitness": best_fitness
+    } for depth, members, total_pnl, settlements, avg_fitness, best_fitness in rows]
+    fitness = [level["best_fitness"] for level in levels if level["best_fitness"] is not None]
+    return {
+        "agent_id": agent_id,
+        "members": sum(level["members"] for level in levels),
+        "max_depth": levels[-1]["depth"],
+        "total_pnl": sum(level["total_pnl"] for level in levels),
+        "settlements": sum(level["settlements"] for level in levels),
+        "best_fitness": max(fitness) if fitness else None,
+        "levels": levels
+    }
+
 @router.get("/ledger/{agent_id}")
 async def get_agent_ledger(agent_id: str, db: Session = Depends(get_db)):
     return db.query(models.LedgerEvent).filter(models.LedgerEvent.agent_id == agent_id)\
@@ -29,30 +29,49 @@ class LeaderboardResponse(BaseModel):
     rankings: List[RankingResponse]
 
 @router.get("/{competition_id}", response_model=LeaderboardResponse)
-async def get_leaderboard(competition_id: str, db: Session = Depends(get_db)):
-    snapshots = db.query(models.LeaderboardSnapshot)\
-        .filter(models.LeaderboardSnapshot.competition_id == competition_id)\
-        .order_by(models.LeaderboardSnapshot.pnl.desc())\
+async def get_leaderboard(competition_id: str, limit: int = 100, offset: int = 0, db: Session = Depends(get_db)):
+    """
+    Latest snapshot per agent, ranked by PnL.
+    Older snapshots are filtered out in SQL so the cost does not grow with the number of steps.
+    """
+    from sqlalchemy import func
+
+    Snapshot = models.LeaderboardSnapshot
+    latest = db.query(
+        Snapshot.id.label("id"),
+        func.row_number().over(
+            partition_by=Snapshot.agent_id,
+            order_by=(Snapshot.snapshot_at.desc(), Snapshot.id.desc())
+        ).label("rn")
+    ).filter(Snapshot.competition_id == competition_id).subquery()
+
+    # One query: latest rows joined to agent names, paginated
+    rows = db.query(Snapshot, models.Agent.name)\
+        .join(latest, latest.c.id == Snapshot.id)\
+        .outerjoin(models.Agent, models.Agent.id == Snapshot.agent_id)\
+        .filter(latest.c.rn == 1)\
+        .order_by(Snapshot.pnl.desc(), Snapshot.agent_id)\
+        .offset(offset)\
+        .limit(limit)\
         .all()
-    
-    # Enrich with names
+
     rankings = []
-    for s in snapshots:
-        agent = db.query(models.Agent).filter(models.Agent.id == s.agent_id).first()
+    for s, agent_name in rows:
         rankings.append({
             "agent_id": str(s.agent_id),
-            "agent_name": agent.name if agent else "Unknown",
-            "pnl": s.pnl,
-            "win_rate": s.win_rate,
+            "agent_name": agent_name or "Unknown",
+            "pnl": s.pnl or 0.0,
+            "win_rate": s.win_rate or 0.0,
             "competitions": 1, # Specific to this snapshot
-            "sharpe": s.sharpe,
-            "max_dd": s.max_dd,
-            "volatility": s.volatility,
-            "trust_score": s.trust_score
+            "sharpe": s.sharpe or 0.0,
+            "max_dd": s.max_dd or 0.0,
+            "volatility": s.volatility or 0.0,
+            "trust_score": (s.metrics or {}).get("trust_score", 0.5)
         })
 
-    last_snapshot_at = snapshots[0].snapshot_at if snapshots else datetime.datetime.utcnow()
-    
+    last_snapshot_at = db.query(func.max(Snapshot.snapshot_at))\
+        .filter(Snapshot.competition_id == competition_id).scalar() or datetime.datetime.utcnow()
+
     return {
         "competition_id": competition_id,
         "snapshot_at": last_snapshot_at,
@@ -82,13 +101,15 @@ async def get_agent_stats(agent_id: str, db: Session = Depends(get_db)):
     ).order_by(models.Post.timestamp.desc()).limit(5).all()
     
     # competitions = db.query(models.AgentAccount).filter(models.AgentAccount.agent_id == agent_id).all()
+
+    reputation = db.query(models.AgentReputation.trust_score).filter(models.AgentReputation.agent_id == agent_id).scalar()
     
     return {
         "agent": {
             "id": str(agent.id),
             "name": agent.name,
             "persona": agent.description or "A competitive AI agent.",
-            "trust_score": 0.5,
+            "trust_score": reputation if reputation is not None else 0.5,
             "is_active": agent.is_active
         },
         "metrics": {
@@ -149,3 +170,37 @@ async def get_global_leaderboard(db: Session = Depends(get_db)):
         })
     
     return sorted(leaderboard, key=lambda x: x["pnl"], reverse=True)
+
+class RatingResponse(BaseModel):
+    agent_id: str
+    agent_name: str
+    rating: float
+    rd: float
+    conservative_rating: float
+    games: int
+
+@router.get("/global/ratings", response_model=List[RatingResponse])
+async def get_rating_leaderboard(limit: int = 100, offset: int = 0, db: Session = Depends(get_db)):
+    """
+    Agents ranked by Glicko-2 rating, read straight from agent_ratings.
+    Ordered by the conservative rating (rating - 2 RD) so agents with few games don't top the table.
+    Stored RDs include idle periods up to the scheduler's last RatingService.age_idle pass.
+    """
+    Rating = models.AgentRating
+    rows = db.query(Rating, models.Agent.name)\
+        .outerjoin(models.Agent, models.Agent.id == Rating.agent_id)\
+        .order_by((Rating.rating - 2 * Rating.rd).desc(), Rating.agent_id)\
+        .offset(offset)\
+        .limit(limit)\
+        .all()
+    return [
+        {
+            "agent_id": str(r.agent_id),
+            "agent_name": name or "Unknown",
+            "rating": r.rating,
+            "rd": r.rd,
+            "conservative_rating": r.rating - 2 * r.rd,
+            "games": r.games or 0
+        }
+        for r, name in rows
+    ]
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from app.engine.telemetry import all_competition_telemetry, get_competition_telemetry, render_prometheus
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Per-agent decision telemetry for every tracked competition, in Prometheus text format."""
+    return PlainTextResponse(render_prometheus(all_competition_telemetry()), media_type="text/plain; version=0.0.4")
+
+@router.get("/competitions")
+async def list_competition_telemetry():
+    return [
+        {"competition_id": t.competition_id, "step": t.step, "agents": len(t.agents)}
+        for t in all_competition_telemetry()
+    ]
+
+@router.get("/competitions/{competition_id}")
+async def get_competition_telemetry_report(competition_id: str, sort_by: str = "p95"):
+    """
+    Per-agent latency histogram, outcomes (ok/timeout/crash/error), CPU, peak RSS, bytes in/out and throttle state.
+    Agents are ordered slowest first by `sort_by` (p50, p95, p99, mean or max).
+    """
+    telemetry = get_competition_telemetry(competition_id, create=False)
+    if telemetry is None:
+        raise HTTPException(status_code=404, detail="No telemetry for this competition")
+    report = telemetry.to_dict()
+    report["agents"] = [
+        {"agent_id": agent_id, **stats}
+        for agent_id, stats in sorted(
+            report["agents"].items(),
+            key=lambda item: item[1]["latency"].get(sort_by) or 0.0,
+            reverse=True
+        )
+    ]
+    return report
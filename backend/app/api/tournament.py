@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.db.session import get_db
+from app.db.session import SessionLocal, get_db
 from app.db import models
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
 import datetime
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -26,3 +31,94 @@ async def create_tournament(name: str, db: Session = Depends(get_db)):
     db.commit()
     db.refresh(tournament)
     return tournament
+
+class RunTournamentRequest(BaseModel):
+    agent_ids: Optional[List[uuid.UUID]] = None # defaults to every active agent
+    workers: Optional[int] = None
+
+def _play_bracket(tournament_id: int, agent_ids: List[str], workers: Optional[int]):
+    """Background run of a queued bracket, with its own session and worker pool."""
+    from app.engine.agent_pool import AgentWorkerPool
+    from app.engine.bracket import BracketEngine, PoolDecider
+
+    db = SessionLocal()
+    pool = None
+    try:
+        tournament = db.query(models.Tournament).filter(models.Tournament.id == tournament_id).first()
+        # The server is multi-threaded: workers come from a fork server, not a fork of this process
+        pool = AgentWorkerPool(num_workers=workers, start_method="forkserver")
+        champion = asyncio.run(BracketEngine(db, PoolDecider(pool, db)).run(tournament, agent_ids))
+        logger.info(f"Tournament {tournament_id} completed, champion {champion}")
+    except Exception as e:
+        logger.error(f"Tournament {tournament_id} failed: {e}")
+        db.rollback()
+        db.query(models.Tournament).filter(models.Tournament.id == tournament_id, models.Tournament.status == "QUEUED")\
+            .update({"status": "FAILED"})
+        db.commit()
+    finally:
+        if pool is not None:
+            pool.close()
+        db.close()
+
+@router.post("/{tournament_id}/run", status_code=202)
+async def run_tournament(tournament_id: int, background_tasks: BackgroundTasks, req: RunTournamentRequest = None,
+                         db: Session = Depends(get_db)):
+    """
+    Queues a single-elimination bracket (each round's duels decided in parallel) and returns at once.
+    The bracket plays in the background; follow it through the tournament status and its brackets.
+    """
+    from app.engine.bracket import RUN_ONCE_STATUSES
+
+    tournament = db.query(models.Tournament).filter(models.Tournament.id == tournament_id).first()
+    if not tournament:
+        raise HTTPException(status_code=404, detail="Tournament not found")
+    if tournament.status in RUN_ONCE_STATUSES + ("QUEUED",):
+        raise HTTPException(status_code=409, detail=f"Tournament is {tournament.status}")
+
+    req = req or RunTournamentRequest()
+    if req.agent_ids:
+        agent_ids = [str(agent_id) for agent_id in req.agent_ids]
+    else:
+        agent_ids = [str(a.id) for a in db.query(models.Agent.id).filter(models.Agent.is_active == True).all()]
+    if not agent_ids:
+        raise HTTPException(status_code=422, detail="No entrants")
+    tournament.status = "QUEUED"
+    db.commit()
+    background_tasks.add_task(_play_bracket, tournament_id, agent_ids, req.workers)
+    return {"tournament_id": tournament_id, "status": tournament.status, "entrants": len(agent_ids)}
+
+class RunLeagueRequest(BaseModel):
+    agent_ids: Optional[List[str]] = None # defaults to every active agent
+    format: str = "swiss" # swiss | round_robin
+    rounds: Optional[int] = None # defaults to ceil(log2 n) for swiss, a full cycle for round robin
+    paths_per_round: int = 4
+    workers: Optional[int] = None
+    top: int = 100
+
+@router.post("/{tournament_id}/league")
+async def run_league(tournament_id: int, req: RunLeagueRequest, db: Session = Depends(get_db)):
+    """Plays a round-robin or Swiss league and returns the final standings with tiebreaks."""
+    from app.engine.agent_pool import AgentWorkerPool
+    from app.engine.bracket import PoolDecider, RUN_ONCE_STATUSES
+    from app.engine.league import LeagueEngine
+
+    tournament = db.query(models.Tournament).filter(models.Tournament.id == tournament_id).first()
+    if not tournament:
+        raise HTTPException(status_code=404, detail="Tournament not found")
+    if tournament.status in RUN_ONCE_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Tournament is {tournament.status}")
+    if req.format not in ("swiss", "round_robin"):
+        raise HTTPException(status_code=400, detail=f"Unknown league format: {req.format}")
+
+    agent_ids = req.agent_ids or [str(a.id) for a in db.query(models.Agent.id).filter(models.Agent.is_active == True).all()]
+    pool = AgentWorkerPool(num_workers=req.workers)
+    try:
+        engine = LeagueEngine(db, PoolDecider(pool, db), format=req.format, paths_per_round=req.paths_per_round)
+        table = await engine.run(tournament, agent_ids, rounds=req.rounds)
+    finally:
+        pool.close()
+    return {
+        "tournament_id": tournament_id,
+        "status": tournament.status,
+        "standings": table.standings().head(req.top).to_dict(orient="records")
+    }
@@ -1,6 +1,6 @@
 import datetime
 import uuid
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Boolean, text, Numeric, UniqueConstraint, TypeDecorator
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Boolean, text, Numeric, UniqueConstraint, Index, TypeDecorator
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID, JSONB
 from sqlalchemy.orm import relationship
 from app.db.session import Base, DATABASE_URL
@@ -132,6 +132,91 @@ class Score(Base):
     competition = relationship("Competition", back_populates="scores")
     agent = relationship("Agent", back_populates="scores")
 
+class OraclePrice(Base):
+    __tablename__ = "oracle_prices"
+
+    id = Column(Integer, primary_key=True, index=True)
+    market = Column(String, nullable=False) # e.g. BTC-USDT
+    captured_for = Column(DateTime, nullable=False) # Reference instant (start/lock/settle time)
+    price = Column(Float, nullable=False)
+    source = Column(String)
+    captured_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('market', 'captured_for', name='unique_oracle_price'),
+    )
+
+class AgentRating(Base):
+    __tablename__ = "agent_ratings"
+
+    agent_id = Column(GUID(), ForeignKey("agents.id"), primary_key=True)
+    # Glicko-2 state on the Glicko scale (see app/engine/ratings.py)
+    rating = Column(Float, nullable=False, default=1500.0)
+    rd = Column(Float, nullable=False, default=350.0)
+    volatility = Column(Float, nullable=False, default=0.06)
+    games = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        # Serves rating-ordered rankings and matchmaking windows
+        Index('ix_agent_rating_rating', 'rating'),
+        # Idle rows for RatingService.age_idle
+        Index('ix_agent_rating_updated_at', 'updated_at'),
+    )
+
+class AgentReputation(Base):
+    __tablename__ = "agent_reputation"
+
+    agent_id = Column(GUID(), ForeignKey("agents.id"), primary_key=True)
+    trust_score = Column(Float, nullable=False, default=0.5)
+    snapshot_count = Column(Integer, nullable=False, default=0) # snapshots in the 30-day window
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class AgentLineage(Base):
+    __tablename__ = "agent_lineage"
+
+    agent_id = Column(GUID(), ForeignKey("agents.id"), primary_key=True)
+    parent_agent_id = Column(GUID(), ForeignKey("agents.id"), nullable=True, index=True)
+    generation = Column(Integer, nullable=False, default=0)
+    origin = Column(String, nullable=False, default="submission") # submission | fork | mutation
+    fitness = Column(Float, nullable=True) # latest evolution fitness (mean backtest return %)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class AgentAncestry(Base): # Lineage closure: every (ancestor, descendant) pair, plus each agent with itself at depth 0
+    __tablename__ = "agent_ancestry"
+
+    ancestor_id = Column(GUID(), ForeignKey("agents.id"), primary_key=True)
+    descendant_id = Column(GUID(), ForeignKey("agents.id"), primary_key=True)
+    depth = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # Ancestry of one agent, nearest first (the primary key serves descendant lookups)
+        Index('ix_agent_ancestry_descendant_depth', 'descendant_id', 'depth'),
+    )
+
+class AgentCode(Base):
+    __tablename__ = "agent_code"
+
+    agent_id = Column(GUID(), ForeignKey("agents.id"), primary_key=True)
+    code_hash = Column(String(64), nullable=False, index=True) # sha256 of the strategy blob in the code store
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class StrategyAudit(Base):
+    __tablename__ = "strategy_audits"
+
+    code_hash = Column(String(64), primary_key=True) # code store blob; identical code shares one verdict
+    passed = Column(Boolean, nullable=False)
+    message = Column(String, nullable=True)
+    audited_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class AgentRuntime(Base):
+    __tablename__ = "agent_runtime"
+
+    agent_id = Column(GUID(), ForeignKey("agents.id"), primary_key=True)
+    wire_format = Column(String, nullable=False, default="json") # negotiated from the manifest's wire_formats
+    shared_memory = Column(Boolean, nullable=False, default=False) # manifest lists OHLCV_SHM in capabilities.market_data
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
 class Post(Base):
     __tablename__ = "posts"
 
@@ -175,6 +260,11 @@ class LeaderboardSnapshot(Base): # Replaced by Score + Dynamic queries
     sharpe = Column(Float)
     volatility = Column(Float)
 
+    __table_args__ = (
+        # Serves the latest-snapshot-per-agent leaderboard query
+        Index('ix_snapshot_comp_agent_time', 'competition_id', 'agent_id', 'snapshot_at'),
+    )
+
 class DuelResult(Base):
     __tablename__ = "duel_results"
     id = Column(Integer, primary_key=True, index=True)
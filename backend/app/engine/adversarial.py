@@ -1,7 +1,32 @@
+from typing import Iterable, List, NamedTuple, Optional, Set, Tuple
 from sqlalchemy.orm import Session
 from app.db import models
 from app.db.ledger import add_ledger_entry
 from app.engine.announcer import DuelAnnouncer
+from app.engine.settlement import decision_stake, directional_pnl
+from app.engine.ratings import RatingService
+
+DUEL_EQUITY = 10000.0 # account equity that order sizes in duel decisions are fractions of
+
+def duel_pairs(input_schema: Optional[dict]) -> List[Tuple[str, str]]:
+    """
+    Pairings of a duel competition. A duel round holds every pairing scheduled in one matchmaking pass
+    ("duel": {"pairs": [[a, b], ...]}); single-pair duels from before rounds store "duel": {"agents": [a, b]}.
+    """
+    duel = (input_schema or {}).get("duel", {})
+    pairs = duel.get("pairs") or ([duel["agents"]] if len(duel.get("agents", [])) == 2 else [])
+    return [(str(a), str(b)) for a, b in pairs]
+
+def duel_participants(input_schema: Optional[dict]) -> Set[str]:
+    """Agents allowed to submit to a duel competition."""
+    return {agent for pair in duel_pairs(input_schema) for agent in pair}
+
+class DuelOutcome(NamedTuple):
+    winner_id: str
+    loser_id: str
+    pnl_differential: float
+    pnl_a: float
+    pnl_b: float
 
 class AdversarialEngine:
     def __init__(self, db: Session):
@@ -29,17 +54,8 @@ class AdversarialEngine:
             print(f"Missing decisions for duel {competition_id}.")
             return
 
-        pnl_a = self._calculate_pnl(dec_a.decision_payload, price_start, price_end)
-        pnl_b = self._calculate_pnl(dec_b.decision_payload, price_start, price_end)
-
-        # In a zero-sum duel, the 'Pool' is fixed. 
-        # Winner is whoever had higher PnL (even if both negative)
-        if pnl_a > pnl_b:
-            winner_id, loser_id = agent_a_id, agent_b_id
-            diff = pnl_a - pnl_b
-        else:
-            winner_id, loser_id = agent_b_id, agent_a_id
-            diff = pnl_b - pnl_a
+        outcome = self.evaluate_duel(agent_a_id, dec_a.decision_payload, agent_b_id, dec_b.decision_payload, price_start, price_end)
+        winner_id, loser_id, diff = outcome.winner_id, outcome.loser_id, outcome.pnl_differential
 
         # 1. SETTLE Transfer (Winner gets bonus, Loser pays penalty)
         # This is on top of their individual market PnL if we combine them,
@@ -50,13 +66,7 @@ class AdversarialEngine:
         add_ledger_entry(self.db, loser_id, competition_id, "SETTLE", -bonus)
 
         # 2. Record Duel Result
-        duel_res = models.DuelResult(
-            competition_id=competition_id,
-            winner_id=winner_id,
-            loser_id=loser_id,
-            pnl_differential=diff
-        )
-        self.db.add(duel_res)
+        self.record_duel_results(competition_id, [outcome])
         
         comp.status = "SETTLED"
         
@@ -67,11 +77,33 @@ class AdversarialEngine:
         self.db.commit()
         print(f"Duel Settled! Winner: {winner_id}, Bonus: {bonus:.2f}")
 
-    def _calculate_pnl(self, payload, price_start, price_end):
-        action = payload.get("action", "WAIT")
-        stake = payload.get("stake", 0)
-        if action == "OPEN_LONG":
-            return stake * (price_end - price_start) / price_start
-        elif action == "OPEN_SHORT":
-            return stake * (price_start - price_end) / price_start
-        return 0.0
+    def evaluate_duel(self, agent_a_id, payload_a: dict, agent_b_id, payload_b: dict, price_start: float, price_end: float,
+                      a_wins_ties: bool = False, equity: float = DUEL_EQUITY) -> DuelOutcome:
+        """
+        Winner is whoever had the higher PnL over the same price move (even if both negative).
+        Decisions are normalized by decision_stake, so BUY/SELL orders sized against `equity` score
+        like OPEN_LONG/OPEN_SHORT stakes. Ties go to agent B unless `a_wins_ties`.
+        """
+        pnl_a = self._calculate_pnl(payload_a, price_start, price_end, equity)
+        pnl_b = self._calculate_pnl(payload_b, price_start, price_end, equity)
+        if pnl_a > pnl_b or (a_wins_ties and pnl_a == pnl_b):
+            return DuelOutcome(agent_a_id, agent_b_id, pnl_a - pnl_b, pnl_a, pnl_b)
+        return DuelOutcome(agent_b_id, agent_a_id, pnl_b - pnl_a, pnl_a, pnl_b)
+
+    def record_duel_results(self, competition_id: str, outcomes: Iterable[DuelOutcome]):
+        """Stage DuelResult rows for many duels at once and update both sides' ratings; the caller commits."""
+        outcomes = list(outcomes)
+        self.db.add_all([
+            models.DuelResult(
+                competition_id=competition_id,
+                winner_id=o.winner_id,
+                loser_id=o.loser_id,
+                pnl_differential=o.pnl_differential
+            )
+            for o in outcomes
+        ])
+        RatingService(self.db).record_duels(outcomes)
+
+    def _calculate_pnl(self, payload, price_start, price_end, equity: float = DUEL_EQUITY):
+        direction, stake = decision_stake(payload or {}, equity)
+        return directional_pnl(direction, stake, price_start, price_end)
@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import marshal
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional
+from app.engine.code_safety import analyze
+from app.engine.code_store import get_code_store
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DECISION = {"action": "HOLD", "symbol": "BTCUSDT", "size": 0}
+# Entrypoints in order of precedence: on_tick(tick), or decide/on_data(context, market_data)
+ENTRYPOINTS = ("on_tick", "decide", "on_data")
+RELOAD_TIMEOUT = 5.0 # seconds a respawned worker gets to reload each agent
+
+class DecisionTimeout(Exception):
+    pass
+
+def _on_alarm(signum, frame):
+    raise DecisionTimeout()
+
+def _decide_args(tick: dict):
+    """Adapts a platform tick to the `decide(context, market_data)` convention."""
+    account = tick.get("account", {})
+    context = {**account, "balance": account.get("cash", 0)}
+    market = tick.get("market") or tick.get("market_snapshot") or {}
+    market_data = dict(market)
+    if "price" not in market_data and market.get("ohlcv"):
+        market_data["price"] = market["ohlcv"][-1][4]
+    return context, market_data
+
+def _worker_main(conn, call_timeout: float, memory_limit_mb: Optional[int]):
+    """
+    Worker loop. Hosts many agents, each in its own module namespace.
+    Messages: ("load", agent_id, bytecode) | ("unload", agent_id) | ("batch", [(agent_id, tick), ...]) | ("stop",)
+    with bytecode marshalled by the parent (CodeStore.bytecode).
+    """
+    if HAS_RESOURCE and memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    signal.signal(signal.SIGALRM, _on_alarm)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    entrypoints = {}
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            return
+        kind = msg[0]
+
+        if kind == "stop":
+            return
+        elif kind == "load":
+            _, agent_id, bytecode = msg
+            namespace = {"__name__": f"agent_{agent_id}"}
+            try:
+                exec(marshal.loads(bytecode), namespace)
+                style = next((name for name in ENTRYPOINTS if callable(namespace.get(name))), None)
+                if style is None:
+                    raise ValueError("Missing 'decide', 'on_tick' or 'on_data' entrypoint.")
+                entrypoints[agent_id] = (style, namespace[style])
+                conn.send((True, None))
+            except BaseException as e:
+                conn.send((False, f"{type(e).__name__}: {e}"))
+        elif kind == "unload":
+            entrypoints.pop(msg[1], None)
+        elif kind == "batch":
+            results = []
+            for agent_id, tick in msg[1]:
+                started_wall, started_cpu = time.perf_counter(), time.process_time()
+                try:
+                    style, fn = entrypoints[agent_id]
+                    signal.setitimer(signal.ITIMER_REAL, call_timeout)
+                    try:
+                        decision = fn(tick) if style == "on_tick" else fn(*_decide_args(tick))
+                    finally:
+                        signal.setitimer(signal.ITIMER_REAL, 0)
+                    error = None if isinstance(decision, dict) else f"Invalid decision type: {type(decision).__name__}"
+                    outcome = "ok" if error is None else "error"
+                except DecisionTimeout:
+                    decision, error, outcome = None, f"Timeout after {call_timeout}s", "timeout"
+                except BaseException as e:
+                    decision, error, outcome = None, "".join(traceback.format_exception_only(type(e), e)).strip(), "crash"
+                results.append({
+                    "decision": decision if error is None else None,
+                    "error": error,
+                    "outcome": outcome,
+                    "latency": time.perf_counter() - started_wall,
+                    "cpu_time": time.process_time() - started_cpu,
+                    # Worker-wide peak: agents sharing a worker share its address space
+                    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if HAS_RESOURCE else None
+                })
+            conn.send(results)
+
+class _Worker:
+    def __init__(self, ctx, index: int, call_timeout: float, memory_limit_mb: Optional[int]):
+        self.index = index
+        self.agents: Dict[str, bytes] = {} # agent_id -> bytecode, replayed on respawn
+        self.pending = []
+        self.flush_scheduled = False
+        self.lock = asyncio.Lock()
+        self.conn_lock = threading.Lock() # load() on the loop vs spawn() in a thread
+        self._ctx = ctx
+        self._args = (call_timeout, memory_limit_mb)
+        self.spawn()
+
+    def spawn(self):
+        with self.conn_lock:
+            self._spawn()
+
+    def _spawn(self):
+        self.conn, child_conn = self._ctx.Pipe()
+        self.process = self._ctx.Process(target=_worker_main, args=(child_conn, *self._args), daemon=True)
+        self.process.start()
+        child_conn.close()
+        for agent_id, bytecode in self.agents.items():
+            self.conn.send(("load", agent_id, bytecode))
+            if not self.conn.poll(RELOAD_TIMEOUT):
+                logger.error(f"Agent worker {self.index} did not reload {agent_id} within {RELOAD_TIMEOUT}s")
+                return
+            self.conn.recv()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+class AgentWorkerPool:
+    """
+    Pre-forked worker processes that host audited Python strategies in-process.
+    Each worker serves many agents, so interpreter startup and imports are paid once per worker
+    and the decisions for all of a worker's agents in a tick travel in one IPC round trip.
+    Limits: `call_timeout` per decision (SIGALRM inside the worker) and `memory_limit_mb` (RLIMIT_AS).
+    A worker that hangs past its batch deadline or dies is killed and respawned with its agents reloaded.
+    Workers are forked by default; pass start_method="forkserver" (or "spawn") from multi-threaded processes
+    such as the API server, where forking the process itself is unsafe.
+    """
+    def __init__(self, num_workers: int = None, call_timeout: float = 0.1, memory_limit_mb: Optional[int] = 1024,
+                 start_method: str = None):
+        methods = multiprocessing.get_all_start_methods()
+        method = start_method if start_method in methods else "fork" if "fork" in methods else "spawn"
+        self._ctx = multiprocessing.get_context(method)
+        self.call_timeout = call_timeout
+        self.workers: List[_Worker] = [
+            _Worker(self._ctx, i, call_timeout, memory_limit_mb) for i in range(num_workers or os.cpu_count() or 1)
+        ]
+        self.assignment: Dict[str, _Worker] = {}
+
+    def load(self, agent_id: str, code: str):
+        """
+        Load an agent's code into the least-loaded worker. Code that fails the static safety audit
+        (code_safety.analyze, cached by code hash) is refused here, whatever the caller checked.
+        Code is compiled through the code store, so identical strategies compile once per process.
+        """
+        report = analyze(code)
+        if not report.ok:
+            return False, f"Security Audit Failed: {report.message}"
+        try:
+            bytecode = get_code_store().bytecode(code)
+        except (SyntaxError, ValueError) as e:
+            return False, f"{type(e).__name__}: {e}"
+        worker = self.assignment.get(agent_id) or min(self.workers, key=lambda w: len(w.agents))
+        with worker.conn_lock:
+            worker.conn.send(("load", agent_id, bytecode))
+            ok, err = worker.conn.recv()
+        if ok:
+            worker.agents[agent_id] = bytecode
+            self.assignment[agent_id] = worker
+        return ok, err
+
+    def load_audited(self, auditor, agent_id: str, code_path: str, manifest_data: dict):
+        """Runs SubmissionAuditor.audit_submission and loads the agent only if it passes."""
+        passed, msg = auditor.audit_submission(agent_id, code_path, manifest_data)
+        if not passed:
+            return False, msg
+        with open(code_path, "r") as f:
+            return self.load(agent_id, f.read())
+
+    def unload(self, agent_id: str):
+        worker = self.assignment.pop(agent_id, None)
+        if worker:
+            worker.agents.pop(agent_id, None)
+            worker.conn.send(("unload", agent_id))
+
+    def __contains__(self, agent_id: str):
+        return agent_id in self.assignment
+
+    async def decide(self, agent_id: str, tick: dict) -> dict:
+        """
+        Decision for one agent. Concurrent calls in the same loop iteration are batched per worker.
+        Returns {"decision", "error", "outcome", "latency", "cpu_time", "max_rss_kb"},
+        outcome being one of "ok", "timeout", "crash" or "error".
+        """
+        worker = self.assignment[agent_id]
+        future = asyncio.get_running_loop().create_future()
+        worker.pending.append((agent_id, tick, future))
+        if not worker.flush_scheduled:
+            worker.flush_scheduled = True
+            asyncio.get_running_loop().call_soon(lambda: asyncio.ensure_future(self._flush(worker)))
+        return await future
+
+    async def _flush(self, worker: _Worker):
+        async with worker.lock:
+            batch, worker.pending, worker.flush_scheduled = worker.pending, [], False
+            if not batch:
+                return
+            deadline = self.call_timeout * len(batch) + 1.0
+            try:
+                worker.conn.send(("batch", [(agent_id, tick) for agent_id, tick, _ in batch]))
+                ready = await asyncio.to_thread(worker.conn.poll, deadline)
+                if not ready:
+                    raise TimeoutError(f"Worker {worker.index} exceeded {deadline:.2f}s batch deadline")
+                results = worker.conn.recv()
+            except Exception as e:
+                logger.error(f"Agent worker {worker.index} failed: {e}. Respawning.")
+                worker.kill()
+                # Respawning replays every agent's load and waits on each reply: keep it off the event loop
+                await asyncio.to_thread(worker.spawn)
+                outcome = "timeout" if isinstance(e, TimeoutError) else "crash"
+                results = [{"decision": None, "error": f"Worker failure: {e}", "outcome": outcome,
+                            "latency": None, "cpu_time": None, "max_rss_kb": None}] * len(batch)
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def close(self):
+        for worker in self.workers:
+            try:
+                worker.conn.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+            worker.process.join(timeout=1)
+            worker.kill()
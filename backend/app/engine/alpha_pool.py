@@ -1,5 +1,6 @@
 from app.db import models
 from app.db.ledger import add_ledger_entry
+from app.engine.settlement import directional_pnl
 from sqlalchemy.orm import Session
 import datetime
 
@@ -29,11 +30,7 @@ class AlphaPoolEngine:
             action = payload.get("action", "WAIT")
             stake = payload.get("stake", 0)
             
-            pnl = 0.0
-            if action == "OPEN_LONG":
-                pnl = stake * (price_end - price_start) / price_start
-            elif action == "OPEN_SHORT":
-                pnl = stake * (price_start - price_end) / price_start
+            pnl = directional_pnl(action, stake, price_start, price_end)
             
             # Apply fees (mock 0.1% fee)
             fee = stake * comp.rules.get("fee_rate", 0.001)
@@ -21,14 +21,6 @@ class DuelAnnouncer:
         )
         self.db.add(post)
         
-        # Nudge TrustScores
-        winner = self.db.query(models.Agent).filter(models.Agent.agent_id == winner_id).first()
-        loser = self.db.query(models.Agent).filter(models.Agent.agent_id == loser_id).first()
-        
-        if winner:
-            winner.trust_score = min(1.0, winner.trust_score + 0.05)
-        if loser:
-            loser.trust_score = max(0.0, loser.trust_score - 0.03)
-            
+        # Skill changes are tracked by the Glicko-2 ratings updated at settlement (app/engine/ratings.py)
         self.db.commit()
         print(f"Duel Result Announced: {competition_id}")
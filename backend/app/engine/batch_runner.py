@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, NamedTuple, Optional
+import pandas as pd
+from app.engine.data_service import DataService
+from app.engine.deadline import DeadlinePolicy
+from app.engine.market_history import BAR_FIELDS
+from app.engine.shared_market import SharedMarketBuffer, attach
+
+logger = logging.getLogger(__name__)
+
+INITIAL_CASH = 100000.0 # MatchingEngine default
+
+class BacktestJob(NamedTuple):
+    competition_id: str
+    agents: list # CompetitionExecutor agent dicts
+    seed: Optional[int] = None
+    days: int = 5
+    interval: str = "1h"
+    model: str = "gbm"
+    market_params: Optional[dict] = None # extra DataService model parameters
+    deadline: Optional[dict] = None # DeadlinePolicy keyword arguments
+    pooled: bool = False # host the agents' audited code_hash blobs in an AgentWorkerPool instead of a process per tick
+
+    def market_key(self, index: int):
+        """Jobs with the same key run on the same market; unseeded jobs each get their own."""
+        if self.seed is None:
+            return ("unseeded", index)
+        return (self.seed, self.days, self.interval, self.model, tuple(sorted((self.market_params or {}).items())))
+
+def _init_worker(persist: bool):
+    if persist:
+        # Connections inherited from the parent must not be reused across processes
+        from app.db.session import engine
+        engine.dispose(close=False)
+
+def _attach_market(descriptor: dict) -> pd.DataFrame:
+    """DataFrame over the read-only shared buffer; price columns are not copied."""
+    rows = attach(descriptor)
+    df = pd.DataFrame(rows[:, 1:], columns=BAR_FIELDS[1:], copy=False)
+    df.insert(0, "timestamp", pd.to_datetime(rows[:, 0], unit="s"))
+    return df
+
+def _audited_hashes(db, store, hashes: list) -> set:
+    """Blob hashes among `hashes` with a passing audit verdict and a stored blob (one query)."""
+    from app.db.session import SessionLocal
+    hashes = [h for h in hashes if h]
+    if not hashes:
+        return set()
+    session = db or SessionLocal()
+    try:
+        return {h for h in store.passed_hashes(session, hashes) if store.get(h) is not None}
+    finally:
+        if db is None:
+            session.close()
+
+def _run_job(index: int, job: BacktestJob, descriptor: dict, persist: bool) -> List[dict]:
+    """Runs in a pool worker: one competition, one row per agent."""
+    from app.engine.executor import CompetitionExecutor
+
+    db = None
+    if persist:
+        from app.db.session import SessionLocal
+        db = SessionLocal()
+    worker_pool = None
+    agents = job.agents
+    rejected = {}
+    started = time.perf_counter()
+    try:
+        if job.pooled:
+            from app.engine.agent_pool import AgentWorkerPool
+            from app.engine.code_store import get_code_store
+            store = get_code_store()
+            audited = _audited_hashes(db, store, [agent.get("code_hash") for agent in job.agents])
+            worker_pool = AgentWorkerPool(num_workers=1)
+            agents = []
+            for agent in job.agents:
+                # Only stored blobs with a passing audit verdict are hosted; raw paths and unaudited code never run
+                if agent.get("code_hash") not in audited:
+                    rejected[agent["id"]] = "No passing audit verdict for the agent's code"
+                    continue
+                # Stored strategies come from this worker's LRU, so a variant is read and compiled once per worker
+                ok, err = worker_pool.load(agent["id"], store.get(agent["code_hash"]))
+                if ok:
+                    agents.append(agent)
+                else:
+                    # A pooled agent has no script to fall back to: it errors alone instead of failing the job
+                    logger.warning(f"Agent {agent['id']} failed to load: {err}")
+                    rejected[agent["id"]] = f"Load failed: {err}"
+        executor = CompetitionExecutor(
+            db, job.competition_id, _attach_market(descriptor), agents, worker_pool=worker_pool,
+            deadline_policy=DeadlinePolicy(**job.deadline) if job.deadline else None
+        )
+        results = asyncio.run(executor.run())
+        telemetry = executor.telemetry.to_dict()["agents"]
+    finally:
+        if worker_pool is not None:
+            worker_pool.close()
+        if db is not None:
+            db.close()
+    elapsed = time.perf_counter() - started
+
+    rows = []
+    for agent in job.agents:
+        if agent["id"] in rejected:
+            rows.append({"job": index, "competition_id": job.competition_id, "seed": job.seed, "model": job.model,
+                         "agent_id": agent["id"], "error": rejected[agent["id"]]})
+            continue
+        state = results[agent["id"]]
+        stats = telemetry.get(str(agent["id"]), {})
+        outcomes = stats.get("outcomes", {})
+        rows.append({
+            "job": index,
+            "competition_id": job.competition_id,
+            "seed": job.seed,
+            "model": job.model,
+            "agent_id": agent["id"],
+            "equity": state["equity"],
+            "pnl": state["equity"] - INITIAL_CASH,
+            "return_pct": (state["equity"] - INITIAL_CASH) / INITIAL_CASH * 100,
+            "decisions": stats.get("decisions", 0),
+            "timeouts": outcomes.get("timeout", 0),
+            "failures": outcomes.get("crash", 0) + outcomes.get("error", 0),
+            "p95_latency": stats.get("latency", {}).get("p95"),
+            "cpu_time": stats.get("cpu_time", 0.0),
+            "elapsed": elapsed,
+            "error": None
+        })
+    return rows
+
+class BatchBacktestRunner:
+    """
+    Runs many backtest competitions across a process pool.
+    Each distinct market (seed, length, interval, model, params) is generated once in the parent and
+    published through a SharedMarketBuffer; workers map it read-only instead of regenerating or unpickling it.
+    Results come back as one summary DataFrame with a row per (job, agent); failed jobs get a row per agent
+    with `error` set.
+    By default nothing is written to the database (persist=False), which keeps sweeps off the DB's write path.
+    With keep_markets, seeded markets stay published across run() calls until close().
+    """
+    def __init__(self, max_workers: int = None, persist: bool = False, data_service: DataService = None,
+                 keep_markets: bool = False):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.persist = persist
+        self.data_service = data_service or DataService()
+        self.keep_markets = keep_markets
+        self._markets = {}
+
+    def _publish_markets(self, jobs: List[BacktestJob]) -> dict:
+        markets = self._markets if self.keep_markets else {}
+        for index, job in enumerate(jobs):
+            key = job.market_key(index)
+            if key not in markets:
+                market_data = self.data_service.generate_mock_data(
+                    days=job.days, interval=job.interval, model=job.model, seed=job.seed, **(job.market_params or {})
+                )
+                markets[key] = SharedMarketBuffer(market_data, name=f"backtest_{uuid.uuid4().hex}")
+        return markets
+
+    def run(self, jobs: List[BacktestJob]) -> pd.DataFrame:
+        markets = self._publish_markets(jobs)
+        method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        rows = []
+        try:
+            with ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context(method),
+                                     initializer=_init_worker, initargs=(self.persist,)) as pool:
+                futures = {
+                    pool.submit(_run_job, index, job, markets[job.market_key(index)].descriptor, self.persist): (index, job)
+                    for index, job in enumerate(jobs)
+                }
+                for future in as_completed(futures):
+                    index, job = futures[future]
+                    try:
+                        rows.extend(future.result())
+                    except Exception as e:
+                        logger.error(f"Backtest job {index} ({job.competition_id}) failed: {e}")
+                        rows.extend(
+                            {"job": index, "competition_id": job.competition_id, "seed": job.seed, "model": job.model,
+                             "agent_id": agent["id"], "error": f"{type(e).__name__}: {e}"}
+                            for agent in job.agents
+                        )
+        finally:
+            if not self.keep_markets:
+                for market in markets.values():
+                    market.close()
+
+        summary = pd.DataFrame(rows)
+        if summary.empty:
+            return summary
+        return summary.sort_values(["job", "agent_id"]).reset_index(drop=True)
+
+    def close(self):
+        """Releases markets kept with keep_markets."""
+        for market in self._markets.values():
+            market.close()
+        self._markets = {}
+
+def summarize_by_agent(summary: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate a batch summary across jobs: mean/median return, win rate vs. flat, total timeouts."""
+    ok = summary[summary["error"].isna()]
+    grouped = ok.groupby("agent_id")
+    return pd.DataFrame({
+        "jobs": grouped.size(),
+        "mean_return_pct": grouped["return_pct"].mean(),
+        "median_return_pct": grouped["return_pct"].median(),
+        "win_rate": grouped["return_pct"].apply(lambda r: (r > 0).mean()),
+        "timeouts": grouped["timeouts"].sum(),
+        "failures": grouped["failures"].sum()
+    }).sort_values("mean_return_pct", ascending=False)
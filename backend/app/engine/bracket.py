@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import zlib
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.db import models
+from app.engine.adversarial import AdversarialEngine, DuelOutcome, DUEL_EQUITY
+from app.engine.agent_pool import AgentWorkerPool, DEFAULT_DECISION
+from app.engine.code_store import CodeStore, get_code_store
+from app.engine.data_service import DataService, parse_interval
+from app.engine.ratings import DEFAULT_RATING, DEFAULT_RD, conservative_rating, current_rd
+
+logger = logging.getLogger(__name__)
+
+Decider = Callable[[str, dict], Awaitable[dict]]
+RUN_ONCE_STATUSES = ("RUNNING", "COMPLETED", "FAILED") # tournaments in these states cannot be (re)run
+
+def bracket_order(size: int) -> List[int]:
+    """
+    Standard seeding for a power-of-two bracket: slot order of seed indices such that
+    seed 0 meets seed size-1 in round one and the top two seeds can only meet in the final.
+    """
+    order = [0]
+    while len(order) < size:
+        mirror = len(order) * 2 - 1
+        order = [s for seed in order for s in (seed, mirror - seed)]
+    return order
+
+def seed_pairs(ranked_ids: List[str]) -> List[Tuple[str, Optional[str]]]:
+    """First-round matches from a ranking (best first). Missing slots are byes (None) for the top seeds."""
+    size = 2
+    while size < len(ranked_ids):
+        size *= 2
+    slots = [ranked_ids[i] if i < len(ranked_ids) else None for i in bracket_order(size)]
+    return [(slots[i], slots[i + 1]) for i in range(0, size, 2)]
+
+def rank_agents(db: Session, agent_ids: List[str]) -> List[str]:
+    """
+    Orders agents best first by conservative Glicko-2 rating (rating - 2 RD, RD grown over idle periods),
+    then realized PnL (sum of SETTLE events). Unrated agents count as new (1500 +/- 350).
+    """
+    Rating = models.AgentRating
+    ratings = {
+        str(agent_id): conservative_rating(rating, current_rd(rd, volatility, updated_at))
+        for agent_id, rating, rd, volatility, updated_at in (
+            db.query(Rating.agent_id, Rating.rating, Rating.rd, Rating.volatility, Rating.updated_at)
+            .filter(Rating.agent_id.in_(agent_ids))
+            .all()
+        )
+    }
+    unrated = conservative_rating(DEFAULT_RATING, DEFAULT_RD)
+    pnl = {str(agent_id): total for agent_id, total in (
+        db.query(models.LedgerEvent.agent_id, func.sum(models.LedgerEvent.amount))
+        .filter(models.LedgerEvent.agent_id.in_(agent_ids), models.LedgerEvent.event_type == "SETTLE")
+        .group_by(models.LedgerEvent.agent_id)
+        .all()
+    )}
+    return sorted(agent_ids, key=lambda a: (-ratings.get(str(a), unrated), -(pnl.get(str(a)) or 0.0), str(a)))
+
+def decision_snapshot(data_service: DataService, competition_id: str, interval: str = "1h", lookback: int = 60,
+                      horizon: int = 24):
+    """
+    Deterministic synthetic decision point, seeded by `competition_id`:
+    (tick shown to agents with `lookback` bars, price at decision, price `horizon` bars later).
+    """
+    seed = zlib.crc32(competition_id.encode())
+    days = (lookback + horizon) * parse_interval(interval) / 86400
+    df = data_service.generate_mock_data(days=days, interval=interval, seed=seed)
+    history = df.iloc[:lookback]
+    price_start = float(history["close"].iloc[-1])
+    price_end = float(df["close"].iloc[min(lookback + horizon, len(df)) - 1])
+    ohlcv = [
+        [ts.timestamp(), o, h, l, c, v]
+        for ts, o, h, l, c, v in history[["timestamp", "open", "high", "low", "close", "volume"]].itertuples(index=False)
+    ]
+    market = {"symbol": "BTCUSDT", "price": price_start, "timestamp": history["timestamp"].iloc[-1].isoformat(), "ohlcv": ohlcv}
+    tick = {
+        "meta": {"competition_id": competition_id, "step": lookback - 1, "timestamp": market["timestamp"]},
+        "competition": {"competition_id": competition_id, "symbol": "BTCUSDT", "horizon_bars": horizon},
+        "account": {"cash": DUEL_EQUITY, "locked": 0, "realized_pnl": 0},
+        # "market" as in the agent spec for on_tick agents; "market_snapshot" kept for older decide() agents
+        "market": market,
+        "market_snapshot": market
+    }
+    return tick, price_start, price_end
+
+class PoolDecider:
+    """
+    Decides for many agents concurrently through an AgentWorkerPool, loading each agent's code
+    from the code store on first use. Only code with a passing audit verdict is loaded;
+    agents without it, or that fail to load, hold.
+    """
+    def __init__(self, pool: AgentWorkerPool, db: Session, store: CodeStore = None):
+        self.pool = pool
+        self.db = db
+        self.store = store or get_code_store()
+        self._failed = set()
+
+    def _ensure_loaded(self, agent_id: str) -> bool:
+        if agent_id in self.pool:
+            return True
+        if agent_id in self._failed:
+            return False
+        code = self.store.audited_code(self.db, agent_id)
+        ok, err = self.pool.load(agent_id, code) if code is not None else (False, "no audited code")
+        if not ok:
+            logger.warning(f"Agent {agent_id} unavailable for tournament play: {err}")
+            self._failed.add(agent_id)
+        return ok
+
+    async def __call__(self, agent_id: str, tick: dict) -> dict:
+        if not self._ensure_loaded(agent_id):
+            return dict(DEFAULT_DECISION)
+        result = await self.pool.decide(agent_id, tick)
+        return result["decision"] or dict(DEFAULT_DECISION)
+
+class BracketEngine:
+    """
+    Single-elimination tournament runner.
+    Each round is one decision point: every surviving agent sees the same market snapshot and decides
+    concurrently, then all of the round's duels are settled with AdversarialEngine.evaluate_duel over the
+    same price move. A round costs one parallel decision pass regardless of how many matches it has,
+    so 1024 agents finish in 10 rounds. Bracket rows and duel results are written once per round.
+    Ties go to the better seed.
+    """
+    def __init__(self, db: Session, decide: Decider, data_service: DataService = None, interval: str = "1h",
+                 lookback: int = 60, horizon: int = 24):
+        self.db = db
+        self.decide = decide
+        self.adversarial = AdversarialEngine(db)
+        self.data_service = data_service or DataService()
+        self.interval = interval
+        self.lookback = lookback
+        self.horizon = horizon
+
+    @staticmethod
+    def _competition_id(tournament_id: int, round_no: int) -> str:
+        return f"tournament-{tournament_id}-round-{round_no}"
+
+    async def run_round(self, tournament: models.Tournament, round_no: int,
+                        pairs: List[Tuple[str, Optional[str]]], seeds: Dict[str, int]) -> List[str]:
+        """Plays one round and stages its rows; returns winners in bracket order."""
+        competition_id = self._competition_id(tournament.id, round_no)
+        tick, price_start, price_end = decision_snapshot(
+            self.data_service, competition_id, self.interval, self.lookback, self.horizon
+        )
+        players = [agent for pair in pairs for agent in pair if agent is not None]
+        decisions = dict(zip(players, await asyncio.gather(*(self.decide(agent, tick) for agent in players))))
+
+        winners, outcomes, rows = [], [], []
+        for match_id, (a, b) in enumerate(pairs):
+            if b is None or a is None:
+                winner = a if b is None else b
+            else:
+                # Better seed as agent A so ties go its way
+                if seeds[b] < seeds[a]:
+                    a, b = b, a
+                outcome: DuelOutcome = self.adversarial.evaluate_duel(
+                    a, decisions[a], b, decisions[b], price_start, price_end, a_wins_ties=True
+                )
+                outcomes.append(outcome)
+                winner = outcome.winner_id
+            winners.append(winner)
+            rows.append(models.TournamentBracket(
+                tournament_id=tournament.id, round=round_no, match_id=match_id,
+                agent_a_id=a, agent_b_id=b, winner_id=winner, competition_id=competition_id
+            ))
+        self.db.add_all(rows)
+        self.adversarial.record_duel_results(competition_id, outcomes)
+        return winners
+
+    async def run(self, tournament: models.Tournament, agent_ids: List[str]) -> Optional[str]:
+        """Seeds the bracket from rankings and plays it out. Returns the champion's id."""
+        if not agent_ids:
+            return None
+        if tournament.status in RUN_ONCE_STATUSES:
+            # Rounds of an earlier run are committed (bracket rows, duel results, ratings): never replay them
+            raise ValueError(f"Tournament {tournament.id} is {tournament.status}")
+        ranked = rank_agents(self.db, agent_ids)
+        seeds = {agent: i for i, agent in enumerate(ranked)}
+        pairs = seed_pairs(ranked)
+
+        tournament.status = "RUNNING"
+        self.db.commit()
+        round_no = 1
+        try:
+            while True:
+                winners = await self.run_round(tournament, round_no, pairs, seeds)
+                self.db.commit()
+                logger.info(f"Tournament {tournament.id} round {round_no}: {len(pairs)} matches played")
+                if len(winners) == 1:
+                    break
+                pairs = [(winners[i], winners[i + 1]) for i in range(0, len(winners), 2)]
+                round_no += 1
+        except Exception:
+            self.db.rollback()
+            tournament.status = "FAILED"
+            self.db.commit()
+            raise
+
+        tournament.status = "COMPLETED"
+        self.db.commit()
+        return winners[0]
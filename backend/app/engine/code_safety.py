@@ -0,0 +1,351 @@
+import ast
+import builtins
+import functools
+import hashlib
+import importlib
+import symtable
+import threading
+import types
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Optional, Tuple, NamedTuple
+
+# Modules agent code may import (top-level package names)
+ALLOWED_MODULES = frozenset({
+    "__future__", "bisect", "cmath", "collections", "copy", "dataclasses", "datetime", "decimal", "enum",
+    "fractions", "functools", "heapq", "itertools", "json", "math", "numpy", "operator", "pandas", "random",
+    "re", "statistics", "string", "sys", "time", "typing"
+})
+# Modules whose members are allowlisted
+MODULE_ATTRIBUTE_ALLOWLIST = {
+    "sys": frozenset({"stdin", "stdout", "stderr", "argv", "exit", "maxsize", "float_info", "version_info"}),
+}
+# Members of allowed modules that reach the filesystem, native code or evaluate strings ("prefix*" matches a prefix).
+# Private (underscore) members of every module are rejected as well.
+MODULE_ATTRIBUTE_DENYLIST = {
+    "numpy": frozenset({"load", "save", "savez", "savez_compressed", "savetxt", "loadtxt", "genfromtxt", "fromfile",
+                        "fromregex", "memmap", "ctypeslib", "lib", "DataSource", "f2py", "distutils", "testing"}),
+    "pandas": frozenset({"read_*", "to_pickle", "HDFStore", "ExcelWriter", "ExcelFile", "io", "eval"}),
+    # attrgetter/methodcaller take attribute names as strings, past the dunder check
+    "operator": frozenset({"attrgetter", "methodcaller"}),
+    # Evaluate string annotations
+    "typing": frozenset({"get_type_hints", "ForwardRef"}),
+    "functools": frozenset({"singledispatch", "singledispatchmethod"}),
+    # Formatter.get_field resolves "{0.attr}" fields
+    "string": frozenset({"Formatter"}),
+}
+# Attributes rejected on any object: frame/code introspection (reaches globals and builtins without a dunder),
+# file writers of numpy and pandas objects, and pandas' string evaluators
+FORBIDDEN_ATTRIBUTES = frozenset({
+    "gi_frame", "gi_code", "gi_yieldfrom", "cr_frame", "cr_code", "cr_await", "ag_frame", "ag_code", "ag_await",
+    "f_globals", "f_locals", "f_builtins", "f_back", "f_code", "tb_frame", "tb_next",
+    "tofile", "dump", "to_pickle", "to_csv", "to_parquet", "to_hdf", "to_excel", "to_feather", "to_sql", "to_stata",
+    "to_orc", "to_json", "to_html", "to_latex", "to_markdown", "to_xml", "to_string", "to_clipboard",
+    "eval", "query"
+})
+# Modules that must never be reached as a member of an allowed one, even where this interpreter's version of that
+# module happens not to re-export them (the runtime check below only sees what exists here)
+ESCAPE_MODULES = frozenset({
+    "os", "sys", "inspect", "subprocess", "builtins", "importlib", "ctypes", "io", "shutil", "socket", "pickle",
+    "marshal", "gc", "types", "runpy", "posix", "pathlib", "tempfile", "threading", "multiprocessing", "signal",
+    "resource", "mmap", "codecs", "warnings", "weakref", "platform", "sysconfig", "site", "linecache", "pkgutil"
+})
+SAFE_DUNDER_NAMES = frozenset({"__name__", "__doc__", "__file__", "__all__"})
+SAFE_DUNDER_ATTRIBUTES = frozenset({"__init__", "__name__", "__qualname__", "__doc__", "__class__"})
+# Dunder strings allowed as literals (anything else could feed a by-name lookup such as globals()["__builtins__"])
+SAFE_DUNDER_STRINGS = SAFE_DUNDER_NAMES | SAFE_DUNDER_ATTRIBUTES | {"__main__"}
+_EXCEPTIONS = {name for name, value in vars(builtins).items() if isinstance(value, type) and issubclass(value, BaseException)}
+# Builtins agent code may use; every other builtin (open, eval, exec, compile, getattr, globals, ...) is rejected
+SAFE_BUILTINS = frozenset({
+    "abs", "all", "any", "ascii", "bin", "bool", "bytearray", "bytes", "callable", "chr", "classmethod", "complex",
+    "dict", "dir", "divmod", "enumerate", "filter", "float", "format", "frozenset", "hasattr", "hash", "hex", "id",
+    "input", "int", "isinstance", "issubclass", "iter", "len", "list", "map", "max", "min", "next", "object", "oct",
+    "ord", "pow", "print", "property", "range", "repr", "reversed", "round", "set", "slice", "sorted",
+    "staticmethod", "str", "sum", "super", "tuple", "type", "zip", "True", "False", "None", "NotImplemented",
+    "Ellipsis"
+}) | _EXCEPTIONS | SAFE_DUNDER_NAMES
+_BUILTIN_NAMES = frozenset(dir(builtins))
+
+class Violation(NamedTuple):
+    line: int
+    kind: str
+    detail: str
+
+    def __str__(self):
+        return f"{self.kind} '{self.detail}' at line {self.line}"
+
+class SafetyReport(NamedTuple):
+    ok: bool
+    violations: Tuple[Violation, ...]
+    functions: FrozenSet[str] # every function defined, for interface checks
+    syntax_error: Optional[str] = None
+
+    @property
+    def message(self) -> Optional[str]:
+        if self.syntax_error:
+            return self.syntax_error
+        return str(self.violations[0]) if self.violations else None
+
+def _is_dunder(name: str) -> bool:
+    return name.startswith("__") and name.endswith("__")
+
+def _resolve_module(module: str) -> Optional[types.ModuleType]:
+    """The module object at a dotted path of an allowed package, walked attribute by attribute from its root."""
+    parts = module.split(".")
+    if parts[0] not in ALLOWED_MODULES:
+        return None
+    try:
+        obj = importlib.import_module(parts[0])
+    except ImportError:
+        return None
+    for part in parts[1:]:
+        obj = getattr(obj, part, None)
+        if not isinstance(obj, types.ModuleType):
+            return None
+    return obj
+
+@functools.lru_cache(maxsize=None)
+def _is_submodule(module: str, attr: str) -> bool:
+    """Whether `module.attr` is that package's own submodule (numpy.random, json.decoder)."""
+    member = getattr(_resolve_module(module), attr, None)
+    return isinstance(member, types.ModuleType) and member.__name__ == f"{module}.{attr}"
+
+@functools.lru_cache(maxsize=None)
+def _module_member_allowed(module: str, attr: str) -> bool:
+    if attr.startswith("_"):
+        return False
+    allowed = MODULE_ATTRIBUTE_ALLOWLIST.get(module)
+    if allowed is not None:
+        return attr in allowed
+    # A package's denylist applies to its submodules as well
+    for pattern in MODULE_ATTRIBUTE_DENYLIST.get(module, frozenset()) | MODULE_ATTRIBUTE_DENYLIST.get(module.split(".")[0], frozenset()):
+        if attr == pattern or (pattern.endswith("*") and attr.startswith(pattern[:-1])):
+            return False
+    # Modules re-exported by an allowed module (typing.sys, numpy.os, json.decoder.sys) lead outside the allowlist;
+    # only a package's own submodules are members, and their members are checked in turn
+    if attr in ESCAPE_MODULES and not _is_submodule(module, attr):
+        return False
+    member = getattr(_resolve_module(module), attr, None)
+    return not isinstance(member, types.ModuleType) or _is_submodule(module, attr)
+
+def _module_path_allowed(module: str) -> bool:
+    """Every link of a dotted import path is an allowed member and a submodule of the one before it."""
+    parts = module.split(".")
+    if parts[0] not in ALLOWED_MODULES:
+        return False
+    for i in range(1, len(parts)):
+        parent = ".".join(parts[:i])
+        if not (_module_member_allowed(parent, parts[i]) and _is_submodule(parent, parts[i])):
+            return False
+    return True
+
+_COMPREHENSIONS = {ast.ListComp: "listcomp", ast.SetComp: "setcomp", ast.DictComp: "dictcomp", ast.GeneratorExp: "genexpr"}
+_CANDIDATES = _BUILTIN_NAMES - SAFE_BUILTINS # builtin names that are only legal when they refer to a local binding
+
+def _local_bindings(code: str) -> Dict[Tuple[str, int], FrozenSet[str]]:
+    """
+    Per scope (symtable name, line), the candidate names that refer to a binding of a function scope (a local or
+    a closure variable). Module and class scopes never count: a name unbound there at run time falls back to the
+    builtin. Scopes sharing a key keep only the names local in all of them.
+    """
+    scopes: Dict[Tuple[str, int], FrozenSet[str]] = {}
+
+    def walk(table):
+        is_function = table.get_type() == "function"
+        local = frozenset(
+            symbol.get_name() for symbol in table.get_symbols()
+            if symbol.get_name() in _CANDIDATES and (symbol.is_free() or (is_function and symbol.is_local()))
+        )
+        key = (table.get_name(), table.get_lineno())
+        scopes[key] = scopes[key] & local if key in scopes else local
+        for child in table.get_children():
+            walk(child)
+
+    walk(symtable.symtable(code, "<agent>", "exec"))
+    return scopes
+
+class _SafetyVisitor(ast.NodeVisitor):
+    """
+    One traversal: imports against ALLOWED_MODULES, module members, builtins and dunder access.
+    Builtin names are resolved per scope (see _local_bindings): `def f(eval): ...` does not make `eval` legal elsewhere.
+    """
+    def __init__(self, local_bindings: Dict[Tuple[str, int], FrozenSet[str]]):
+        self.violations = []
+        self.functions = set()
+        self.aliases = {} # local name -> module
+        self.local_bindings = local_bindings
+        self.scope = ("top", 0)
+
+    def _flag(self, node, kind: str, detail: str):
+        self.violations.append(Violation(getattr(node, "lineno", 0), kind, detail))
+
+    def _in_scope(self, key: Tuple[str, int], nodes):
+        outer, self.scope = self.scope, key
+        for node in nodes:
+            if node is not None:
+                self.visit(node)
+        self.scope = outer
+
+    def _visit_all(self, nodes):
+        for node in nodes:
+            if node is not None:
+                self.visit(node)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            root = alias.name.split(".")[0]
+            if root not in ALLOWED_MODULES:
+                self._flag(node, "Forbidden import", alias.name)
+            elif not _module_path_allowed(alias.name):
+                self._flag(node, "Forbidden attribute", alias.name)
+            local = alias.asname or root
+            self.aliases[local] = alias.name if alias.asname else root
+
+    def visit_ImportFrom(self, node):
+        module = node.module or ""
+        root = module.split(".")[0]
+        if node.level or root not in ALLOWED_MODULES:
+            self._flag(node, "Forbidden import", "." * node.level + module)
+            return
+        if not _module_path_allowed(module):
+            self._flag(node, "Forbidden attribute", module)
+            return
+        for alias in node.names:
+            if alias.name == "*" or not _module_member_allowed(module, alias.name):
+                self._flag(node, "Forbidden attribute", f"{module}.{alias.name}")
+            elif _is_submodule(module, alias.name):
+                # `from json import decoder` binds a module: its members are checked like any alias'
+                self.aliases[alias.asname or alias.name] = f"{module}.{alias.name}"
+
+    def _module_of(self, node) -> Optional[str]:
+        """Dotted module an expression refers to (an alias, or a submodule reached through one), else None."""
+        if isinstance(node, ast.Name):
+            return self.aliases.get(node.id)
+        if isinstance(node, ast.Attribute):
+            parent = self._module_of(node.value)
+            if parent is not None and _is_submodule(parent, node.attr):
+                return f"{parent}.{node.attr}"
+        return None
+
+    def _check_attribute(self, node):
+        if _is_dunder(node.attr) and node.attr not in SAFE_DUNDER_ATTRIBUTES:
+            self._flag(node, "Forbidden attribute", node.attr)
+        elif node.attr in FORBIDDEN_ATTRIBUTES:
+            self._flag(node, "Forbidden attribute", node.attr)
+        module = self._module_of(node.value)
+        if module is not None:
+            # Member access is the only legal use of a module, so the alias Name itself is not visited
+            if not isinstance(node.ctx, ast.Load):
+                self._flag(node, "Forbidden attribute", f"{module}.{node.attr} assignment")
+            elif not _module_member_allowed(module, node.attr):
+                self._flag(node, "Forbidden attribute", f"{module}.{node.attr}")
+            if isinstance(node.value, ast.Attribute):
+                self._check_attribute(node.value)
+            return
+        self.generic_visit(node)
+
+    def visit_Attribute(self, node):
+        self._check_attribute(node)
+        module = self._module_of(node)
+        if module is not None:
+            # rng = np.random; rng.<anything> would get past the member checks
+            self._flag(node, "Module alias used as a value", module)
+
+    def visit_Name(self, node):
+        if node.id in self.aliases:
+            # m = np; m.load(...) would get past the member checks
+            self._flag(node, "Module alias used as a value" if isinstance(node.ctx, ast.Load) else "Module alias rebound", node.id)
+        elif isinstance(node.ctx, ast.Load):
+            if _is_dunder(node.id) and node.id not in SAFE_DUNDER_NAMES:
+                self._flag(node, "Forbidden name", node.id)
+            elif node.id in _CANDIDATES and node.id not in self.local_bindings.get(self.scope, ()):
+                self._flag(node, "Forbidden builtin", node.id)
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, str) and _is_dunder(node.value) and node.value not in SAFE_DUNDER_STRINGS:
+            self._flag(node, "Forbidden string", node.value)
+
+    def visit_Call(self, node):
+        # "{0.__class__}".format(x) reaches attributes without an Attribute node, so format templates must be
+        # literals without dunder fields
+        func = node.func
+        if isinstance(func, ast.Attribute) and func.attr in ("format", "format_map"):
+            receiver = func.value
+            if not (isinstance(receiver, ast.Constant) and isinstance(receiver.value, str)):
+                self._flag(node, "Forbidden attribute", "format with a non-literal template")
+            elif ".__" in receiver.value:
+                self._flag(node, "Forbidden attribute", "format-string dunder access")
+        self.generic_visit(node)
+
+    def _visit_function(self, node):
+        if not isinstance(node, ast.Lambda):
+            self.functions.add(node.name)
+            self._visit_all(node.decorator_list)
+            self._visit_all([node.returns])
+        args = node.args
+        self._visit_all(args.defaults + args.kw_defaults)
+        self._visit_all(arg.annotation for arg in args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]
+                        if arg is not None)
+        name = "lambda" if isinstance(node, ast.Lambda) else node.name
+        self._in_scope((name, node.lineno), [node.body] if isinstance(node, ast.Lambda) else node.body)
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+    visit_Lambda = _visit_function
+
+    def visit_ClassDef(self, node):
+        self._visit_all(node.decorator_list + node.bases + node.keywords)
+        self._in_scope((node.name, node.lineno), node.body)
+
+    def _visit_comprehension(self, node):
+        # The first iterable is evaluated in the enclosing scope, everything else in the comprehension's own
+        first, *rest = node.generators
+        self.visit(first.iter)
+        parts = [node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]
+        self._in_scope((_COMPREHENSIONS[type(node)], node.lineno),
+                       parts + [first.target] + first.ifs + rest)
+
+    visit_ListComp = _visit_comprehension
+    visit_SetComp = _visit_comprehension
+    visit_DictComp = _visit_comprehension
+    visit_GeneratorExp = _visit_comprehension
+
+    def finish(self) -> Tuple[Violation, ...]:
+        return tuple(sorted(set(self.violations)))
+
+_cache: "OrderedDict[str, SafetyReport]" = OrderedDict()
+_cache_lock = threading.Lock()
+CACHE_SIZE = 4096
+
+def code_hash(code: str) -> str:
+    return hashlib.sha256(code.encode()).hexdigest()
+
+def analyze(code: str, tree: ast.AST = None) -> SafetyReport:
+    """
+    Static safety report for agent code, cached by code hash. Pass `tree` when the caller has already
+    parsed the code, so it is not parsed twice.
+    """
+    key = code_hash(code)
+    with _cache_lock:
+        report = _cache.get(key)
+        if report is not None:
+            _cache.move_to_end(key)
+            return report
+
+    try:
+        if tree is None:
+            tree = ast.parse(code)
+        local_bindings = _local_bindings(code)
+    except SyntaxError as e:
+        tree = None
+        report = SafetyReport(False, (), frozenset(), f"Syntax Error: {e.msg} at line {e.lineno}")
+    if tree is not None:
+        visitor = _SafetyVisitor(local_bindings)
+        visitor.visit(tree)
+        violations = visitor.finish()
+        report = SafetyReport(not violations, violations, frozenset(visitor.functions))
+
+    with _cache_lock:
+        _cache[key] = report
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return report
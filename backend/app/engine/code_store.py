@@ -0,0 +1,195 @@
+import logging
+import marshal
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from types import CodeType
+from typing import Dict, Iterable, Optional, Set, Tuple
+from sqlalchemy import String, type_coerce
+from sqlalchemy.orm import Session
+from app.db import models
+from app.engine.code_safety import code_hash
+
+logger = logging.getLogger(__name__)
+
+CODE_STORE_DIR = os.getenv("CODE_STORE_DIR", os.path.join(os.getcwd(), "agents", "store"))
+LEGACY_AGENTS_DIR = os.path.join(os.getcwd(), "agents") # pre-store layout: agents/<agent_id>.py
+
+class CodeStore:
+    """
+    Content-addressed strategy code: sha256(code) -> blob at <directory>/<hash[:2]>/<hash>.py, written once.
+    Agents reference a blob through agent_code, so forks and identical evolved strategies share one file,
+    and the audit caches (code_safety.analyze, ValidationService) are keyed by the same hash.
+    Audit verdicts are kept per blob (strategy_audits). Execution paths only get code with a passing verdict
+    (audited_code, agent_hashes). Hot code and its compiled bytecode stay in in-memory LRUs. The old
+    agents/<id>.py layout is only read by the audited one-off import_legacy.
+    """
+    def __init__(self, directory: str = None, legacy_dir: str = None, max_entries: int = 1024):
+        self.directory = directory or CODE_STORE_DIR
+        self.legacy_dir = legacy_dir or LEGACY_AGENTS_DIR
+        self.max_entries = max_entries
+        self._code: "OrderedDict[str, str]" = OrderedDict()
+        self._compiled: "OrderedDict[str, CodeType]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path(self, code_hash: str) -> str:
+        return os.path.join(self.directory, code_hash[:2], f"{code_hash}.py")
+
+    def _remember(self, lru: OrderedDict, key: str, value):
+        with self._lock:
+            lru[key] = value
+            lru.move_to_end(key)
+            while len(lru) > self.max_entries:
+                lru.popitem(last=False)
+
+    def put(self, code: str) -> str:
+        """Stores code (a no-op when the blob exists) and returns its hash."""
+        key = code_hash(code)
+        path = self.path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(code)
+            os.replace(tmp_path, path)
+        self._remember(self._code, key, code)
+        return key
+
+    def get(self, code_hash: str) -> Optional[str]:
+        with self._lock:
+            code = self._code.get(code_hash)
+        if code is None:
+            path = self.path(code_hash)
+            if not os.path.exists(path):
+                return None
+            with open(path, "r") as f:
+                code = f.read()
+        self._remember(self._code, code_hash, code)
+        return code
+
+    def compiled(self, code: str) -> CodeType:
+        """Bytecode for `code`, compiled once per distinct strategy. Raises SyntaxError like compile()."""
+        key = code_hash(code)
+        with self._lock:
+            compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = compile(code, f"<strategy {key[:12]}>", "exec")
+            self._remember(self._compiled, key, compiled)
+        return compiled
+
+    def bytecode(self, code: str) -> bytes:
+        """Marshalled bytecode, for handing a compiled strategy to another process."""
+        return marshal.dumps(self.compiled(code))
+
+    def assign(self, db: Session, agent_id, code: str = None, code_hash: str = None) -> str:
+        """Points an agent at `code` (stored first) or at an existing blob hash. The caller commits."""
+        if code is not None:
+            code_hash = self.put(code)
+        row = db.query(models.AgentCode).filter(models.AgentCode.agent_id == agent_id).first()
+        if row is None:
+            row = models.AgentCode(agent_id=agent_id)
+            db.add(row)
+        row.code_hash = code_hash
+        row.updated_at = datetime.utcnow()
+        return code_hash
+
+    def link(self, db: Session, agent_id, source_agent_id) -> Optional[str]:
+        """Gives `agent_id` the same code as `source_agent_id` without copying it. The caller commits."""
+        key = self.hash_of(db, source_agent_id)
+        if key is not None:
+            self.assign(db, agent_id, code_hash=key)
+        return key
+
+    def record_verdict(self, db: Session, code_hash: str, passed: bool, message: str = None):
+        """Stores the audit verdict of a blob, shared by every agent running that code. The caller commits."""
+        row = db.query(models.StrategyAudit).filter(models.StrategyAudit.code_hash == code_hash).first()
+        if row is None:
+            row = models.StrategyAudit(code_hash=code_hash)
+            db.add(row)
+        row.passed = passed
+        row.message = message
+        row.audited_at = datetime.utcnow()
+
+    def passed_hashes(self, db: Session, code_hashes: Iterable[str]) -> Set[str]:
+        """The blobs among `code_hashes` whose audit verdict passed."""
+        code_hashes = list(set(code_hashes))
+        if not code_hashes:
+            return set()
+        return {key for (key,) in db.query(models.StrategyAudit.code_hash)
+                .filter(models.StrategyAudit.code_hash.in_(code_hashes), models.StrategyAudit.passed == True).all()}
+
+    def hash_of(self, db: Session, agent_id) -> Optional[str]:
+        return db.query(models.AgentCode.code_hash).filter(models.AgentCode.agent_id == agent_id).scalar()
+
+    def agent_code(self, db: Session, agent_id) -> Optional[str]:
+        """An agent's code whatever its audit state (for reading it, not for running it)."""
+        key = self.hash_of(db, agent_id)
+        return self.get(key) if key is not None else None
+
+    def audited_code(self, db: Session, agent_id) -> Optional[str]:
+        """An agent's code, only if its blob has a passing audit verdict. Use this for anything that runs it."""
+        key = self.agent_hashes(db, [agent_id]).get(str(agent_id))
+        return self.get(key) if key is not None else None
+
+    def agent_hashes(self, db: Session, agent_ids: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Blob hash per agent, with one query for the lot. None when the agent has no stored code
+        or its code has no passing audit verdict.
+        """
+        agent_ids = [str(a) for a in agent_ids]
+        rows = db.query(type_coerce(models.AgentCode.agent_id, String), models.AgentCode.code_hash)\
+            .join(models.StrategyAudit, models.StrategyAudit.code_hash == models.AgentCode.code_hash)\
+            .filter(models.AgentCode.agent_id.in_(agent_ids), models.StrategyAudit.passed == True)\
+            .all()
+        hashes = {str(a): key for a, key in rows}
+        return {a: hashes[a] if a in hashes and os.path.exists(self.path(hashes[a])) else None for a in agent_ids}
+
+    def import_legacy(self, db: Session) -> Tuple[int, int]:
+        """
+        One-off migration of the old agents/<agent_id>.py layout. Files of existing agents without stored code
+        go through SubmissionAuditor.audit_code. Only code that passes is stored and assigned.
+        Rejected files stay where they are. Returns (imported, rejected).
+        """
+        from app.engine.submission_auditor import SubmissionAuditor
+
+        auditor = SubmissionAuditor(db)
+        known = {str(a) for (a,) in db.query(type_coerce(models.Agent.id, String)).all()}
+        stored = {str(a) for (a,) in db.query(type_coerce(models.AgentCode.agent_id, String)).all()}
+        imported = rejected = 0
+        for name in sorted(os.listdir(self.legacy_dir)) if os.path.isdir(self.legacy_dir) else []:
+            agent_id = name[:-3]
+            if not name.endswith(".py") or agent_id not in known or agent_id in stored:
+                continue
+            with open(os.path.join(self.legacy_dir, name), "r") as f:
+                code = f.read()
+            passed, message = auditor.audit_code(code)
+            if not passed:
+                rejected += 1
+                logger.warning(f"Legacy code of agent {agent_id} not imported: {message}")
+                continue
+            self.record_verdict(db, self.assign(db, agent_id, code), True, message)
+            imported += 1
+        db.commit()
+        return imported, rejected
+
+_code_store: Optional[CodeStore] = None
+
+def get_code_store() -> CodeStore:
+    """Process-wide store, so hot code and bytecode are shared by every caller (and inherited by forked workers)."""
+    global _code_store
+    if _code_store is None:
+        _code_store = CodeStore()
+    return _code_store
+
+if __name__ == "__main__":
+    # python -m app.engine.code_store --import-legacy
+    import sys
+    from app.db.session import SessionLocal
+    if "--import-legacy" in sys.argv:
+        db = SessionLocal()
+        try:
+            imported, rejected = get_code_store().import_legacy(db)
+            print(f"Imported {imported} legacy strategies, rejected {rejected}")
+        finally:
+            db.close()
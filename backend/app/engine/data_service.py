@@ -1,34 +1,117 @@
+import re
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+SECONDS_PER_YEAR = 365 * 24 * 3600
+INTERVAL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+SEEDED_START = datetime(2024, 1, 1) # first bar of seeded markets without an explicit start_time
+NOISE_LEVELS = 1 << 16 # resolution of the uniform wick / volume noise
+
+def parse_interval(interval: str) -> int:
+    """'1m' / '15m' / '1h' / '1d' -> seconds"""
+    match = re.fullmatch(r"(\d+)\s*([smhdw])", interval.strip().lower())
+    if not match:
+        raise ValueError(f"Unsupported interval: {interval}")
+    return int(match.group(1)) * INTERVAL_UNITS[match.group(2)]
+
 class DataService:
-    def __init__(self):
+    """
+    Synthetic OHLCV generator. All paths are built array-wide from one seeded
+    numpy Generator, so the same seed always reproduces the same market, timestamps included
+    (seeded markets start at SEEDED_START unless start_time is given; unseeded ones end now).
+    Models (annualized parameters):
+    - gbm:    mu, sigma
+    - jump:   gbm + Poisson jumps (jump_intensity per year, jump_mean, jump_std in log space)
+    - regime: two-state volatility (sigma, high_sigma) switching with probability switch_prob per step
+    """
+    def __init__(self, seed: int = None):
         self.data = {}
+        self.rng = np.random.default_rng(seed)
 
-    def generate_mock_data(self, symbol="BTCUSDT", days=30, interval="1h"):
+    def generate_mock_data(self, symbol="BTCUSDT", days=30, interval="1h", model="gbm", seed: int = None,
+                           start_price: float = 40000.0, start_time: datetime = None, **params):
         """
         Generate synthetic OHLCV data for testing.
         """
-        start_time = datetime.utcnow() - timedelta(days=days)
-        timestamps = [start_time + timedelta(hours=i) for i in range(days * 24)]
-        
-        # Simple random walk
-        prices = [40000]
-        for _ in range(len(timestamps) - 1):
-            prices.append(prices[-1] * (1 + np.random.normal(0, 0.002)))
-        
-        df = pd.DataFrame({
-            "timestamp": timestamps,
-            "open": prices,
-            "high": [p * (1 + abs(np.random.normal(0, 0.001))) for p in prices],
-            "low": [p * (1 - abs(np.random.normal(0, 0.001))) for p in prices],
-            "close": [p * (1 + np.random.normal(0, 0.001)) for p in prices],
-            "volume": [np.random.uniform(10, 100) for _ in prices]
-        })
-        
-        self.data[symbol] = df
-        return df
+        return self.generate_market([symbol], days, interval, model, seed, {symbol: start_price}, start_time, **params)[symbol]
+
+    def generate_market(self, symbols, days=30, interval="1h", model="gbm", seed: int = None,
+                        start_prices: dict = None, start_time: datetime = None, **params):
+        """
+        Generate one DataFrame per symbol on a shared timestamp grid.
+        """
+        rng = np.random.default_rng(seed) if seed is not None else self.rng
+        step = parse_interval(interval)
+        n = int(days * 86400 // step)
+        dt = step / SECONDS_PER_YEAR
+        if start_time is None:
+            start_time = SEEDED_START if seed is not None else datetime.utcnow() - timedelta(days=days)
+        timestamps = pd.date_range(start_time, periods=n, freq=pd.Timedelta(seconds=step))
+        start_prices = start_prices or {}
+
+        results = {}
+        for symbol in symbols:
+            price0 = start_prices.get(symbol, 40000.0)
+            # Rows: open, high, low, close, volume. Written in place and handed to pandas without a copy.
+            block = np.empty((5, n))
+            open_, high, low, close, volume = block
+
+            log_returns, step_vol = self._log_returns(rng, model, n, dt, **params)
+            np.cumsum(log_returns, out=close)
+            np.exp(close, out=close)
+            close *= price0
+            open_[0] = price0
+            open_[1:] = close[:-1]
+
+            # Wick and volume noise: one 16-bit integer draw per field is far cheaper than float uniforms.
+            # Wicks scale with the per-step volatility of the bar's own regime.
+            noise = rng.integers(0, NOISE_LEVELS, (3, n), dtype=np.uint16)
+            wick_scale = step_vol / NOISE_LEVELS
+            np.maximum(open_, close, out=high)
+            np.minimum(open_, close, out=low)
+            np.multiply(noise[0], wick_scale, out=log_returns) # log returns are spent, reuse as scratch
+            log_returns += 1
+            high *= log_returns
+            np.multiply(noise[1], wick_scale, out=log_returns)
+            np.subtract(1, log_returns, out=log_returns)
+            low *= log_returns
+            np.multiply(noise[2], 90 / NOISE_LEVELS, out=volume)
+            volume += 10
+
+            df = pd.DataFrame(block.T, columns=["open", "high", "low", "close", "volume"], copy=False)
+            df.insert(0, "timestamp", timestamps)
+            self.data[symbol] = df
+            results[symbol] = df
+        return results
+
+    def _log_returns(self, rng, model, n, dt, mu=0.0, sigma=0.2, jump_intensity=20.0, jump_mean=0.0,
+                     jump_std=0.03, high_sigma=0.8, switch_prob=0.01):
+        """Returns (log returns, per-step volatility); the volatility is an array for the regime model."""
+        log_returns = rng.standard_normal(n)
+        if model in ("gbm", "jump"):
+            step_vol = sigma * np.sqrt(dt)
+            log_returns *= step_vol
+            log_returns += (mu - 0.5 * sigma ** 2) * dt
+            if model == "jump":
+                # Compound Poisson: draw the total jump count, then scatter jumps uniformly over the steps
+                n_jumps = rng.poisson(jump_intensity * dt * n)
+                np.add.at(log_returns, rng.integers(0, n, n_jumps), rng.normal(jump_mean, jump_std, n_jumps))
+            return log_returns, step_vol
+
+        if model == "regime":
+            # Geometric regime durations, laid out with np.repeat instead of a per-step Markov loop.
+            # Drift and volatility are computed once per regime and repeated, not per step.
+            durations = rng.geometric(switch_prob, size=int(n * switch_prob * 2) + 16)
+            while durations.sum() < n:
+                durations = np.concatenate((durations, rng.geometric(switch_prob, size=durations.size)))
+            sigmas = np.where(np.arange(durations.size) % 2 == 1, high_sigma, sigma)
+            step_vol = np.repeat(sigmas * np.sqrt(dt), durations)[:n]
+            log_returns *= step_vol
+            log_returns += np.repeat((mu - 0.5 * sigmas ** 2) * dt, durations)[:n]
+            return log_returns, step_vol
+
+        raise ValueError(f"Unknown market model: {model}")
 
     def get_data(self, symbol):
         return self.data.get(symbol)
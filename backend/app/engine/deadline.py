@@ -0,0 +1,41 @@
+from typing import Dict, Optional
+
+DEFAULT_DECISION_BUDGET = 2.0
+
+class DeadlinePolicy:
+    """
+    How long a tick waits for agents.
+    - tick_deadline:   seconds from tick start after which missing agents get `default_action`
+                       (None waits for every agent, bounded only by its decision budget)
+    - decision_budget: per-agent run limit in seconds, overridable per agent via `agent_budgets`
+    - apply_late:      a decision that finishes after its tick's deadline is applied on the next tick
+                       instead of being dropped; the agent is not re-run while it is still deciding
+    """
+    def __init__(self, tick_deadline: Optional[float] = None, decision_budget: float = DEFAULT_DECISION_BUDGET,
+                 agent_budgets: Dict[str, float] = None, apply_late: bool = False, default_action: dict = None):
+        self.tick_deadline = tick_deadline
+        self.decision_budget = decision_budget
+        self.agent_budgets = {str(k): float(v) for k, v in (agent_budgets or {}).items()}
+        self.apply_late = apply_late
+        self.default_action = default_action or {"action": "HOLD", "symbol": "BTCUSDT", "size": 0}
+
+    @classmethod
+    def from_competition(cls, competition) -> "DeadlinePolicy":
+        """Reads the optional `execution` block of a competition's input_schema."""
+        config = (competition.input_schema or {}).get("execution", {}) if competition is not None else {}
+        return cls(
+            tick_deadline=config.get("tick_deadline"),
+            decision_budget=config.get("decision_budget", DEFAULT_DECISION_BUDGET),
+            agent_budgets=config.get("agent_budgets"),
+            apply_late=bool(config.get("apply_late_decisions", False)),
+            default_action=config.get("default_action")
+        )
+
+    def budget_for(self, agent: dict) -> float:
+        """Agent dict override ("decision_budget"), then the competition's per-agent map, then the default."""
+        if agent.get("decision_budget") is not None:
+            return float(agent["decision_budget"])
+        return self.agent_budgets.get(str(agent["id"]), self.decision_budget)
+
+    def missed(self, reason: str) -> dict:
+        return {**self.default_action, "reason": reason}
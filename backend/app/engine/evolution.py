@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import math
+import random
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import numpy as np
+from sqlalchemy import bindparam
+from sqlalchemy.orm import Session
+from app.db import models
+from app.engine.batch_runner import BacktestJob, BatchBacktestRunner
+from app.engine.code_store import CodeStore, get_code_store
+from app.engine.manifest_v1 import runtime_options
+from app.engine.mutation import MutationEngine
+
+logger = logging.getLogger(__name__)
+
+FAILED_RETURN = -100.0 # return credited to a variant whose backtest failed
+
+class Fitness(NamedTuple):
+    seeds: int # markets the variant was scored on; early-stopped variants have fewer
+    mean_return: float
+
+    @property
+    def key(self):
+        """Variants that survived more stages rank above ones culled earlier, then by mean return."""
+        return (self.seeds, self.mean_return)
+
+class EvolutionEngine:
+    """
+    Genetic loop over agent strategies.
+    Each generation:
+    1. Fitness: every new variant is backtested through CompetitionExecutor (BatchBacktestRunner, pooled agents)
+       on the same seeded markets, which stay published in shared memory for the whole run. Scoring races in
+       stages of `seeds_per_stage` markets; after each stage the bottom `cull_fraction` and any variant whose
+       mean return is below `loss_cutoff` % stop early.
+    2. Selection: the top `elite` variants carry over; the rest of the next population are children of
+       parents picked by tournament selection (best of `tournament_size` random variants with audited code).
+    3. Variation: MutationEngine.mutate_many creates the children (validated, with lineage rows). Children are
+       created inactive and only join live competitions once their fitness beats their parent's.
+    """
+    def __init__(self, db: Session, mutation_engine: MutationEngine = None, runner: BatchBacktestRunner = None,
+                 population_size: int = 20, elite: int = 2, tournament_size: int = 3, seeds: Sequence[int] = range(8),
+                 seeds_per_stage: int = 2, cull_fraction: float = 0.5, loss_cutoff: float = -5.0, days: int = 3,
+                 interval: str = "1h", model: str = "gbm", owner_user: str = "system_evolution",
+                 store: CodeStore = None, rng_seed: int = None):
+        self.db = db
+        self.mutation = mutation_engine or MutationEngine(db)
+        self.runner = runner or BatchBacktestRunner(keep_markets=True)
+        self.population_size = population_size
+        self.elite = elite
+        self.tournament_size = tournament_size
+        self.seeds = list(seeds)
+        self.seeds_per_stage = seeds_per_stage
+        self.cull_fraction = cull_fraction
+        self.loss_cutoff = loss_cutoff
+        self.days = days
+        self.interval = interval
+        self.model = model
+        self.owner_user = owner_user
+        self.store = store or get_code_store()
+        self.code_hashes: Dict[str, Optional[str]] = {} # agent id -> code store blob hash
+        self.runtime: Dict[str, dict] = {} # agent id -> negotiated executor options (wire format, shared memory)
+        self.rng = random.Random(rng_seed)
+        self.fitness: Dict[str, Fitness] = {}
+        self.parents: Dict[str, str] = {} # child id -> parent id, for children not yet evaluated
+        self.generation = 0
+
+    def _agent(self, agent_id: str) -> dict:
+        code_hash = self.code_hashes[agent_id]
+        return {"id": agent_id, "path": self.store.path(code_hash), "code_hash": code_hash, **self.runtime[agent_id]}
+
+    def _resolve(self, agent_ids: List[str]):
+        """Looks up code hashes for agents not seen before (one query); call from the thread owning the session."""
+        unknown = [a for a in agent_ids if a not in self.code_hashes]
+        if unknown:
+            self.code_hashes.update(self.store.agent_hashes(self.db, unknown))
+            self.runtime.update(runtime_options(self.db, unknown))
+
+    def _stage_jobs(self, agent_ids: List[str], stage_seeds: List[int]) -> List[BacktestJob]:
+        """One job per (seed, chunk of variants), sized so the stage spreads over every worker."""
+        chunks = max(1, math.ceil(self.runner.max_workers / len(stage_seeds)))
+        jobs = []
+        for seed in stage_seeds:
+            for chunk in np.array_split(np.array(agent_ids, dtype=object), min(chunks, len(agent_ids))):
+                jobs.append(BacktestJob(
+                    f"evolution_gen{self.generation}_seed{seed}_{len(jobs)}", [self._agent(a) for a in chunk],
+                    seed=seed, days=self.days, interval=self.interval, model=self.model, pooled=True
+                ))
+        return jobs
+
+    def evaluate(self, agent_ids: List[str]) -> Dict[str, Fitness]:
+        """Races the variants over the seeded markets with early stopping (blocking; runs the process pool)."""
+        self._resolve(agent_ids)
+        returns = {agent_id: [] for agent_id in agent_ids}
+        alive = [a for a in agent_ids if self.code_hashes[a] is not None]
+        for missing in set(agent_ids) - set(alive):
+            returns[missing].append(FAILED_RETURN)
+
+        for start in range(0, len(self.seeds), self.seeds_per_stage):
+            if not alive:
+                break
+            stage_seeds = self.seeds[start:start + self.seeds_per_stage]
+            summary = self.runner.run(self._stage_jobs(alive, stage_seeds))
+            for row in summary.itertuples(index=False):
+                failed = isinstance(row.error, str) or row.failures > row.decisions // 2
+                returns[row.agent_id].append(FAILED_RETURN if failed else row.return_pct)
+
+            if start + self.seeds_per_stage >= len(self.seeds):
+                break
+            means = {a: float(np.mean(returns[a])) for a in alive}
+            ranked = sorted(alive, key=means.get, reverse=True)
+            keep = max(self.elite, math.ceil(len(ranked) * (1 - self.cull_fraction)))
+            culled = len(alive)
+            alive = [a for a in ranked[:keep] if means[a] > self.loss_cutoff]
+            logger.info(f"Evolution gen {self.generation}: {culled - len(alive)} variants stopped early after "
+                        f"{start + len(stage_seeds)} markets")
+
+        return {a: Fitness(len(r), float(np.mean(r))) for a, r in returns.items()}
+
+    def tournament_select(self, population: List[str]) -> str:
+        contenders = self.rng.sample(population, min(self.tournament_size, len(population)))
+        return max(contenders, key=lambda a: self.fitness[a].key)
+
+    def ranked(self, population: List[str]) -> List[str]:
+        return sorted(population, key=lambda a: self.fitness[a].key, reverse=True)
+
+    def _store_fitness(self, fitness: Dict[str, Fitness]):
+        table = models.AgentLineage.__table__
+        existing = {str(a) for (a,) in self.db.query(models.AgentLineage.agent_id)
+                    .filter(models.AgentLineage.agent_id.in_(list(fitness))).all()}
+        updates = [{"b_agent_id": a, "fitness": f.mean_return} for a, f in fitness.items() if a in existing]
+        inserts = [{"agent_id": a, "generation": 0, "origin": "submission", "fitness": f.mean_return}
+                   for a, f in fitness.items() if a not in existing]
+        if updates:
+            self.db.execute(table.update().where(table.c.agent_id == bindparam("b_agent_id")), updates)
+        if inserts:
+            self.db.execute(table.insert(), inserts)
+        self.db.commit()
+
+    async def _evaluate_new(self, population: List[str]):
+        new = [a for a in population if a not in self.fitness]
+        if new:
+            self._resolve(new)
+            fitness = await asyncio.to_thread(self.evaluate, new)
+            self.fitness.update(fitness)
+            self._store_fitness(fitness)
+            self._activate_improved(new)
+
+    def _activate_improved(self, evaluated: List[str]):
+        """Activates the evaluated children that beat their parent; the others stay inactive."""
+        improved = []
+        for child in evaluated:
+            parent = self.parents.pop(child, None)
+            if parent is not None and self.fitness[child].key > self.fitness[parent].key:
+                improved.append(child)
+        if improved:
+            self.db.query(models.Agent).filter(models.Agent.id.in_(improved))\
+                .update({models.Agent.is_active: True}, synchronize_session=False)
+            self.db.commit()
+            logger.info(f"Evolution gen {self.generation}: {len(improved)} children beat their parent and were activated")
+
+    async def step(self, population: List[str]) -> List[str]:
+        """Evaluates, selects and breeds one generation; returns the next population."""
+        await self._evaluate_new(population)
+        ranked = self.ranked(population)
+        best = self.fitness[ranked[0]]
+        logger.info(f"Evolution gen {self.generation}: best {ranked[0]} {best.mean_return:.2f}% over {best.seeds} markets")
+
+        elites = ranked[:self.elite]
+        # Children of agents without audited code could never be backtested
+        breeders = [a for a in population if self.code_hashes.get(a) is not None]
+        parents = []
+        if breeders:
+            parents = [self.tournament_select(breeders) for _ in range(self.population_size - len(elites))]
+        else:
+            logger.warning(f"Evolution gen {self.generation}: no agent with audited code to breed from")
+        picks = {}
+        variations = []
+        for parent in parents:
+            picks[parent] = picks.get(parent, 0) + 1
+            variations.append(f"{self.generation}.{picks[parent]}")
+        results = await self.mutation.mutate_many(parents, self.owner_user, variations, active=False) if parents else []
+        children = []
+        for parent, (new_agent, _) in zip(parents, results):
+            if new_agent is not None:
+                children.append(str(new_agent.id))
+                self.parents[str(new_agent.id)] = parent
+        failed = len(parents) - len(children)
+        if failed:
+            logger.warning(f"Evolution gen {self.generation}: {failed}/{len(parents)} mutations rejected")
+        # Rejected children are replaced by the next-best survivors
+        survivors = [a for a in ranked[self.elite:] if a not in children]
+        self.generation += 1
+        return elites + children + survivors[:max(0, self.population_size - len(elites) - len(children))]
+
+    async def run(self, population: List[str], generations: int = 5) -> List[str]:
+        """Evolves `population` (agent ids) for `generations` and returns the final population, best first."""
+        population = [str(a) for a in population]
+        try:
+            for _ in range(generations):
+                population = await self.step(population)
+            await self._evaluate_new(population)
+            return self.ranked(population)
+        finally:
+            self.runner.close()
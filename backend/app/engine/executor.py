@@ -1,33 +1,76 @@
 import asyncio
 import subprocess
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import datetime
 from sqlalchemy.orm import Session
 from app.engine.matcher import MatchingEngine
 from app.engine.narrator import PostMatchNarrator
+from app.engine.market_history import MarketHistory
+from app.engine.shared_market import SharedMarketBuffer
+from app.engine import wire
+from app.engine.agent_pool import AgentWorkerPool
+from app.engine.zygote import get_zygote, run_process
+from app.engine.telemetry import get_competition_telemetry
+from app.engine.deadline import DeadlinePolicy, DEFAULT_DECISION_BUDGET
 from app.db import models
 
 class CompetitionExecutor:
-    def __init__(self, db: Session, competition_id: str, market_data: pd.DataFrame, agents: list):
-        self.db = db
+    def __init__(self, db: Session, competition_id: str, market_data: pd.DataFrame, agents: list, worker_pool: AgentWorkerPool = None,
+                 deadline_policy: DeadlinePolicy = None):
+        self.db = db # None runs without persisting decisions, snapshots or narratives (batch backtests)
         self.competition_id = competition_id
         self.market_data = market_data
-        self.agents = agents  # list of dict: {"id": str, "path": str}
+        # list of dict: {"id": str, "path": str, "shared_memory": bool, "wire_format": str, "decision_budget": float} (all but id/path optional)
+        self.agents = agents
         self.engines = {agent["id"]: MatchingEngine() for agent in agents}
         self.step = 0
+        # Agents loaded into this pool run in-process in a pre-forked worker instead of a fresh interpreter
+        self.worker_pool = worker_pool
+        self.shared_market = None
+        self._encoded_for = None # tick_data the cached encodings belong to
+        self._encoded = {}
+        # Per-agent latency/resource counters, shared with the telemetry API
+        self.telemetry = get_competition_telemetry(competition_id)
+        # Tick deadline / per-agent budgets, from the competition's `execution` block unless given explicitly
+        if deadline_policy is None and db is not None:
+            competition = db.query(models.Competition).filter(models.Competition.slug == str(competition_id)).first()
+            deadline_policy = DeadlinePolicy.from_competition(competition)
+        self.deadline_policy = deadline_policy or DeadlinePolicy()
+        self._late = {} # agent_id -> (task, step) for runs that missed their tick's deadline
+        # Threads that wait on agent processes: one per agent (an agent never has two runs in flight),
+        # so a large field is not capped by the loop's default executor
+        self._threads = None
 
     async def run(self):
         """
         Main simulation loop
         """
+        # Agents that opted into shared memory map the history once instead of receiving it per tick;
+        # rows are revealed tick by tick so the mapping never shows future bars
+        if any(agent.get("shared_memory") for agent in self.agents):
+            self.shared_market = SharedMarketBuffer(self.market_data, name=str(self.competition_id), visible=0)
+        await self._warm_up()
+        try:
+            return await self._run_loop()
+        finally:
+            await self._drain_late_decisions()
+            self._close_threads()
+            if self.shared_market is not None:
+                self.shared_market.close()
+                self.shared_market = None
+
+    async def _run_loop(self):
         for index, row in self.market_data.iterrows():
             self.step = index
+            if self.shared_market is not None:
+                self.shared_market.publish(index)
             tick_data = self._prepare_tick_data(row)
             
-            # Run agents concurrently
-            tasks = [self._get_agent_decision(agent, tick_data) for agent in self.agents]
-            decisions = await asyncio.gather(*tasks)
+            # Run agents concurrently, bounded by the tick deadline
+            decisions = await self._collect_decisions(tick_data)
             
             for agent, decision in zip(self.agents, decisions):
                 self._process_decision(agent["id"], decision, row["close"])
@@ -39,6 +82,8 @@ class CompetitionExecutor:
                 self._save_snapshots()
             
         # Phase 2: Generate Post-Match Narratives
+        if self.db is None:
+            return self._get_results()
         narrator = PostMatchNarrator(self.db)
         for agent in self.agents:
             report = narrator.generate_report(agent["id"], self.competition_id)
@@ -62,30 +107,153 @@ class CompetitionExecutor:
             "account": {} # Will be filled per agent in _get_agent_decision if needed
         }
 
-    async def _get_agent_decision(self, agent, tick_data):
+    def _encode_tick(self, agent, tick_data):
         """
-        Execute agent as a subprocess (Phase 1)
+        Wire payload for one agent. For JSON, everything except the account is encoded once per tick and shared.
+        Shared-memory agents get the step index and buffer descriptor in place of OHLCV rows.
         """
+        if tick_data is not self._encoded_for:
+            self._encoded_for = tick_data
+            self._encoded = {}
+
+        fmt = agent.get("wire_format", "json")
+        if fmt != "json":
+            return wire.encode_tick(fmt, {**tick_data, "account": self.engines[agent["id"]].get_state()})
+
+        use_shm = bool(agent.get("shared_memory")) and self.shared_market is not None and "market" in tick_data
+        prefix = self._encoded.get(use_shm)
+        if prefix is None:
+            body = {k: v for k, v in tick_data.items() if k != "account"}
+            if use_shm:
+                body["market"] = {
+                    "symbol": tick_data["market"]["symbol"],
+                    "step": self.step,
+                    "shm": self.shared_market.descriptor
+                }
+            prefix = json.dumps(body)[:-1]
+            self._encoded[use_shm] = prefix
+
         # Add account info specific to this agent
-        engine = self.engines[agent["id"]]
-        tick_data["account"] = engine.get_state()
-        
+        account = self.engines[agent["id"]].get_state()
+        return f'{prefix}, "account": {json.dumps(account)}}}\n'.encode()
+
+    def _agent_threads(self) -> ThreadPoolExecutor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=max(1, len(self.agents)), thread_name_prefix="agent-run")
+        return self._threads
+
+    def _close_threads(self):
+        if self._threads is not None:
+            self._threads.shutdown(wait=False)
+            self._threads = None
+
+    async def _warm_up(self):
+        """Start the zygote off the event loop so its startup doesn't eat into the first tick's deadline."""
+        if any(self.worker_pool is None or agent["id"] not in self.worker_pool for agent in self.agents):
+            await asyncio.to_thread(get_zygote)
+
+    async def _collect_decisions(self, tick_data):
+        """
+        Decisions for all agents, in self.agents order, within the policy's tick deadline.
+        Agents that miss it get the default action; their run keeps going up to its own budget and,
+        with apply_late, its answer is used on the first tick after it arrives.
+        """
+        policy = self.deadline_policy
+        decisions, tasks = {}, {}
+        for agent in self.agents:
+            agent_id = agent["id"]
+            late = self._late.get(agent_id)
+            if late is not None:
+                task, issued_step = late
+                if not task.done():
+                    # Still deciding on an earlier tick; don't stack another run on top of it
+                    decisions[agent_id] = policy.missed("Still deciding on an earlier tick")
+                    continue
+                del self._late[agent_id]
+                # Retrieving the exception here keeps a failed late run from surfacing as "never retrieved"
+                error = None if task.cancelled() else task.exception()
+                if policy.apply_late and not task.cancelled():
+                    if error is None:
+                        decisions[agent_id] = {**task.result(), "late_ticks": self.step - issued_step}
+                    else:
+                        decisions[agent_id] = policy.missed(f"Late decision failed: {error}")
+                    continue
+            tasks[agent_id] = asyncio.ensure_future(self._get_agent_decision(agent, tick_data, policy.budget_for(agent)))
+
+        if tasks:
+            await asyncio.wait(tasks.values(), timeout=policy.tick_deadline)
+        for agent_id, task in tasks.items():
+            if task.done():
+                error = task.exception()
+                decisions[agent_id] = task.result() if error is None else policy.missed(f"Decision failed: {error}")
+            else:
+                self._late[agent_id] = (task, self.step)
+                self.telemetry.record_deadline_miss(agent_id)
+                decisions[agent_id] = policy.missed(f"Missed the {policy.tick_deadline}s tick deadline")
+        return [decisions[agent["id"]] for agent in self.agents]
+
+    async def _drain_late_decisions(self):
+        """Wait for runs still in flight (each bounded by its budget) so nothing outlives the competition."""
+        if self._late:
+            await asyncio.gather(*(task for task, _ in self._late.values()), return_exceptions=True)
+            self._late.clear()
+
+    async def _get_agent_decision(self, agent, tick_data, budget: float = DEFAULT_DECISION_BUDGET):
+        """
+        Decision for one agent, recorded in the competition's telemetry.
+        Agents throttled for repeated failures or slowness get a HOLD without being run.
+        """
+        step = self.step
+        if self.telemetry.is_throttled(agent["id"], step):
+            return self._fallback_decision("Throttled: repeated timeouts, crashes or slow decisions")
+        started = time.perf_counter()
+        decision, sample = await self._run_agent(agent, tick_data, budget)
+        if sample.get("latency") is None:
+            sample["latency"] = time.perf_counter() - started
+        self.telemetry.record(agent["id"], step, **sample)
+        return decision
+
+    def _fallback_decision(self, reason):
+        return self.deadline_policy.missed(reason)
+
+    async def _run_agent(self, agent, tick_data, budget: float):
+        """
+        Execute agent as a subprocess (Phase 1), or in the worker pool when it hosts the agent.
+        Subprocess runs are limited to `budget` seconds; pooled agents use the pool's call_timeout.
+        Returns (decision, telemetry sample).
+        """
+        if self.worker_pool is not None and agent["id"] in self.worker_pool:
+            result = await self.worker_pool.decide(agent["id"], {**tick_data, "account": self.engines[agent["id"]].get_state()})
+            sample = {"outcome": result["outcome"], "latency": result["latency"], "cpu_time": result["cpu_time"],
+                      "peak_rss_kb": result["max_rss_kb"]}
+            if result["error"]:
+                print(f"Failed to get decision from {agent['id']}: {result['error']}")
+                return self._fallback_decision(f"Error: {result['error']}"), sample
+            return result["decision"], sample
+
+        payload = self._encode_tick(agent, tick_data)
+
+        # Both paths block in one of the executor's agent threads, so agents run concurrently and the tick deadline holds
+        loop = asyncio.get_running_loop()
+        zygote = get_zygote()
+        if zygote is not None:
+            # Forked from the pre-warmed zygote
+            result = await loop.run_in_executor(self._agent_threads(), zygote.run, agent["path"], payload, budget)
+        else:
+            result = await loop.run_in_executor(self._agent_threads(), run_process, ["python", agent["path"]], payload, budget)
+        sample = {"cpu_time": result.cpu_time, "peak_rss_kb": result.max_rss_kb,
+                  "bytes_in": len(payload), "bytes_out": len(result.stdout)}
+        if result.stderr:
+            print(f"Agent {agent['id']} error: {result.stderr.decode(errors='replace')}")
         try:
-            # Simple subprocess call for Python agents
-            process = subprocess.Popen(
-                ["python", agent["path"]],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            stdout, stderr = process.communicate(input=json.dumps(tick_data) + "\n", timeout=2)
-            if stderr:
-                print(f"Agent {agent['id']} error: {stderr}")
-            return json.loads(stdout)
+            if result.timed_out:
+                raise TimeoutError(f"Agent timed out after {budget} seconds")
+            decision = wire.decode_decision(agent.get("wire_format", "json"), result.stdout)
+            return decision, {**sample, "outcome": "ok"}
         except Exception as e:
             print(f"Failed to get decision from {agent['id']}: {e}")
-            return {"action": "HOLD", "symbol": "BTCUSDT", "size": 0, "reason": f"Error: {e}"}
+            outcome = "timeout" if result.timed_out else "crash" if result.returncode != 0 else "error"
+            return self._fallback_decision(f"Error: {e}"), {**sample, "outcome": outcome}
 
     def _process_decision(self, agent_id, decision, current_price):
         engine = self.engines[agent_id]
@@ -97,6 +265,8 @@ class CompetitionExecutor:
         )
 
     def _log_decision(self, agent_id, decision):
+        if self.db is None:
+            return
         db_log = models.DecisionLog(
             agent_id=agent_id,
             competition_id=self.competition_id,
@@ -110,6 +280,8 @@ class CompetitionExecutor:
             engine.update_equity({"BTCUSDT": current_price})
 
     def _save_snapshots(self):
+        if self.db is None:
+            return
         for agent_id, engine in self.engines.items():
             state = engine.get_state()
             # Simplified Sharpe/MaxDD for MVP snapshot
@@ -130,10 +302,14 @@ class CompetitionExecutor:
         return {agent_id: engine.get_state() for agent_id, engine in self.engines.items()}
 
 class LiveCompetitionExecutor(CompetitionExecutor):
-    def __init__(self, db: Session, competition_id: str, agents: list):
+    def __init__(self, db: Session, competition_id: str, agents: list, market_history: MarketHistory = None, lookback: int = 60,
+                 worker_pool: AgentWorkerPool = None, deadline_policy: DeadlinePolicy = None):
         # No market_data needed as it's live
-        super().__init__(db, competition_id, pd.DataFrame(), agents)
+        super().__init__(db, competition_id, pd.DataFrame(), agents, worker_pool=worker_pool, deadline_policy=deadline_policy)
         self.is_running = False
+        # Shared with LiveMarketDataService.history to expose recent bars to agents
+        self.market_history = market_history
+        self.lookback = lookback
 
     async def handle_tick(self, tick: dict):
         """
@@ -160,13 +336,19 @@ class LiveCompetitionExecutor(CompetitionExecutor):
             },
             "market_snapshot": {
                 "price": current_price,
-                "timestamp": tick["timestamp"]
+                "timestamp": tick["timestamp"],
+                "bar": list(tick["bar"]) if tick.get("bar") is not None else None
             }
         }
+        if tick.get("ohlcv") is not None:
+            # Bars captured by the feed with this tick: the shared history may already be further ahead
+            tick_data["market_snapshot"]["ohlcv"] = [list(bar) for bar in tick["ohlcv"][-self.lookback:]]
+        elif self.market_history is not None and tick["symbol"] in self.market_history:
+            bars = self.market_history[tick["symbol"]].bars(self.lookback)
+            tick_data["market_snapshot"]["ohlcv"] = bars.tolist()
 
-        # Run agents concurrently
-        tasks = [self._get_agent_decision(agent, tick_data) for agent in self.agents]
-        decisions = await asyncio.gather(*tasks)
+        # Run agents concurrently, bounded by the tick deadline
+        decisions = await self._collect_decisions(tick_data)
         
         for agent, decision in zip(self.agents, decisions):
             self._process_decision(agent["id"], decision, current_price)
@@ -199,9 +381,11 @@ class LiveCompetitionExecutor(CompetitionExecutor):
         print(f"Live Social Post: {content}")
 
     async def start(self):
+        await self._warm_up()
         self.is_running = True
         print(f"Live Competition {self.competition_id} is now ACTIVE.")
 
     def stop(self):
         self.is_running = False
+        self._close_threads()
         print(f"Live Competition {self.competition_id} has STOPPED.")
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import math
+from typing import List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+from app.db import models
+from app.engine.adversarial import AdversarialEngine, DuelOutcome
+from app.engine.bracket import Decider, RUN_ONCE_STATUSES, decision_snapshot
+from app.engine.data_service import DataService
+from app.engine.settlement import directional_pnl
+
+logger = logging.getLogger(__name__)
+
+class LeagueTable:
+    """
+    Dense pairwise results for a fixed set of agents, updated incrementally per round.
+    - games[i, j]:    meetings between i and j
+    - wins[i, j]:     meetings i won against j (draws are games - wins - wins.T)
+    - pnl_diff[i, j]: cumulative PnL of i minus PnL of j over their meetings (antisymmetric)
+    Points: win 1, draw 0.5, bye 1. Tiebreaks (in order): Buchholz (opponents' points),
+    Sonneborn-Berger (points of the opponents one scored against), total PnL differential.
+    """
+    def __init__(self, agent_ids: List[str]):
+        self.agent_ids = list(agent_ids)
+        self.index = {agent_id: i for i, agent_id in enumerate(self.agent_ids)}
+        n = len(self.agent_ids)
+        self.games = np.zeros((n, n), dtype=np.int16)
+        self.wins = np.zeros((n, n), dtype=np.int16)
+        self.pnl_diff = np.zeros((n, n), dtype=np.float32)
+        self.points = np.zeros(n)
+        self.byes = np.zeros(n, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.agent_ids)
+
+    def record_round(self, a: np.ndarray, b: np.ndarray, pnl_a: np.ndarray, pnl_b: np.ndarray):
+        """Apply one batch of meetings (index arrays a, b) and their PnLs."""
+        diff = pnl_a - pnl_b
+        score_a = np.where(diff > 0, 1.0, np.where(diff < 0, 0.0, 0.5))
+        np.add.at(self.games, (a, b), 1)
+        np.add.at(self.games, (b, a), 1)
+        np.add.at(self.wins, (a, b), (diff > 0).astype(np.int16))
+        np.add.at(self.wins, (b, a), (diff < 0).astype(np.int16))
+        np.add.at(self.pnl_diff, (a, b), diff.astype(np.float32))
+        np.add.at(self.pnl_diff, (b, a), -diff.astype(np.float32))
+        n = len(self)
+        self.points += np.bincount(a, score_a, n) + np.bincount(b, 1.0 - score_a, n)
+
+    def record_byes(self, idx: np.ndarray):
+        self.byes[idx] += 1
+        self.points[idx] += 1.0
+
+    def tiebreaks(self):
+        games = self.games.astype(np.float64)
+        wins = self.wins.astype(np.float64)
+        buchholz = games @ self.points
+        # Score matrix = wins + draws / 2 = (games + wins - wins.T) / 2
+        sonneborn_berger = 0.5 * (games + wins - wins.T) @ self.points
+        return buchholz, sonneborn_berger, self.pnl_diff.sum(axis=1, dtype=np.float64)
+
+    def ranking(self) -> np.ndarray:
+        """Agent indices, best first."""
+        buchholz, sonneborn_berger, pnl = self.tiebreaks()
+        return np.lexsort((-pnl, -sonneborn_berger, -buchholz, -self.points))
+
+    def standings(self) -> pd.DataFrame:
+        buchholz, sonneborn_berger, pnl = self.tiebreaks()
+        wins = self.wins.sum(axis=1)
+        losses = self.wins.sum(axis=0)
+        order = self.ranking()
+        table = pd.DataFrame({
+            "agent_id": self.agent_ids,
+            "points": self.points,
+            "played": self.games.sum(axis=1),
+            "wins": wins,
+            "draws": self.games.sum(axis=1) - wins - losses,
+            "losses": losses,
+            "byes": self.byes,
+            "buchholz": buchholz,
+            "sonneborn_berger": sonneborn_berger,
+            "pnl_diff": pnl
+        }).iloc[order].reset_index(drop=True)
+        table.insert(0, "rank", np.arange(1, len(table) + 1))
+        return table
+
+def round_robin_pairings(n: int, round_no: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Circle-method pairings for round `round_no` (0-based, n-1 rounds for even n, n for odd).
+    Returns index arrays (a, b, bye).
+    """
+    m = n + (n % 2)
+    slots = np.concatenate(([0], np.roll(np.arange(1, m), round_no)))
+    a, b = slots[:m // 2], slots[::-1][:m // 2]
+    real = (a < n) & (b < n)
+    bye = np.concatenate((a[b >= n], b[a >= n]))
+    return a[real], b[real], bye
+
+def swiss_pairings(table: LeagueTable) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pairs agents in standings order with the next agent they have not met yet (falling back to a rematch).
+    With an odd count, the lowest-ranked agent with the fewest byes sits out.
+    """
+    order = list(table.ranking())
+    bye = []
+    if len(order) % 2:
+        candidate = min(reversed(order), key=lambda i: table.byes[i])
+        order.remove(candidate)
+        bye.append(candidate)
+
+    a, b = [], []
+    unpaired = order
+    while unpaired:
+        first, rest = unpaired[0], unpaired[1:]
+        partner = next((j for j in rest if table.games[first, j] == 0), rest[0])
+        a.append(first)
+        b.append(partner)
+        unpaired = [i for i in rest if i != partner]
+    return np.array(a, dtype=np.int64), np.array(b, dtype=np.int64), np.array(bye, dtype=np.int64)
+
+class LeagueEngine:
+    """
+    Round-robin or Swiss league on top of the duel settlement.
+    Each round samples `paths_per_round` shared price paths. Every agent in the round decides once per
+    path (concurrently, independent of its opponent), and its PnL per path comes from the same
+    directional_pnl rule as AdversarialEngine. Every pairing in the round is then scored in one vectorized
+    step from the summed PnLs and applied to a LeagueTable, so standings never re-read duel_results.
+    Meetings are persisted as TournamentBracket rows (winner None on a draw) and decisive meetings also
+    as DuelResult rows, once per round.
+    """
+    def __init__(self, db: Session, decide: Decider, format: str = "swiss", paths_per_round: int = 4,
+                 data_service: DataService = None, interval: str = "1h", lookback: int = 60, horizon: int = 24):
+        if format not in ("swiss", "round_robin"):
+            raise ValueError(f"Unknown league format: {format}")
+        self.db = db
+        self.decide = decide
+        self.format = format
+        self.paths_per_round = paths_per_round
+        self.adversarial = AdversarialEngine(db)
+        self.data_service = data_service or DataService()
+        self.interval = interval
+        self.lookback = lookback
+        self.horizon = horizon
+
+    def default_rounds(self, n: int) -> int:
+        if self.format == "round_robin":
+            return n - 1 + (n % 2)
+        return max(1, math.ceil(math.log2(max(n, 2))))
+
+    async def _round_pnl(self, league_id: int, round_no: int, agent_ids: List[str]) -> np.ndarray:
+        """Summed PnL of each agent over the round's shared price paths."""
+        pnl = np.zeros(len(agent_ids))
+        for path in range(self.paths_per_round):
+            tick, price_start, price_end = decision_snapshot(
+                self.data_service, f"league-{league_id}-round-{round_no}-path-{path}",
+                self.interval, self.lookback, self.horizon
+            )
+            decisions = await asyncio.gather(*(self.decide(agent_id, tick) for agent_id in agent_ids))
+            pnl += [
+                directional_pnl(d.get("action", "WAIT"), d.get("stake", 0) or 0, price_start, price_end)
+                for d in decisions
+            ]
+        return pnl
+
+    async def play_round(self, league: models.Tournament, table: LeagueTable, round_no: int):
+        if self.format == "round_robin":
+            a, b, bye = round_robin_pairings(len(table), round_no - 1)
+        else:
+            a, b, bye = swiss_pairings(table)
+
+        players = np.concatenate((a, b))
+        pnl = np.zeros(len(table))
+        pnl[players] = await self._round_pnl(league.id, round_no, [table.agent_ids[i] for i in players])
+        table.record_round(a, b, pnl[a], pnl[b])
+        table.record_byes(bye)
+
+        competition_id = f"league-{league.id}-round-{round_no}"
+        ids = table.agent_ids
+        diff = pnl[a] - pnl[b]
+        rows, outcomes = [], []
+        for match_id, (i, j, d) in enumerate(zip(a, b, diff)):
+            winner = ids[i] if d > 0 else ids[j] if d < 0 else None
+            rows.append(models.TournamentBracket(
+                tournament_id=league.id, round=round_no, match_id=match_id,
+                agent_a_id=ids[i], agent_b_id=ids[j], winner_id=winner, competition_id=competition_id
+            ))
+            if winner is not None:
+                loser = ids[j] if winner == ids[i] else ids[i]
+                outcomes.append(DuelOutcome(winner, loser, abs(float(d)), float(pnl[i]), float(pnl[j])))
+        for match_id, i in enumerate(bye, start=len(rows)):
+            rows.append(models.TournamentBracket(
+                tournament_id=league.id, round=round_no, match_id=match_id,
+                agent_a_id=ids[i], agent_b_id=None, winner_id=ids[i], competition_id=competition_id
+            ))
+        self.db.add_all(rows)
+        self.adversarial.record_duel_results(competition_id, outcomes)
+        self.db.commit()
+
+    async def run(self, league: models.Tournament, agent_ids: List[str], rounds: Optional[int] = None) -> LeagueTable:
+        table = LeagueTable(agent_ids)
+        if len(table) < 2:
+            return table
+        if league.status in RUN_ONCE_STATUSES:
+            raise ValueError(f"League {league.id} is {league.status}")
+        rounds = rounds or self.default_rounds(len(table))
+        league.status = "RUNNING"
+        self.db.commit()
+        try:
+            for round_no in range(1, rounds + 1):
+                await self.play_round(league, table, round_no)
+                logger.info(f"League {league.id} round {round_no}/{rounds} played")
+        except Exception:
+            self.db.rollback()
+            league.status = "FAILED"
+            self.db.commit()
+            raise
+        league.status = "COMPLETED"
+        self.db.commit()
+        return table
@@ -0,0 +1,77 @@
+from typing import Optional
+from sqlalchemy import literal, select
+from sqlalchemy.orm import Session
+from app.db import models
+
+def generation_of(db: Session, agent_id) -> int:
+    """Generation of an agent; agents without a lineage row are roots (generation 0)."""
+    generation = db.query(models.AgentLineage.generation).filter(models.AgentLineage.agent_id == agent_id).scalar()
+    return generation or 0
+
+def _ensure_node(db: Session, agent_id):
+    table = models.AgentAncestry.__table__
+    exists = db.query(table.c.depth)\
+        .filter(table.c.ancestor_id == agent_id, table.c.descendant_id == agent_id)\
+        .first()
+    if exists is None:
+        db.execute(table.insert().values(ancestor_id=agent_id, descendant_id=agent_id, depth=0))
+
+def record_birth(db: Session, agent_id, parent_id: Optional[object], origin: str) -> models.AgentLineage:
+    """
+    Stages the lineage row for a new agent (one generation below its parent) and its closure rows:
+    itself at depth 0 plus each of the parent's ancestors one level deeper, copied in one INSERT ... SELECT.
+    The caller commits.
+    """
+    # The session does not autoflush: a parent born earlier in this transaction must be visible to generation_of
+    db.flush()
+    row = models.AgentLineage(
+        agent_id=agent_id,
+        parent_agent_id=parent_id,
+        generation=generation_of(db, parent_id) + 1 if parent_id is not None else 0,
+        origin=origin
+    )
+    db.add(row)
+
+    table = models.AgentAncestry.__table__
+    if parent_id is not None:
+        _ensure_node(db, parent_id)
+        db.execute(table.insert().from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(table.c.ancestor_id, literal(agent_id, models.GUID()), table.c.depth + 1)
+            .where(table.c.descendant_id == parent_id)
+        ))
+    db.execute(table.insert().values(ancestor_id=agent_id, descendant_id=agent_id, depth=0))
+    return row
+
+def rebuild_ancestry(db: Session) -> int:
+    """
+    Rebuilds agent_ancestry from the parent links in agent_lineage (one INSERT ... SELECT per depth level).
+    Returns the number of closure rows.
+    """
+    table = models.AgentAncestry.__table__
+    lineage = models.AgentLineage.__table__
+    db.execute(table.delete())
+    roots = select(lineage.c.parent_agent_id).where(
+        lineage.c.parent_agent_id.isnot(None),
+        lineage.c.parent_agent_id.notin_(select(lineage.c.agent_id))
+    ).distinct().subquery()
+    db.execute(table.insert().from_select(
+        ["ancestor_id", "descendant_id", "depth"], select(lineage.c.agent_id, lineage.c.agent_id, literal(0))
+    ))
+    db.execute(table.insert().from_select(
+        ["ancestor_id", "descendant_id", "depth"],
+        select(roots.c.parent_agent_id, roots.c.parent_agent_id, literal(0))
+    ))
+    depth = 0
+    while True:
+        inserted = db.execute(table.insert().from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(table.c.ancestor_id, lineage.c.agent_id, table.c.depth + 1)
+            .join(lineage, lineage.c.parent_agent_id == table.c.descendant_id)
+            .where(table.c.depth == depth)
+        )).rowcount
+        if not inserted:
+            break
+        depth += 1
+    db.commit()
+    return db.query(table).count()
@@ -1,47 +1,168 @@
 import asyncio
 import random
 import datetime
-from typing import Dict, List, Callable
+import logging
+import math
+from collections import OrderedDict, deque
+from typing import Dict, List, Callable, Optional
+from app.engine.market_history import MarketHistory, ReplayTickSource
+
+logger = logging.getLogger(__name__)
+
+class TickSubscription:
+    """
+    Bounded per-subscriber inbox. The feed never waits on a subscriber:
+    - "drop_oldest": keep the newest `max_pending` ticks, discarding the oldest when full.
+    - "conflate": keep only the latest tick per symbol, stale prices are overwritten.
+    """
+    def __init__(self, callback: Callable, max_pending: int = 16, policy: str = "drop_oldest"):
+        if policy not in ("drop_oldest", "conflate"):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.callback = callback
+        self.max_pending = max_pending
+        self.policy = policy
+        self.dropped = 0
+        self._pending = OrderedDict() if policy == "conflate" else deque()
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def push(self, tick: dict):
+        if self.policy == "conflate":
+            if tick["symbol"] in self._pending:
+                self.dropped += 1
+                del self._pending[tick["symbol"]]
+            self._pending[tick["symbol"]] = tick
+        else:
+            if len(self._pending) >= self.max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            self._pending.append(tick)
+        self._ready.set()
+
+    def _pop(self):
+        if self.policy == "conflate":
+            return self._pending.popitem(last=False)[1]
+        return self._pending.popleft()
+
+    async def _consume(self):
+        while True:
+            await self._ready.wait()
+            while self._pending:
+                tick = self._pop()
+                try:
+                    if asyncio.iscoroutinefunction(self.callback):
+                        await self.callback(tick)
+                    else:
+                        self.callback(tick)
+                except Exception as e:
+                    logger.error(f"Subscriber {getattr(self.callback, '__qualname__', self.callback)} failed: {e}")
+            self._ready.clear()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._consume())
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
 
 class LiveMarketDataService:
     """
     Simulated live market data service that broadcasts price updates to subscribers.
+    Each subscriber drains its own bounded inbox in a separate task, so a slow
+    subscriber only falls behind itself and the tick clock keeps a fixed rate.
+    Every tick is recorded into `history` before fan-out and carries its current bar plus the last `bar_window`
+    bars ("ohlcv") as of that tick, so a subscriber that lags behind still sees bars consistent with its price.
+    Nested tick values are tuples and each inbox gets its own tick dict: a subscriber cannot alter another's ticks.
     """
-    def __init__(self, symbols: List[str]):
-        self.symbols = symbols
-        self.prices = {symbol: 40000.0 for symbol in symbols}
+    def __init__(self, symbols: List[str], interval_seconds: float = 1.0, source: Optional[ReplayTickSource] = None,
+                 history: Optional[MarketHistory] = None, bar_window: int = 60):
+        self.source = source
+        self.symbols = symbols or (source.symbols if source else [])
+        self.interval_seconds = interval_seconds
+        self.prices = {symbol: 40000.0 for symbol in self.symbols}
+        self.history = history or MarketHistory(self.symbols)
+        self.bar_window = bar_window
         self.subscribers: List[Callable] = []
+        self._subscriptions: Dict[Callable, TickSubscription] = {}
         self._running = False
 
+    def _simulate_frame(self):
+        frame = []
+        for symbol in self.symbols:
+            # Random walk simulation
+            change = random.normalvariate(0, 0.0005)
+            self.prices[symbol] *= (1 + change)
+
+            frame.append({
+                "symbol": symbol,
+                "price": self.prices[symbol],
+                "timestamp": datetime.datetime.utcnow().isoformat()
+            })
+        return frame
+
     async def start(self):
         self._running = True
         print(f"Live Market Data Service started for {self.symbols}")
+        for sub in self._subscriptions.values():
+            sub.start()
+
+        frames = self.source.frames() if self.source else None
+        loop = asyncio.get_running_loop()
+        next_tick_at = loop.time()
         while self._running:
-            for symbol in self.symbols:
-                # Random walk simulation
-                change = random.normalvariate(0, 0.0005)
-                self.prices[symbol] *= (1 + change)
-                
-                tick = {
-                    "symbol": symbol,
-                    "price": self.prices[symbol],
-                    "timestamp": datetime.datetime.utcnow().isoformat()
-                }
-                
-                # Broadcast to all subscribers
-                for callback in self.subscribers:
-                    if asyncio.iscoroutinefunction(callback):
-                        await callback(tick)
-                    else:
-                        callback(tick)
-            
-            await asyncio.sleep(1) # 1Hz updates
+            if frames is not None:
+                frame = next(frames, None)
+                if frame is None:
+                    print("Replay source exhausted.")
+                    break
+            else:
+                frame = self._simulate_frame()
+
+            for tick in frame:
+                self.prices[tick["symbol"]] = tick["price"]
+                tick["bar"] = tuple(self.history.record(tick))
+                tick["ohlcv"] = tuple(map(tuple, self.history[tick["symbol"]].bars(self.bar_window).tolist()))
+                self.publish(tick)
+
+            # Fixed-rate clock: sleep only for what is left of the interval
+            next_tick_at += self.interval_seconds
+            delay = next_tick_at - loop.time()
+            if delay < 0 and self.interval_seconds > 0:
+                # Processing overran the interval: skip the slots already missed and wait for the next one
+                # on the same grid, so late ticks are not emitted back to back to catch up
+                missed = math.ceil(-delay / self.interval_seconds)
+                logger.warning(f"Market data clock behind by {-delay:.3f}s, skipping {missed} tick slot(s).")
+                next_tick_at += missed * self.interval_seconds
+                delay = next_tick_at - loop.time()
+            await asyncio.sleep(max(delay, 0))
+
+    def publish(self, tick: dict):
+        """Non-blocking fan-out to every subscriber inbox, each getting its own copy of the tick."""
+        for sub in self._subscriptions.values():
+            sub.push(dict(tick))
 
     def stop(self):
         self._running = False
+        for sub in self._subscriptions.values():
+            sub.cancel()
 
-    def subscribe(self, callback: Callable):
-        self.subscribers.append(callback)
+    def subscribe(self, callback: Callable, max_pending: int = 16, policy: str = "drop_oldest"):
+        """Subscribing a callback again replaces its earlier subscription (and drops that inbox)."""
+        previous = self._subscriptions.get(callback)
+        if previous is not None:
+            previous.cancel()
+        else:
+            self.subscribers.append(callback)
+        sub = TickSubscription(callback, max_pending=max_pending, policy=policy)
+        self._subscriptions[callback] = sub
+        if self._running:
+            sub.start()
+        return sub
 
     def unsubscribe(self, callback: Callable):
         self.subscribers.remove(callback)
+        sub = self._subscriptions.pop(callback, None)
+        if sub:
+            sub.cancel()
@@ -1,5 +1,10 @@
+import datetime
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import String, type_coerce
+from sqlalchemy.orm import Session
+from app.db import models
+from app.engine.wire import negotiate
 
 class AgentCapabilities(BaseModel):
     market_data: List[str] = Field(default=["OHLCV"])
@@ -14,6 +19,45 @@ class AgentManifest(BaseModel):
     languages: List[str] = ["python"]
     entrypoint: str = "strategy.py"
     capabilities: Optional[AgentCapabilities] = None
+    # Tick wire formats in order of preference: "msgpack" | "struct" | "json"
+    wire_formats: List[str] = ["json"]
+
+def negotiate_wire_format(manifest: AgentManifest) -> str:
+    return negotiate(manifest.wire_formats)
+
+DEFAULT_RUNTIME = {"wire_format": "json", "shared_memory": False}
+
+def save_runtime(db: Session, agent_id, manifest: AgentManifest) -> dict:
+    """Negotiates the agent's runtime options from its manifest and stores them (agent_runtime). The caller commits."""
+    capabilities = manifest.capabilities or AgentCapabilities()
+    options = {"wire_format": negotiate_wire_format(manifest), "shared_memory": "OHLCV_SHM" in capabilities.market_data}
+    row = db.query(models.AgentRuntime).filter(models.AgentRuntime.agent_id == agent_id).first()
+    if row is None:
+        row = models.AgentRuntime(agent_id=agent_id)
+        db.add(row)
+    row.wire_format = options["wire_format"]
+    row.shared_memory = options["shared_memory"]
+    row.updated_at = datetime.datetime.utcnow()
+    return options
+
+def copy_runtime(db: Session, agent_id, source_agent_id):
+    """Gives a fork the runtime options of the agent whose code it shares. The caller commits."""
+    source = db.query(models.AgentRuntime).filter(models.AgentRuntime.agent_id == source_agent_id).first()
+    if source is not None:
+        db.add(models.AgentRuntime(agent_id=agent_id, wire_format=source.wire_format, shared_memory=source.shared_memory))
+
+def runtime_options(db: Session, agent_ids: Iterable[str]) -> Dict[str, dict]:
+    """
+    CompetitionExecutor agent-dict fields per agent ({"wire_format", "shared_memory"}), one query for the lot.
+    Agents without a stored manifest get the defaults.
+    """
+    agent_ids = [str(a) for a in agent_ids]
+    rows = db.query(type_coerce(models.AgentRuntime.agent_id, String), models.AgentRuntime.wire_format,
+                    models.AgentRuntime.shared_memory)\
+        .filter(models.AgentRuntime.agent_id.in_(agent_ids)).all()
+    stored = {str(agent_id): {"wire_format": wire_format, "shared_memory": bool(shared_memory)}
+              for agent_id, wire_format, shared_memory in rows}
+    return {a: stored.get(a, dict(DEFAULT_RUNTIME)) for a in agent_ids}
 
 def validate_manifest(data: dict):
     try:
@@ -0,0 +1,203 @@
+import asyncio
+import bisect
+import datetime
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+try:
+    import httpx
+    HAS_HTTPX = True
+except ImportError:
+    HAS_HTTPX = False
+
+from app.engine.market_history import ReplayTickSource, to_epoch
+
+logger = logging.getLogger(__name__)
+
+class PriceUnavailableError(Exception):
+    pass
+
+def normalize_symbol(symbol: str) -> str:
+    """BTC-USDT / BTC/USDT / btcusdt -> BTCUSDT"""
+    return symbol.replace("-", "").replace("/", "").upper()
+
+class MarketDataProvider:
+    """
+    Async price source. Subclasses implement `_fetch_price`; this base adds
+    - coalescing: concurrent lookups of the same (symbol, time) share one fetch
+    - caching: live prices are kept for `ttl_seconds`, historical prices until evicted
+    """
+    def __init__(self, ttl_seconds: float = 1.0, max_cache_entries: int = 4096):
+        self.ttl_seconds = ttl_seconds
+        self.max_cache_entries = max_cache_entries
+        self._cache: "OrderedDict[Tuple[str, Optional[float]], Tuple[float, float]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, Optional[float]], asyncio.Future] = {}
+        self.fetch_count = 0
+
+    async def get_price(self, symbol: str, at: datetime.datetime = None) -> float:
+        """Current price, or the reference price at `at` (naive datetimes are UTC)."""
+        key = (normalize_symbol(symbol), None if at is None else to_epoch(at))
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            price, fetched_at = cached
+            if key[1] is not None or time.monotonic() - fetched_at < self.ttl_seconds:
+                self._cache.move_to_end(key)
+                return price
+
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            self.fetch_count += 1
+            price = await self._fetch_price(*key)
+            self._store(key, price)
+            future.set_result(price)
+            return price
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so waiters-less failures don't warn
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _store(self, key, price: float):
+        self._cache[key] = (price, time.monotonic())
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_cache_entries:
+            self._cache.popitem(last=False)
+
+    async def _fetch_price(self, symbol: str, ts: Optional[float]) -> float:
+        raise NotImplementedError
+
+    def detached(self) -> "MarketDataProvider":
+        """A provider safe to use (and close) on a short-lived event loop; self unless it holds loop-bound clients."""
+        return self
+
+    async def close(self):
+        pass
+
+class BinancePriceProvider(MarketDataProvider):
+    """
+    Binance REST prices over one pooled client.
+    Uses httpx.AsyncClient when installed, otherwise a pooled requests.Session in a worker thread.
+    """
+    BASE_URL = "https://api.binance.com"
+
+    def __init__(self, timeout: float = 5.0, max_connections: int = 20, **kwargs):
+        super().__init__(**kwargs)
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            if HAS_HTTPX:
+                self._client = httpx.AsyncClient(
+                    base_url=self.BASE_URL,
+                    timeout=self.timeout,
+                    limits=httpx.Limits(max_connections=self.max_connections)
+                )
+            else:
+                import requests
+                from requests.adapters import HTTPAdapter
+                self._client = requests.Session()
+                self._client.mount("https://", HTTPAdapter(pool_maxsize=self.max_connections))
+        return self._client
+
+    async def _get_json(self, path: str, params: dict):
+        client = self._get_client()
+        if HAS_HTTPX:
+            res = await client.get(path, params=params)
+        else:
+            res = await asyncio.to_thread(client.get, self.BASE_URL + path, params=params, timeout=self.timeout)
+        res.raise_for_status()
+        return res.json()
+
+    async def _fetch_price(self, symbol: str, ts: Optional[float]) -> float:
+        try:
+            if ts is None:
+                data = await self._get_json("/api/v3/ticker/price", {"symbol": symbol})
+                return float(data["price"])
+            # Historical reference: open of the 1m kline containing `ts`
+            data = await self._get_json("/api/v3/klines", {
+                "symbol": symbol, "interval": "1m", "startTime": int(ts * 1000) - 60_000, "limit": 2
+            })
+            candles = [c for c in data if c[0] <= ts * 1000]
+            if not candles:
+                raise PriceUnavailableError(f"No kline for {symbol} at {ts}")
+            return float(candles[-1][1])
+        except PriceUnavailableError:
+            raise
+        except Exception as e:
+            raise PriceUnavailableError(f"Binance price lookup failed for {symbol}: {e}") from e
+
+    def detached(self) -> "BinancePriceProvider":
+        # The pooled httpx client belongs to the loop it was created on
+        return BinancePriceProvider(timeout=self.timeout, max_connections=1, ttl_seconds=self.ttl_seconds)
+
+    async def close(self):
+        if self._client is not None:
+            if HAS_HTTPX:
+                await self._client.aclose()
+            else:
+                self._client.close()
+            self._client = None
+
+class RecordedPriceProvider(MarketDataProvider):
+    """
+    Offline provider backed by a recorded feed (same CSV/JSONL format as ReplayTickSource).
+    Lookups return the last recorded price at or before the requested time.
+    With `align_to`, the recording is shifted so its first tick lands on that instant,
+    which lets wall-clock schedulers run reproducibly against a fixed recording.
+    """
+    def __init__(self, path: str, align_to: datetime.datetime = None, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._times: Dict[str, list] = {}
+        self._prices: Dict[str, list] = {}
+        for frame in ReplayTickSource(path).frames():
+            for tick in frame:
+                symbol = normalize_symbol(tick["symbol"])
+                self._times.setdefault(symbol, []).append(to_epoch(tick["timestamp"]))
+                self._prices.setdefault(symbol, []).append(tick["price"])
+
+        first = min((t[0] for t in self._times.values() if t), default=0.0)
+        self.offset = (to_epoch(align_to) - first) if align_to is not None else 0.0
+
+    async def _fetch_price(self, symbol: str, ts: Optional[float]) -> float:
+        times = self._times.get(symbol)
+        if not times:
+            raise PriceUnavailableError(f"{symbol} not in recording {self.path}")
+        if ts is None:
+            ts = time.time()
+        idx = bisect.bisect_right(times, ts - self.offset) - 1
+        if idx < 0:
+            raise PriceUnavailableError(f"No recorded {symbol} price at or before {ts}")
+        return self._prices[symbol][idx]
+
+_default_provider: Optional[MarketDataProvider] = None
+
+def get_market_data_provider() -> MarketDataProvider:
+    """
+    Process-wide provider. Set MARKET_DATA_RECORDING to a recorded feed to run offline.
+    """
+    global _default_provider
+    if _default_provider is None:
+        recording = os.getenv("MARKET_DATA_RECORDING")
+        if recording:
+            logger.info(f"Using recorded market data: {recording}")
+            _default_provider = RecordedPriceProvider(recording, align_to=datetime.datetime.utcnow())
+        else:
+            _default_provider = BinancePriceProvider()
+    return _default_provider
+
+def set_market_data_provider(provider: Optional[MarketDataProvider]):
+    global _default_provider
+    _default_provider = provider
@@ -0,0 +1,160 @@
+import csv
+import json
+import datetime
+import numpy as np
+from typing import Dict, List, Iterator
+
+# Column layout of the bar ring buffer
+BAR_FIELDS = ["timestamp", "open", "high", "low", "close", "volume"]
+
+def to_epoch(value) -> float:
+    """Accepts epoch seconds, ISO-8601 strings (naive = UTC) or datetimes."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            value = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp()
+
+class RingBuffer:
+    """
+    Fixed-size 2D NumPy ring buffer. Appends are O(1) and never reallocate.
+    `window` returns a view when the rows are contiguous, so callers must copy
+    if they keep the result across appends.
+    """
+    def __init__(self, capacity: int, width: int):
+        self.capacity = capacity
+        self._data = np.zeros((capacity, width), dtype=np.float64)
+        self._head = 0 # Next write position
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, row):
+        self._data[self._head] = row
+        self._head = (self._head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def latest(self):
+        if not self.count:
+            return None
+        return self._data[(self._head - 1) % self.capacity]
+
+    def window(self, n: int = None) -> np.ndarray:
+        """Last `n` rows in chronological order."""
+        n = self.count if n is None else min(n, self.count)
+        start = (self._head - n) % self.capacity
+        if start + n <= self.capacity:
+            return self._data[start:start + n]
+        return np.concatenate((self._data[start:], self._data[:self._head]))
+
+class SymbolHistory:
+    """
+    Recent ticks plus rolling OHLCV bars for one symbol.
+    Rows are [timestamp, price, volume] for ticks and BAR_FIELDS for bars.
+    """
+    def __init__(self, symbol: str, tick_capacity: int = 4096, bar_capacity: int = 1440, bar_seconds: int = 60):
+        self.symbol = symbol
+        self.bar_seconds = bar_seconds
+        self.ticks = RingBuffer(tick_capacity, 3)
+        self.closed_bars = RingBuffer(bar_capacity, len(BAR_FIELDS))
+        self._bar = None # Bar in progress
+
+    def on_tick(self, ts: float, price: float, volume: float = 0.0):
+        """Record a tick and return the (possibly still forming) current bar."""
+        self.ticks.append((ts, price, volume))
+
+        bar_start = ts - (ts % self.bar_seconds)
+        if self._bar is None or bar_start > self._bar[0]:
+            if self._bar is not None:
+                self.closed_bars.append(self._bar)
+            self._bar = np.array([bar_start, price, price, price, price, volume])
+        else:
+            self._bar[2] = max(self._bar[2], price)
+            self._bar[3] = min(self._bar[3], price)
+            self._bar[4] = price
+            self._bar[5] += volume
+        return self._bar
+
+    def latest_bar(self):
+        return None if self._bar is None else self._bar.tolist()
+
+    def bars(self, n: int = None, include_partial: bool = True) -> np.ndarray:
+        """Last `n` bars (oldest first), optionally ending with the bar in progress."""
+        if not include_partial or self._bar is None:
+            return self.closed_bars.window(n)
+        closed = self.closed_bars.window(None if n is None else max(n - 1, 0))
+        return np.vstack((closed, self._bar))
+
+    def tick_window(self, n: int = None) -> np.ndarray:
+        return self.ticks.window(n)
+
+class MarketHistory:
+    """
+    Per-symbol in-memory history shared by the live feed and its subscribers.
+    """
+    def __init__(self, symbols: List[str], tick_capacity: int = 4096, bar_capacity: int = 1440, bar_seconds: int = 60):
+        self.tick_capacity = tick_capacity
+        self.bar_capacity = bar_capacity
+        self.bar_seconds = bar_seconds
+        self.symbols: Dict[str, SymbolHistory] = {}
+        for symbol in symbols:
+            self._get_or_create(symbol)
+
+    def _get_or_create(self, symbol: str) -> SymbolHistory:
+        if symbol not in self.symbols:
+            self.symbols[symbol] = SymbolHistory(symbol, self.tick_capacity, self.bar_capacity, self.bar_seconds)
+        return self.symbols[symbol]
+
+    def __getitem__(self, symbol: str) -> SymbolHistory:
+        return self.symbols[symbol]
+
+    def __contains__(self, symbol: str):
+        return symbol in self.symbols
+
+    def record(self, tick: dict):
+        """Append a feed tick and return the symbol's current bar as a list."""
+        history = self._get_or_create(tick["symbol"])
+        bar = history.on_tick(to_epoch(tick["timestamp"]), float(tick["price"]), float(tick.get("volume", 0.0)))
+        return bar.tolist()
+
+class ReplayTickSource:
+    """
+    Deterministic tick source backed by a local recording, for offline runs.
+    Accepts CSV (timestamp,symbol,price[,volume]) or JSON lines with the same keys.
+    Consecutive rows sharing a timestamp are replayed as one frame.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.symbols = sorted({row["symbol"] for row in self._rows()})
+
+    def _rows(self) -> Iterator[dict]:
+        with open(self.path, "r") as f:
+            if self.path.endswith((".jsonl", ".json")):
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            else:
+                yield from csv.DictReader(f)
+
+    def frames(self) -> Iterator[List[dict]]:
+        frame, frame_ts = [], None
+        for row in self._rows():
+            tick = {
+                "symbol": row["symbol"],
+                "price": float(row["price"]),
+                "volume": float(row.get("volume") or 0.0),
+                "timestamp": row["timestamp"]
+            }
+            if frame and tick["timestamp"] != frame_ts:
+                yield frame
+                frame = []
+            frame_ts = tick["timestamp"]
+            frame.append(tick)
+        if frame:
+            yield frame
@@ -0,0 +1,191 @@
+import bisect
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+class SortedBuckets:
+    """
+    Sorted sequence stored as a list of sorted buckets of at most 2 * LOAD items, with each bucket's max
+    kept alongside. Locating a value is two bisects (O(log n)); an insert or remove shifts at most 2 * LOAD
+    items inside its bucket, plus one bucket pointer per LOAD items when a bucket splits or empties, instead
+    of shifting the whole list as bisect.insort / del on a flat list do.
+    """
+    LOAD = 256
+
+    def __init__(self):
+        self._buckets: List[list] = []
+        self._maxes: list = []
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def add(self, value):
+        if not self._buckets:
+            self._buckets.append([value])
+            self._maxes.append(value)
+            self._len = 1
+            return
+        b = min(bisect.bisect_left(self._maxes, value), len(self._buckets) - 1)
+        bucket = self._buckets[b]
+        bisect.insort(bucket, value)
+        self._maxes[b] = bucket[-1]
+        self._len += 1
+        if len(bucket) > 2 * self.LOAD:
+            self._buckets.insert(b + 1, bucket[self.LOAD:])
+            del bucket[self.LOAD:]
+            self._maxes.insert(b, bucket[-1])
+
+    def remove(self, value) -> bool:
+        b = bisect.bisect_left(self._maxes, value)
+        if b == len(self._buckets):
+            return False
+        bucket = self._buckets[b]
+        i = bisect.bisect_left(bucket, value)
+        if i == len(bucket) or bucket[i] != value:
+            return False
+        del bucket[i]
+        self._len -= 1
+        if bucket:
+            self._maxes[b] = bucket[-1]
+        else:
+            del self._buckets[b]
+            del self._maxes[b]
+        return True
+
+    def below(self, value) -> Iterator:
+        """Items smaller than `value`, nearest first."""
+        b = min(bisect.bisect_left(self._maxes, value), len(self._buckets) - 1)
+        if b < 0:
+            return
+        i = bisect.bisect_left(self._buckets[b], value) - 1
+        while b >= 0:
+            bucket = self._buckets[b]
+            while i >= 0:
+                yield bucket[i]
+                i -= 1
+            b -= 1
+            i = len(self._buckets[b]) - 1 if b >= 0 else -1
+
+    def above(self, value) -> Iterator:
+        """Items larger than `value`, nearest first."""
+        b = bisect.bisect_left(self._maxes, value)
+        if b == len(self._buckets):
+            return
+        i = bisect.bisect_right(self._buckets[b], value)
+        while b < len(self._buckets):
+            bucket = self._buckets[b]
+            while i < len(bucket):
+                yield bucket[i]
+                i += 1
+            b += 1
+            i = 0
+
+class MatchmakingQueue:
+    """
+    Agents waiting for a duel, kept sorted by (rating, agent_id) in SortedBuckets.
+    Finding an opponent is a bisect to the agent's slot plus an outward scan over at most `max_probes`
+    neighbours; enqueue and dequeue are a bisect plus a shift within one bucket (see SortedBuckets).
+    - max_gap:        largest rating difference accepted for a fresh entry
+    - gap_per_second: how fast that window widens while an agent waits
+    - rematch_window: an agent's last N opponents are skipped
+    """
+    def __init__(self, max_gap: float = 200.0, gap_per_second: float = 5.0, rematch_window: int = 5, max_probes: int = 32):
+        self.max_gap = max_gap
+        self.gap_per_second = gap_per_second
+        self.rematch_window = rematch_window
+        self.max_probes = max_probes
+        self._sorted = SortedBuckets() # of (rating, agent_id)
+        self._entries: Dict[str, Tuple[float, str]] = {}
+        self._enqueued_at: Dict[str, float] = {}
+        self._recent: Dict[str, deque] = {}
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def __contains__(self, agent_id):
+        return str(agent_id) in self._entries
+
+    def enqueue(self, agent_id, rating: float, now: float = None):
+        """Adds an agent, or moves it if its rating changed (keeping its wait time)."""
+        key = str(agent_id)
+        entry = (float(rating), key)
+        if self._entries.get(key) == entry:
+            return
+        if key in self._entries:
+            self._sorted.remove(self._entries[key])
+        self._sorted.add(entry)
+        self._entries[key] = entry
+        self._enqueued_at.setdefault(key, time.monotonic() if now is None else now)
+
+    def dequeue(self, agent_id):
+        key = str(agent_id)
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._sorted.remove(entry)
+            self._enqueued_at.pop(key, None)
+
+    def retain(self, agent_ids):
+        """Drops queued agents that are not in `agent_ids` (e.g. deactivated or already in a duel)."""
+        keep = {str(a) for a in agent_ids}
+        for key in [k for k in self._entries if k not in keep]:
+            self.dequeue(key)
+
+    @property
+    def has_history(self) -> bool:
+        return bool(self._recent)
+
+    def note_match(self, agent_a, agent_b):
+        """Remember a pairing so the two aren't rematched within `rematch_window` duels of each other."""
+        a, b = str(agent_a), str(agent_b)
+        self._recent.setdefault(a, deque(maxlen=self.rematch_window)).append(b)
+        self._recent.setdefault(b, deque(maxlen=self.rematch_window)).append(a)
+
+    def _allowed_gap(self, key: str, now: float) -> float:
+        return self.max_gap + self.gap_per_second * max(0.0, now - self._enqueued_at.get(key, now))
+
+    def find_opponent(self, agent_id, now: float = None) -> Optional[str]:
+        """Closest-rated eligible opponent within the agent's (widening) rating window, or None."""
+        key = str(agent_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = time.monotonic() if now is None else now
+        gap = self._allowed_gap(key, now)
+        recent = self._recent.get(key, ())
+        below, above = self._sorted.below(entry), self._sorted.above(entry)
+        left, right = next(below, None), next(above, None)
+        for _ in range(self.max_probes):
+            left_gap = entry[0] - left[0] if left is not None else None
+            right_gap = right[0] - entry[0] if right is not None else None
+            if left_gap is None and right_gap is None:
+                return None
+            if right_gap is None or (left_gap is not None and left_gap <= right_gap):
+                candidate_gap, candidate = left_gap, left[1]
+                left = next(below, None)
+            else:
+                candidate_gap, candidate = right_gap, right[1]
+                right = next(above, None)
+            if candidate_gap > gap:
+                # Both sides are sorted, so the next candidate is at least as far away
+                return None
+            # The window must suit both sides
+            if candidate not in recent and candidate_gap <= self._allowed_gap(candidate, now):
+                return candidate
+        return None
+
+    def pair_all(self, now: float = None) -> List[Tuple[str, str]]:
+        """Pairs as many queued agents as possible, longest-waiting first, and removes them from the queue."""
+        now = time.monotonic() if now is None else now
+        pairs = []
+        for key in sorted(self._enqueued_at, key=self._enqueued_at.get):
+            if key not in self._entries:
+                continue
+            opponent = self.find_opponent(key, now)
+            if opponent is None:
+                continue
+            self.dequeue(key)
+            self.dequeue(opponent)
+            self.note_match(key, opponent)
+            pairs.append((key, opponent))
+        return pairs
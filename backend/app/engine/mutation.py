@@ -3,16 +3,88 @@ try:
     HAS_GENAI = True
 except ImportError:
     HAS_GENAI = False
+import ast
+import asyncio
+import hashlib
 import os
+import random
 import subprocess
 import tempfile
 import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Union
 from sqlalchemy.orm import Session
 from app.db import models
+from app.engine.code_safety import analyze, code_hash
+from app.engine.code_store import get_code_store
+from app.engine.lineage import record_birth
+from app.engine.zygote import get_zygote
 import uuid
 
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(os.getcwd(), ".llm_cache"))
+
+class ResponseCache:
+    """
+    Content-addressed LLM responses: sha256(prompt) -> text.
+    Hot entries live in an in-memory LRU; with a directory, every entry is also kept as <hash>.txt
+    so identical prompts are not re-billed after a restart.
+    """
+    def __init__(self, directory: str = None, max_entries: int = 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.txt")
+
+    def get(self, prompt: str) -> Optional[str]:
+        key = self.key(prompt)
+        text = self._entries.get(key)
+        if text is None and self.directory and os.path.exists(self._path(key)):
+            with open(self._path(key), "r") as f:
+                text = f.read()
+        if text is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(key, text)
+        return text
+
+    def put(self, prompt: str, text: str):
+        key = self.key(prompt)
+        self._remember(key, text)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(text)
+            os.replace(tmp_path, self._path(key))
+
+    def _remember(self, key: str, text: str):
+        self._entries[key] = text
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
 class LLMProvider:
-    def __init__(self, api_key: str = None):
+    """
+    Mutation prompts -> strategy code.
+    - at most `max_concurrency` requests are in flight; callers beyond that wait their turn
+    - responses are cached by prompt hash and concurrent identical prompts share one request
+    - failed or timed out requests are retried `max_retries` times with jittered exponential backoff
+    Without a model (no key or no google-generativeai) responses are simulated: deterministic per prompt
+    and never written to the disk cache, which makes it the offline stand-in for tests.
+    """
+    def __init__(self, api_key: str = None, max_concurrency: int = 8, max_retries: int = 3, backoff: float = 1.0,
+                 timeout: float = 60.0, cache: ResponseCache = None):
         if HAS_GENAI and api_key:
             genai.configure(api_key=api_key)
             self.model = genai.GenerativeModel('gemini-1.5-pro')
@@ -20,79 +92,244 @@ class LLMProvider:
             self.model = None
             if not HAS_GENAI:
                 print("Warning: google-generativeai not installed. Using simulated responses.")
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache or ResponseCache(LLM_CACHE_DIR if self.model else None)
+        self._semaphore = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.requests = 0
 
     async def generate_mutation(self, prompt: str) -> str:
-        if not self.model:
-            # Fallback to smart simulated response if no key
-            return self._simulated_response(prompt)
-        
-        response = await self.model.generate_content_async(prompt)
-        return response.text
+        cached = self.cache.get(prompt)
+        if cached is not None:
+            return cached
+        key = self.cache.key(prompt)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request(prompt))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, prompt, t))
+        # Shielded so one cancelled caller doesn't cancel the request for the others
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, prompt: str, task: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.cache.put(prompt, task.result())
+
+    async def generate_batch(self, prompts: List[str]) -> List[Union[str, Exception]]:
+        """Generates for many prompts concurrently; failures are returned in place of their text."""
+        return await asyncio.gather(*(self.generate_mutation(p) for p in prompts), return_exceptions=True)
+
+    async def _request(self, prompt: str) -> str:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    self.requests += 1
+                    if not self.model:
+                        # Fallback to smart simulated response if no key
+                        return self._simulated_response(prompt)
+                    response = await asyncio.wait_for(self.model.generate_content_async(prompt), self.timeout)
+                    return response.text
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        raise
+                    delay = self.backoff * (2 ** attempt) * (0.5 + random.random())
+                    print(f"LLM request failed ({e}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                    await asyncio.sleep(delay)
 
     def _simulated_response(self, prompt: str) -> str:
-        # Proper multi-line string for simulation
+        # A momentum strategy whose parameters vary with the prompt, so variants differ in fitness
+        seed = int(ResponseCache.key(prompt)[:8], 16)
+        lookback = 2 + seed % 11
+        threshold = 0.001 * (1 + (seed >> 4) % 20)
+        size = 0.1 * (1 + (seed >> 9) % 10)
         return (
             "# Mutated Strategy (Simulated)\n"
-            "import numpy as np\n"
-            "def decide(snapshot):\n"
-            "    return {'action': 'OPEN_LONG', 'stake': 1000}"
+            "closes = []\n"
+            "\n"
+            "def decide(context, market_data):\n"
+            "    closes.append(market_data.get('price', 0))\n"
+            f"    if len(closes) <= {lookback} or not closes[-{lookback + 1}]:\n"
+            "        return {'action': 'HOLD', 'size': 0}\n"
+            f"    change = closes[-1] / closes[-{lookback + 1}] - 1\n"
+            f"    if change > {threshold:.3f}:\n"
+            f"        return {{'action': 'BUY', 'size': {size:.1f}}}\n"
+            f"    if change < -{threshold:.3f}:\n"
+            f"        return {{'action': 'SELL', 'size': {size:.1f}}}\n"
+            "    return {'action': 'HOLD', 'size': 0}\n"
         )
 
 class CodeValidator:
     @staticmethod
-    def validate_syntax(code: str):
+    def parse(code: str):
+        """Parses once for both static checks; returns (tree, None) or (None, syntax error)."""
         try:
-            compile(code, '<string>', 'exec')
-            return True, None
+            return ast.parse(code), None
         except SyntaxError as e:
-            return False, f"Syntax Error: {e.msg} at line {e.lineno}"
+            return None, f"Syntax Error: {e.msg} at line {e.lineno}"
+
+    @staticmethod
+    def validate_syntax(code: str):
+        tree, err = CodeValidator.parse(code)
+        return tree is not None, err
 
     @staticmethod
-    def validate_safety(code: str):
-        forbidden = ["os.", "subprocess.", "eval", "exec", "shutil", "socket", "__import__", "requests"]
-        for word in forbidden:
-            if word in code:
-                return False, f"Safety Violation: Forbidden keyword '{word}' detected."
+    def validate_safety(code: str, tree: ast.AST = None):
+        report = analyze(code, tree)
+        if not report.ok:
+            return False, f"Safety Violation: {report.message}"
         return True, None
 
     @staticmethod
     def run_trial(code: str):
-        """Runs the code in a subprocess with a dummy snapshot to ensure basic compatibility."""
+        """
+        Runs the code in a subprocess with a dummy snapshot to ensure basic compatibility.
+        Returns (is_runnable, err, transient); transient failures (timeouts, launch errors) say nothing
+        about the code and may pass on a retry.
+        """
         with tempfile.NamedTemporaryFile(suffix=".py", mode='w', delete=False) as tmp:
             tmp.write(code)
             tmp_path = tmp.name
         
         try:
-            # Mock execution
-            result = subprocess.run([sys.executable, tmp_path], capture_output=True, timeout=2)
+            # Mock execution, forked from the pre-warmed zygote when available
+            zygote = get_zygote()
+            if zygote is not None:
+                result = zygote.run(tmp_path, timeout=2)
+                if result.timed_out:
+                    return False, "Trial failed: timed out after 2 seconds", True
+            else:
+                result = subprocess.run([sys.executable, tmp_path], capture_output=True, timeout=2)
             if result.returncode != 0:
-                return False, f"Runtime Error during trial: {result.stderr.decode()}"
-            return True, None
+                return False, f"Runtime Error during trial: {result.stderr.decode()}", False
+            return True, None, False
         except Exception as e:
-            return False, f"Trial failed: {str(e)}"
+            return False, f"Trial failed: {str(e)}", True
         finally:
             if os.path.exists(tmp_path):
                 os.remove(tmp_path)
 
+class Verdict(NamedTuple):
+    ok: bool
+    message: str # "Success" or "<Stage> Validation Failed: ..." as returned by apply_mutation
+    transient: bool = False # trial timed out or could not run: not remembered, the next validation retries
+
+class ValidationService:
+    """
+    Validates candidate strategies in batches.
+    Candidates are keyed by sha256 of their code: duplicates in a batch are checked once, and verdicts
+    are remembered (LRU), so code that was already seen is never re-tested. Transient trial failures
+    (timeouts, launch errors) are not remembered. Each new candidate is parsed once for the syntax and
+    safety checks; trials for the ones that pass run concurrently in a thread pool.
+    """
+    def __init__(self, max_workers: int = None, max_verdicts: int = 10000):
+        # One trial process per core: more would only slow each trial down towards its timeout
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_verdicts = max_verdicts
+        self._verdicts: "OrderedDict[str, Verdict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+        self.trials = 0
+
+    # Same key as the code store and the safety analyzer, so a stored strategy's verdict is found by its blob hash
+    code_hash = staticmethod(code_hash)
+
+    def cached(self, code_hash: str) -> Optional[Verdict]:
+        with self._lock:
+            verdict = self._verdicts.get(code_hash)
+            if verdict is not None:
+                self._verdicts.move_to_end(code_hash)
+            return verdict
+
+    def _remember(self, code_hash: str, verdict: Verdict):
+        if verdict.transient:
+            return
+        with self._lock:
+            self._verdicts[code_hash] = verdict
+            self._verdicts.move_to_end(code_hash)
+            while len(self._verdicts) > self.max_verdicts:
+                self._verdicts.popitem(last=False)
+
+    @staticmethod
+    def static_check(code: str) -> Optional[Verdict]:
+        """Syntax and safety from one parse; None when both pass."""
+        tree, err = CodeValidator.parse(code)
+        if tree is None:
+            return Verdict(False, f"Syntax Validation Failed: {err}")
+        is_safe, err = CodeValidator.validate_safety(code, tree)
+        if not is_safe:
+            return Verdict(False, f"Safety Validation Failed: {err}")
+        return None
+
+    def _trial(self, code: str) -> Verdict:
+        self.trials += 1
+        is_runnable, err, transient = CodeValidator.run_trial(code)
+        if not is_runnable:
+            return Verdict(False, f"Trial Execution Failed: {err}", transient)
+        return Verdict(True, "Success")
+
+    async def validate_many(self, codes: List[str]) -> List[Verdict]:
+        """One verdict per candidate, in order."""
+        hashes = [self.code_hash(code) for code in codes]
+        verdicts: Dict[str, Verdict] = {}
+        pending = {}
+        for code_hash, code in zip(hashes, codes):
+            if code_hash in verdicts or code_hash in pending:
+                continue
+            verdict = self.cached(code_hash) or self.static_check(code)
+            if verdict is None:
+                pending[code_hash] = code
+            else:
+                verdicts[code_hash] = verdict
+
+        if pending:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mutation-trial")
+            loop = asyncio.get_running_loop()
+            results = await asyncio.gather(*(loop.run_in_executor(self._pool, self._trial, code) for code in pending.values()))
+            verdicts.update(zip(pending, results))
+        for code_hash, verdict in verdicts.items():
+            self._remember(code_hash, verdict)
+        return [verdicts[code_hash] for code_hash in hashes]
+
+    async def validate(self, code: str) -> Verdict:
+        return (await self.validate_many([code]))[0]
+
+_validation_service: Optional[ValidationService] = None
+
+def get_validation_service() -> ValidationService:
+    """Process-wide service, so verdicts are shared between the API and the evolution worker."""
+    global _validation_service
+    if _validation_service is None:
+        _validation_service = ValidationService()
+    return _validation_service
+
 class MutationEngine:
-    def __init__(self, db: Session, api_key: str = None):
+    def __init__(self, db: Session, api_key: str = None, llm: LLMProvider = None):
         self.db = db
-        self.llm = LLMProvider(api_key)
+        self.llm = llm or LLMProvider(api_key)
         self.validator = CodeValidator()
+        self.validation = get_validation_service()
+        self.store = get_code_store()
 
-    def suggest_mutation(self, agent_id: str):
-        agent = self.db.query(models.Agent).filter(models.Agent.agent_id == agent_id).first()
+    def suggest_mutation(self, agent_id: str, variation: str = None):
+        agent = self.db.query(models.Agent).filter(models.Agent.id == agent_id).first()
         snapshots = self.db.query(models.LeaderboardSnapshot)\
             .filter(models.LeaderboardSnapshot.agent_id == agent_id)\
             .order_by(models.LeaderboardSnapshot.snapshot_at.desc())\
             .limit(10).all()
 
-        avg_pnl = sum(s.pnl for s in snapshots) / len(snapshots) if snapshots else 0
+        avg_pnl = sum(s.pnl or 0 for s in snapshots) / len(snapshots) if snapshots else 0
         
         prompt = f"""
-        Act as a Quantitative Trader. A trading agent '{agent_id}' with the following performance needs improvement:
+        Act as a Quantitative Trader. A trading agent '{agent.name}' with the following performance needs improvement:
         - Average PnL: {avg_pnl*100:.2f}%
-        - Persona: {agent.persona}
+        - Persona: {agent.description}
         
         The current strategy code is provided below. Please rewrite the 'decide' function or the entire strategy 
         to optimize for Sharpe Ratio and reduce Max Drawdown. Ensure the output is valid Python code only.
@@ -101,6 +338,11 @@ class MutationEngine:
         {self._read_agent_code(agent_id)}
         [STRATEGY CODE END]
         """
+        if variation:
+            # Distinct prompts (and so distinct cache entries) for several children of one parent
+            prompt += f"""
+        This is variant {variation}; explore a different direction than the other variants of this agent.
+        """
         return prompt
 
     async def apply_mutation(self, agent_id: str, owner_user: str, target_code: str = None):
@@ -110,41 +352,69 @@ class MutationEngine:
         if not target_code:
             prompt = self.suggest_mutation(agent_id)
             target_code = await self.llm.generate_mutation(prompt)
+        verdict = await self.validation.validate(target_code)
+        if not verdict.ok:
+            return None, verdict.message
+        return self._apply(agent_id, owner_user, target_code)
 
-        # Multi-stage Validation
-        is_valid, err = self.validator.validate_syntax(target_code)
-        if not is_valid: return None, f"Syntax Validation Failed: {err}"
-
-        is_safe, err = self.validator.validate_safety(target_code)
-        if not is_safe: return None, f"Safety Validation Failed: {err}"
-
-        is_runnable, err = self.validator.run_trial(target_code)
-        if not is_runnable: return None, f"Trial Execution Failed: {err}"
+    async def mutate_many(self, agent_ids: List[str], owner_user: str, variations: List[str] = None, active: bool = True):
+        """
+        Mutates a generation at once: prompts are built up front, the LLM calls run concurrently
+        (bounded, cached and deduplicated by LLMProvider), the results are validated as one batch by the
+        ValidationService, and the ones that pass are applied. A child whose code is identical to its parent's,
+        to an existing child of that parent or to an earlier child in the batch is skipped. With active=False the children are created
+        inactive (kept out of live competitions) until the caller activates them.
+        Returns (new_agent or None, message) per agent, in order.
+        """
+        variations = variations or [None] * len(agent_ids)
+        prompts = [self.suggest_mutation(agent_id, variation) for agent_id, variation in zip(agent_ids, variations)]
+        responses = await self.llm.generate_batch(prompts)
+        generated = [r for r in responses if not isinstance(r, Exception)]
+        verdicts = iter(await self.validation.validate_many(generated))
+        known = self._family_hashes(agent_ids)
+        results = []
+        for agent_id, response in zip(agent_ids, responses):
+            if isinstance(response, Exception):
+                results.append((None, f"LLM Generation Failed: {response}"))
+                continue
+            verdict = next(verdicts)
+            key = code_hash(response)
+            if key in known[str(agent_id)]:
+                # e.g. a cached LLM response for an unchanged prompt: another agent with the same code adds nothing
+                results.append((None, "Duplicate Mutation: code identical to the parent or an existing child"))
+                continue
+            known[str(agent_id)].add(key)
+            results.append(self._apply(agent_id, owner_user, response, active) if verdict.ok else (None, verdict.message))
+        return results
 
-        # Application
-        parent = self.db.query(models.Agent).filter(models.Agent.agent_id == agent_id).first()
-        new_agent_id = f"{agent_id}_evolved_{uuid.uuid4().hex[:4]}"
-        
+    def _apply(self, agent_id: str, owner_user: str, target_code: str, active: bool = True):
+        parent = self.db.query(models.Agent).filter(models.Agent.id == agent_id).first()
         new_agent = models.Agent(
-            agent_id=new_agent_id,
-            owner_user=owner_user,
-            persona=f"Advanced evolution of {agent_id}. Optimized for risk-adjusted returns.",
-            trust_score=parent.trust_score * 0.85,
-            parent_agent_id=agent_id,
-            generation=parent.generation + 1
+            name=f"{parent.name}_evolved_{uuid.uuid4().hex[:4]}",
+            description=f"Advanced evolution of {parent.name} by {owner_user}. Optimized for risk-adjusted returns.",
+            is_active=active
         )
         self.db.add(new_agent)
-        
-        agents_dir = os.path.join(os.getcwd(), "agents")
-        os.makedirs(agents_dir, exist_ok=True)
-        with open(os.path.join(agents_dir, f"{new_agent_id}.py"), "w") as f:
-            f.write(target_code)
-            
+        self.db.flush()
+        record_birth(self.db, new_agent.id, parent.id, "mutation")
+        # Only validated code reaches here: its blob is recorded as audited
+        self.store.record_verdict(self.db, self.store.assign(self.db, new_agent.id, target_code), True, "Success")
         self.db.commit()
         return new_agent, "Success"
 
+    def _family_hashes(self, agent_ids: List[str]) -> Dict[str, set]:
+        """Code hashes of each agent and of its direct children (two queries for the lot)."""
+        agent_ids = list({str(a) for a in agent_ids})
+        family = {agent_id: set() for agent_id in agent_ids}
+        for agent_id, key in self.db.query(models.AgentCode.agent_id, models.AgentCode.code_hash)\
+                .filter(models.AgentCode.agent_id.in_(agent_ids)).all():
+            family[str(agent_id)].add(key)
+        for parent_id, key in self.db.query(models.AgentLineage.parent_agent_id, models.AgentCode.code_hash)\
+                .join(models.AgentCode, models.AgentCode.agent_id == models.AgentLineage.agent_id)\
+                .filter(models.AgentLineage.parent_agent_id.in_(agent_ids)).all():
+            family[str(parent_id)].add(key)
+        return family
+
     def _read_agent_code(self, agent_id: str):
-        path = os.path.join(os.getcwd(), "agents", f"{agent_id}.py")
-        if os.path.exists(path):
-            with open(path, "r") as f: return f.read()
-        return "# Baseline Strategy\nprint('Default logic')"
+        code = self.store.agent_code(self.db, agent_id)
+        return code if code is not None else "# Baseline Strategy\nprint('Default logic')"
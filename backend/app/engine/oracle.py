@@ -0,0 +1,65 @@
+import asyncio
+import datetime
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.db import models
+from app.engine.market_data import MarketDataProvider, get_market_data_provider
+
+logger = logging.getLogger(__name__)
+
+OracleKey = Tuple[str, datetime.datetime]
+
+class PriceOracle:
+    """
+    Reference prices captured once per (market, instant) and persisted in `oracle_prices`.
+    Every competition on the same market reads the same captured value, so settling
+    many competitions costs one provider lookup per distinct timestamp.
+    """
+    def __init__(self, db: Session, provider: MarketDataProvider = None):
+        self.db = db
+        self.provider = provider or get_market_data_provider()
+        self._prices: Dict[OracleKey, float] = {}
+
+    @staticmethod
+    def key(market: str, at: datetime.datetime) -> OracleKey:
+        # Second resolution so competitions scheduled together share a capture
+        return (market, at.replace(microsecond=0))
+
+    def load(self, keys: Iterable[OracleKey]):
+        """Bulk-load already captured prices into the local cache (one query)."""
+        keys = {k for k in keys if k not in self._prices}
+        if not keys:
+            return
+        rows = self.db.query(models.OraclePrice).filter(
+            models.OraclePrice.market.in_({m for m, _ in keys}),
+            models.OraclePrice.captured_for.in_({t for _, t in keys})
+        ).all()
+        for row in rows:
+            self._prices[(row.market, row.captured_for)] = row.price
+
+    def get(self, market: str, at: datetime.datetime) -> Optional[float]:
+        key = self.key(market, at)
+        if key not in self._prices:
+            self.load([key])
+        return self._prices.get(key)
+
+    async def capture_many(self, keys: Iterable[OracleKey]) -> Dict[OracleKey, Optional[float]]:
+        """Capture any missing prices concurrently; already captured ones are reused."""
+        keys = {self.key(m, t) for m, t in keys}
+        self.load(keys)
+        missing = [k for k in keys if k not in self._prices]
+        if missing:
+            results = await asyncio.gather(
+                *(self.provider.get_price(market, at) for market, at in missing),
+                return_exceptions=True
+            )
+            source = type(self.provider).__name__
+            for (market, at), price in zip(missing, results):
+                if isinstance(price, Exception):
+                    logger.warning(f"Oracle capture failed for {market} @ {at}: {price}")
+                    continue
+                self.db.add(models.OraclePrice(market=market, captured_for=at, price=price, source=source))
+                self._prices[(market, at)] = price
+            self.db.commit()
+        return {k: self._prices.get(k) for k in keys}
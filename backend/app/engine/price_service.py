@@ -1,16 +1,50 @@
-import requests
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from app.engine.market_data import get_market_data_provider
+
+FALLBACK_PRICE = 50000.0
 
 class PriceService:
+    @staticmethod
+    async def get_price(symbol="BTCUSDT", at=None):
+        """Non-blocking lookup through the shared (cached, coalesced) provider. Raises PriceUnavailableError."""
+        return await get_market_data_provider().get_price(symbol, at)
+
+    @staticmethod
+    async def get_current_price_async(symbol="BTCUSDT"):
+        """get_current_price for async callers: the shared provider, with the same fallback on any failure."""
+        try:
+            return await get_market_data_provider().get_price(symbol)
+        except Exception as e:
+            print(f"Error fetching price: {e}")
+            return FALLBACK_PRICE # Fallback
+
     @staticmethod
     def get_current_price(symbol="BTCUSDT"):
+        """
+        Blocking convenience wrapper for scripts. Async code should await get_current_price_async instead;
+        called from a running event loop, the lookup runs on its own loop in a helper thread (blocking the caller).
+        """
+        async def _lookup():
+            shared = get_market_data_provider()
+            provider = shared.detached()
+            try:
+                return await provider.get_price(symbol)
+            finally:
+                # Only a provider made for this short-lived loop is closed; the shared one stays usable
+                if provider is not shared:
+                    await provider.close()
+
         try:
-            url = f"https://api.binance.com/api/v3/ticker/price?symbol={symbol}"
-            res = requests.get(url, timeout=5)
-            data = res.json()
-            return float(data["price"])
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return asyncio.run(_lookup())
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                return pool.submit(asyncio.run, _lookup()).result()
         except Exception as e:
             print(f"Error fetching price: {e}")
-            return 50000.0 # Fallback
+            return FALLBACK_PRICE # Fallback
 
 if __name__ == "__main__":
     print(PriceService.get_current_price())
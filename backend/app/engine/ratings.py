@@ -0,0 +1,188 @@
+import datetime
+import math
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from app.db import models
+
+# Glicko-2 (Glickman, 2012). Public values are on the Glicko scale; the update runs on the internal scale.
+DEFAULT_RATING = 1500.0
+DEFAULT_RD = 350.0
+DEFAULT_VOLATILITY = 0.06
+TAU = 0.5 # constrains volatility change; 0.3-1.2 is reasonable
+SCALE = 173.7178
+MIN_RD = 30.0 # keeps long-lived agents responsive
+RATING_PERIOD = 86400 # seconds without games that count as one idle rating period
+
+def _g(phi: np.ndarray) -> np.ndarray:
+    return 1.0 / np.sqrt(1.0 + 3.0 * phi ** 2 / math.pi ** 2)
+
+def _new_volatility(phi: float, sigma: float, v: float, delta: float, tau: float) -> float:
+    """Step 5 of Glicko-2: Illinois-method root of f(x) for the new volatility."""
+    a = math.log(sigma ** 2)
+
+    def f(x):
+        ex = math.exp(x)
+        return ex * (delta ** 2 - phi ** 2 - v - ex) / (2 * (phi ** 2 + v + ex) ** 2) - (x - a) / tau ** 2
+
+    A = a
+    if delta ** 2 > phi ** 2 + v:
+        B = math.log(delta ** 2 - phi ** 2 - v)
+    else:
+        k = 1
+        while f(a - k * tau) < 0:
+            k += 1
+        B = a - k * tau
+    fA, fB = f(A), f(B)
+    for _ in range(100):
+        if abs(B - A) <= 1e-6:
+            break
+        C = A + (A - B) * fA / (fB - fA)
+        fC = f(C)
+        if fC * fB <= 0:
+            A, fA = B, fB
+        else:
+            fA /= 2
+        B, fB = C, fC
+    return math.exp(A / 2)
+
+def glicko2_update(rating: np.ndarray, rd: np.ndarray, volatility: np.ndarray, i: np.ndarray, j: np.ndarray,
+                   score: np.ndarray, weight: np.ndarray = None, tau: float = TAU):
+    """
+    One rating period over a list of games. Game k is player i[k] scoring score[k] (1 win, 0.5 draw, 0 loss)
+    against player j[k], counted with weight[k]. Both sides of a game should be listed.
+    Players without games keep their state. Returns new (rating, rd, volatility) arrays.
+    """
+    n = len(rating)
+    weight = np.ones(len(i)) if weight is None else weight
+    mu = (rating - DEFAULT_RATING) / SCALE
+    phi = rd / SCALE
+
+    g_j = _g(phi[j])
+    expected = 1.0 / (1.0 + np.exp(-g_j * (mu[i] - mu[j])))
+    v_inv = np.bincount(i, weight * g_j ** 2 * expected * (1 - expected), n)
+    improvement = np.bincount(i, weight * g_j * (score - expected), n)
+
+    new_rating, new_rd, new_vol = rating.astype(float), rd.astype(float), volatility.astype(float)
+    for k in np.flatnonzero(v_inv > 0):
+        v = 1.0 / v_inv[k]
+        sigma = _new_volatility(phi[k], volatility[k], v, v * improvement[k], tau)
+        phi_star = math.sqrt(phi[k] ** 2 + sigma ** 2)
+        phi_new = 1.0 / math.sqrt(1.0 / phi_star ** 2 + v_inv[k])
+        new_rating[k] = DEFAULT_RATING + SCALE * (mu[k] + phi_new ** 2 * improvement[k])
+        new_rd[k] = max(MIN_RD, SCALE * phi_new)
+        new_vol[k] = sigma
+    return new_rating, new_rd, new_vol
+
+def pool_games(results: List[float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Multi-player extension: a competition of n agents ranked by result becomes all n(n-1) ordered pairwise
+    games, each weighted 1/(n-1) so the competition counts as one game's worth of evidence per agent.
+    """
+    values = np.asarray(results, dtype=float)
+    n = len(values)
+    i, j = np.nonzero(~np.eye(n, dtype=bool))
+    score = np.where(values[i] > values[j], 1.0, np.where(values[i] < values[j], 0.0, 0.5))
+    return i, j, score, np.full(len(i), 1.0 / max(n - 1, 1))
+
+def current_rd(rd: float, volatility: float, updated_at: datetime.datetime = None, now: datetime.datetime = None) -> float:
+    """
+    Step 6 of Glicko-2 for agents without games: RD grows by one volatility step per whole rating period
+    since `updated_at`, up to DEFAULT_RD. Stored RDs are as of their last update, so read them through this.
+    """
+    if updated_at is None:
+        return rd
+    periods = ((now or datetime.datetime.utcnow()) - updated_at).total_seconds() // RATING_PERIOD
+    if periods <= 0:
+        return rd
+    phi = math.sqrt((rd / SCALE) ** 2 + periods * volatility ** 2)
+    return min(DEFAULT_RD, SCALE * phi)
+
+def conservative_rating(rating: float, rd: float) -> float:
+    """Lower ~95% bound; used to rank so that unproven agents don't top the table."""
+    return rating - 2 * rd
+
+class RatingService:
+    """
+    Incremental Glicko-2 ratings kept in agent_ratings.
+    Updates only stage changes on the caller's session, so they commit (or roll back) with the
+    settlement that produced them.
+    """
+    def __init__(self, db: Session, tau: float = TAU):
+        self.db = db
+        self.tau = tau
+
+    def load(self, agent_ids: Iterable) -> Dict[str, models.AgentRating]:
+        """Rating rows keyed by str(agent_id); agents without one get a default row added to the session."""
+        keys = {str(a): a for a in agent_ids}
+        rows = self.db.query(models.AgentRating).filter(models.AgentRating.agent_id.in_(list(keys.values()))).all() if keys else []
+        by_id = {str(r.agent_id): r for r in rows}
+        for key, agent_id in keys.items():
+            if key not in by_id:
+                row = models.AgentRating(agent_id=agent_id, rating=DEFAULT_RATING, rd=DEFAULT_RD,
+                                         volatility=DEFAULT_VOLATILITY, games=0)
+                self.db.add(row)
+                by_id[key] = row
+        return by_id
+
+    def age_idle(self, now: datetime.datetime = None) -> int:
+        """
+        Folds whole idle rating periods into stored RDs (step 6), moving updated_at forward by the periods applied,
+        so stored RDs stay current for rankings done in SQL; current_rd of an aged row does not change.
+        Rows already at DEFAULT_RD are left alone. Returns the number of rows aged; the caller commits.
+        """
+        now = now or datetime.datetime.utcnow()
+        Rating = models.AgentRating
+        rows = self.db.query(Rating).filter(
+            Rating.updated_at <= now - datetime.timedelta(seconds=RATING_PERIOD), Rating.rd < DEFAULT_RD
+        ).all()
+        for row in rows:
+            periods = (now - row.updated_at).total_seconds() // RATING_PERIOD
+            row.rd = current_rd(row.rd, row.volatility, row.updated_at, now)
+            row.updated_at += datetime.timedelta(seconds=periods * RATING_PERIOD)
+        self.db.flush()
+        return len(rows)
+
+    def _apply(self, agent_ids: List, i: np.ndarray, j: np.ndarray, score: np.ndarray, weight: np.ndarray):
+        rows = self.load(agent_ids)
+        ordered = [rows[str(a)] for a in agent_ids]
+        now = datetime.datetime.utcnow()
+        # Idle periods since each agent's last update widen its RD before this period's games count
+        rating, rd, vol = glicko2_update(
+            np.array([r.rating for r in ordered]),
+            np.array([current_rd(r.rd, r.volatility, r.updated_at, now) for r in ordered]),
+            np.array([r.volatility for r in ordered]), i, j, score, weight, self.tau
+        )
+        played = np.bincount(i, minlength=len(ordered)) > 0
+        for k, row in enumerate(ordered):
+            if played[k]:
+                row.rating, row.rd, row.volatility = float(rating[k]), float(rd[k]), float(vol[k])
+                row.games = (row.games or 0) + 1
+                row.updated_at = now
+        # Later updates in the same transaction must see these rows (the session does not autoflush)
+        self.db.flush()
+
+    def record_duels(self, outcomes: Iterable):
+        """One rating period for a batch of DuelOutcome-like (winner_id, loser_id, ...) results."""
+        outcomes = list(outcomes)
+        if not outcomes:
+            return
+        ids = {}
+        for o in outcomes:
+            ids.setdefault(str(o.winner_id), o.winner_id)
+            ids.setdefault(str(o.loser_id), o.loser_id)
+        index = {key: k for k, key in enumerate(ids)}
+        winners = np.array([index[str(o.winner_id)] for o in outcomes])
+        losers = np.array([index[str(o.loser_id)] for o in outcomes])
+        i = np.concatenate((winners, losers))
+        j = np.concatenate((losers, winners))
+        score = np.concatenate((np.ones(len(outcomes)), np.zeros(len(outcomes))))
+        self._apply(list(ids.values()), i, j, score, np.ones(len(i)))
+
+    def record_competition(self, results: List[Tuple[object, float]]):
+        """Multi-player rating period from one settled competition's (agent_id, pnl) results."""
+        if len(results) < 2:
+            return
+        agent_ids = [agent_id for agent_id, _ in results]
+        i, j, score, weight = pool_games([pnl for _, pnl in results])
+        self._apply(agent_ids, i, j, score, weight)
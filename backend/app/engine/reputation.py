@@ -1,58 +1,266 @@
 import numpy as np
+import pandas as pd
+from sqlalchemy import String, bindparam, type_coerce
 from sqlalchemy.orm import Session
 from app.db import models
 from datetime import datetime, timedelta
 
+WINDOW_DAYS = 30
+EPOCH = datetime(1970, 1, 1)
+# Primary keys below the watermark that are re-read each incremental sync, so rows whose transaction
+# committed after a higher id was already seen are still picked up
+SYNC_OVERLAP_IDS = 10000
+# Per-bucket aggregate columns
+COUNT, PNL, PNL_SQ, SHARPE, POSITIVE = range(5)
+
+def day_number(ts: datetime) -> int:
+    return int((ts - EPOCH).total_seconds() // 86400)
+
+def window_start(now: datetime, window_days: int = WINDOW_DAYS) -> datetime:
+    """
+    Start of the trust window: midnight UTC of the day `window_days` days before `now`.
+    Every path (per agent, full recalibration, daily buckets) uses this bound, so they agree exactly.
+    """
+    return EPOCH + timedelta(days=day_number(now) - window_days)
+
+def trust_scores(count, sum_pnl, sum_pnl_sq, sum_sharpe, positives) -> np.ndarray:
+    """
+    TrustScore = (Volatility_Adj_PnL * 0.4) + (Sharpe * 0.3) + (Stability * 0.2) + (Consistency * 0.1)
+    computed from additive aggregates, for any number of agents at once. Agents without data score 0.5.
+    """
+    count = np.asarray(count, dtype=float)
+    n = np.maximum(count, 1.0)
+    avg_pnl = np.asarray(sum_pnl, dtype=float) / n
+    variance = np.maximum(np.asarray(sum_pnl_sq, dtype=float) / n - avg_pnl ** 2, 0.0)
+    pnl_std = np.where(count > 1, np.sqrt(variance), 0.01)
+
+    # 1. Volatility Adjusted PnL, sigmoid to [0, 1]
+    vol_adj_pnl = np.clip(avg_pnl / (pnl_std + 0.0001), -500, 500)
+    vol_adj_pnl_score = 1 / (1 + np.exp(-vol_adj_pnl))
+    # 2. Avg Sharpe, scaled assuming 4 as "excellent"
+    sharpe_score = np.clip(np.asarray(sum_sharpe, dtype=float) / n / 4.0, 0.0, 1.0)
+    # 3. Stability (Normalized variance of PnL)
+    stability_score = 1.0 - np.minimum(1.0, pnl_std * 2)
+    # 4. Consistency (Percentage of profitable snapshots)
+    consistency_score = np.asarray(positives, dtype=float) / n
+
+    score = vol_adj_pnl_score * 0.4 + sharpe_score * 0.3 + stability_score * 0.2 + consistency_score * 0.1
+    return np.where(count > 0, score, 0.5)
+
+def write_trust_scores(db: Session, agent_ids, scores, counts, now: datetime):
+    """Upserts agent_reputation rows: one executemany UPDATE for existing agents, one INSERT for new ones, one commit."""
+    table = models.AgentReputation.__table__
+    # Ids are compared as strings; reading them uncoerced skips building a UUID per row
+    query = db.query(type_coerce(table.c.agent_id, String))
+    if len(agent_ids) <= 500:
+        # Large batches read all ids instead of binding a huge IN list
+        query = query.filter(table.c.agent_id.in_(agent_ids))
+    existing = {str(a) for (a,) in query.all()}
+    values = [
+        {"b_agent_id": str(agent_id), "trust_score": float(score), "snapshot_count": int(count), "updated_at": now}
+        for agent_id, score, count in zip(agent_ids, scores, counts)
+    ]
+    updates = [v for v in values if v["b_agent_id"] in existing]
+    inserts = [dict(v, agent_id=v.pop("b_agent_id")) for v in values if v["b_agent_id"] not in existing]
+    if updates:
+        db.execute(table.update().where(table.c.agent_id == bindparam("b_agent_id")), updates)
+    if inserts:
+        db.execute(table.insert(), inserts)
+    db.commit()
+
 class ReputationSystem:
     def __init__(self, db: Session):
         self.db = db
 
     def calculate_trust_score(self, agent_id: str):
         """
-        TrustScore = (Volatility_Adj_PnL * 0.4) + (Sharpe * 0.3) + (Stability * 0.2) + (Consistency * 0.1)
+        TrustScore over the 30-day window of snapshots for one agent (see trust_scores and window_start).
         """
-        # Fetch snapshots for the last 30 days
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        snapshots = self.db.query(models.LeaderboardSnapshot)\
+        rows = self.db.query(models.LeaderboardSnapshot.pnl, models.LeaderboardSnapshot.sharpe)\
             .filter(models.LeaderboardSnapshot.agent_id == agent_id)\
-            .filter(models.LeaderboardSnapshot.snapshot_at >= thirty_days_ago)\
-            .order_by(models.LeaderboardSnapshot.snapshot_at.asc())\
+            .filter(models.LeaderboardSnapshot.snapshot_at >= window_start(datetime.utcnow()))\
             .all()
+        pnls = np.array([p or 0.0 for p, _ in rows])
+        sharpes = np.array([s or 0.0 for _, s in rows])
+        return float(trust_scores(len(rows), pnls.sum(), (pnls ** 2).sum(), sharpes.sum(), (pnls > 0).sum()))
 
-        if not snapshots:
-            return 0.5 # Default middle score for new agents
+    def update_agent_reputation(self, agent_id: str):
+        new_score = self.calculate_trust_score(agent_id)
+        row = self.db.query(models.AgentReputation).filter(models.AgentReputation.agent_id == agent_id).first()
+        if row is None:
+            row = models.AgentReputation(agent_id=agent_id)
+            self.db.add(row)
+        row.trust_score = new_score
+        row.updated_at = datetime.utcnow()
+        self.db.commit()
+        return new_score
 
-        pnls = [s.pnl for s in snapshots]
-        sharpes = [s.sharpe for s in snapshots]
-        
-        # 1. Volatility Adjusted PnL
-        avg_pnl = np.mean(pnls)
-        pnl_std = np.std(pnls) if len(pnls) > 1 else 0.01
-        vol_adj_pnl = avg_pnl / (pnl_std + 0.0001)
-        vol_adj_pnl_score = 1 / (1 + np.exp(-vol_adj_pnl)) # Sigmoid to [0, 1]
+    def recalibrate_all(self, now: datetime = None) -> pd.DataFrame:
+        """
+        Full recompute for every agent: one query for the window's snapshots, grouped aggregates per agent,
+        vectorized scoring and one bulk write. Agents without snapshots in the window reset to 0.5.
+        Returns the per-agent frame (agent_id, count, ..., trust_score).
+        """
+        now = now or datetime.utcnow()
+        Snapshot = models.LeaderboardSnapshot
+        rows = self.db.query(type_coerce(Snapshot.agent_id, String), Snapshot.pnl, Snapshot.sharpe)\
+            .filter(Snapshot.agent_id.isnot(None))\
+            .filter(Snapshot.snapshot_at >= window_start(now))\
+            .all()
+        df = pd.DataFrame(rows, columns=["agent_id", "pnl", "sharpe"])
+        df["agent_id"] = df["agent_id"].astype(str)
+        df["pnl"] = df["pnl"].astype(float).fillna(0.0)
+        df["sharpe"] = df["sharpe"].astype(float).fillna(0.0)
+        df["pnl_sq"] = df["pnl"] ** 2
+        df["positive"] = df["pnl"] > 0
+        stats = df.groupby("agent_id", sort=False).agg(
+            count=("pnl", "size"), sum_pnl=("pnl", "sum"), sum_pnl_sq=("pnl_sq", "sum"),
+            sum_sharpe=("sharpe", "sum"), positives=("positive", "sum")
+        )
 
-        # 2. Avg Sharpe
-        avg_sharpe = np.mean(sharpes)
-        sharpe_score = min(1.0, max(0, avg_sharpe / 4.0)) # Scaled assuming 4 as "excellent"
+        agent_ids = [str(a) for (a,) in self.db.query(type_coerce(models.Agent.id, String)).all()]
+        stats = stats.reindex(agent_ids, fill_value=0)
+        stats["trust_score"] = trust_scores(
+            stats["count"], stats["sum_pnl"], stats["sum_pnl_sq"], stats["sum_sharpe"], stats["positives"]
+        )
+        write_trust_scores(self.db, agent_ids, stats["trust_score"].to_numpy(), stats["count"].to_numpy(), now)
+        return stats.rename_axis("agent_id").reset_index()
 
-        # 3. Stability (Normalized variance of PnL)
-        stability_score = 1.0 - min(1.0, pnl_std * 2)
+class RollingReputation:
+    """
+    Per-agent 30-day snapshot aggregates in daily buckets (window + 1 of them, covering the days that
+    `now - 30 days` touches). stats[row, day % slots] holds (count, sum pnl, sum pnl^2, sum sharpe, positive count)
+    for the day in bucket_day[slot]. Moving to a new day zeroes one slot for every agent, so old data ages out
+    without a rescan.
+    """
+    def __init__(self, window_days: int = WINDOW_DAYS, capacity: int = 1024):
+        self.window_days = window_days
+        self.slots = window_days + 1
+        self.index = {}
+        self.agent_ids = []
+        self.stats = np.zeros((capacity, self.slots, 5))
+        self.bucket_day = np.full(self.slots, -1, dtype=np.int64)
+        self.today = None
 
-        # 4. Consistency (Percentage of profitable snapshots)
-        positive_pnls = [p for p in pnls if p > 0]
-        consistency_score = len(positive_pnls) / len(pnls)
+    def row(self, agent_id) -> int:
+        key = str(agent_id)
+        row = self.index.get(key)
+        if row is None:
+            row = self.index[key] = len(self.agent_ids)
+            self.agent_ids.append(agent_id)
+            if row >= len(self.stats):
+                grown = np.zeros((len(self.stats) * 2,) + self.stats.shape[1:])
+                grown[:len(self.stats)] = self.stats
+                self.stats = grown
+        return row
 
-        trust_score = (vol_adj_pnl_score * 0.4) + \
-                      (sharpe_score * 0.3) + \
-                      (stability_score * 0.2) + \
-                      (consistency_score * 0.1)
+    def advance(self, today: int) -> set:
+        """Moves the window to end at `today`; returns rows whose window lost data."""
+        expired = set()
+        if self.today is not None and today <= self.today:
+            return expired
+        oldest = today - self.window_days
+        start = oldest if self.today is None else max(self.today + 1, oldest)
+        n = len(self.agent_ids)
+        for day in range(start, today + 1):
+            slot = day % self.slots
+            if self.bucket_day[slot] != day:
+                expired.update(np.flatnonzero(self.stats[:n, slot, COUNT]).tolist())
+                self.stats[:, slot] = 0.0
+                self.bucket_day[slot] = day
+        self.today = today
+        return expired
 
-        return float(trust_score)
+    def add(self, rows, days, pnls, sharpes):
+        """Adds snapshots (parallel arrays); ones outside the current window are ignored."""
+        rows, days = np.asarray(rows, dtype=np.int64), np.asarray(days, dtype=np.int64)
+        pnls, sharpes = np.asarray(pnls, dtype=float), np.asarray(sharpes, dtype=float)
+        days = np.minimum(days, self.today)
+        keep = days >= self.today - self.window_days
+        rows, slots, pnls, sharpes = rows[keep], days[keep] % self.slots, pnls[keep], sharpes[keep]
+        values = np.stack((np.ones_like(pnls), pnls, pnls ** 2, sharpes, (pnls > 0).astype(float)), axis=1)
+        np.add.at(self.stats, (rows, slots), values)
 
-    def update_agent_reputation(self, agent_id: str):
-        new_score = self.calculate_trust_score(agent_id)
-        agent = self.db.query(models.Agent).filter(models.Agent.agent_id == agent_id).first()
-        if agent:
-            agent.trust_score = new_score
-            self.db.commit()
-        return new_score
+    def scores(self, rows) -> np.ndarray:
+        totals = self.stats[np.asarray(rows, dtype=np.int64)].sum(axis=1)
+        return trust_scores(*totals.T)
+
+    def counts(self, rows) -> np.ndarray:
+        return self.stats[np.asarray(rows, dtype=np.int64), :, COUNT].sum(axis=1)
+
+class IncrementalReputation:
+    """
+    Change-driven trust scores. Each sync reads only snapshots and SETTLE events past the last
+    watermarks (primary keys), folds new snapshots into RollingReputation, and recomputes just the agents
+    that received data, settled, or had data age out of the 30-day window. The first sync bootstraps
+    from one scan of the window. Scores are written in batched statements and committed once.
+    Ids are not commit-ordered: each sync also re-reads the last `overlap` ids below the watermarks and
+    skips the ones already applied, so a row committed after a higher id is still counted once.
+    """
+    def __init__(self, window_days: int = WINDOW_DAYS, overlap: int = SYNC_OVERLAP_IDS):
+        self.rolling = RollingReputation(window_days)
+        self.overlap = overlap
+        self.snapshot_watermark = None
+        self.ledger_watermark = None
+        self._seen_snapshots = set() # applied snapshot ids within the overlap band
+        self._seen_settles = set()
+
+    @staticmethod
+    def _unseen(items, seen: set, low: int):
+        """Items whose id was not applied yet; forgets ids that fell below the overlap band."""
+        fresh = [item for item in items if item[0] not in seen]
+        seen.update(item[0] for item in fresh)
+        seen.difference_update([i for i in seen if i <= low])
+        return fresh
+
+    def sync(self, db: Session, now: datetime = None) -> int:
+        now = now or datetime.utcnow()
+        today = day_number(now)
+        dirty = self.rolling.advance(today)
+
+        Snapshot, Ledger = models.LeaderboardSnapshot, models.LedgerEvent
+        query = db.query(Snapshot.id, Snapshot.agent_id, Snapshot.pnl, Snapshot.sharpe, Snapshot.snapshot_at)\
+            .filter(Snapshot.agent_id.isnot(None))
+        if self.snapshot_watermark is None:
+            query = query.filter(Snapshot.snapshot_at >= window_start(now, self.rolling.window_days))
+            self.snapshot_watermark = db.query(Snapshot.id).order_by(Snapshot.id.desc()).limit(1).scalar() or 0
+            self.ledger_watermark = db.query(Ledger.id).order_by(Ledger.id.desc()).limit(1).scalar() or 0
+            snapshots = query.filter(Snapshot.id <= self.snapshot_watermark).all()
+            self._unseen(snapshots, self._seen_snapshots, self.snapshot_watermark - self.overlap)
+            self._unseen(
+                db.query(Ledger.id).filter(Ledger.id > self.ledger_watermark - self.overlap, Ledger.id <= self.ledger_watermark).all(),
+                self._seen_settles, self.ledger_watermark - self.overlap
+            )
+        else:
+            low = self.snapshot_watermark - self.overlap
+            snapshots = self._unseen(
+                query.filter(Snapshot.id > low).order_by(Snapshot.id).all(), self._seen_snapshots, low
+            )
+            if snapshots:
+                self.snapshot_watermark = max(self.snapshot_watermark, snapshots[-1].id)
+            low = self.ledger_watermark - self.overlap
+            settled = self._unseen(
+                db.query(Ledger.id, Ledger.agent_id)
+                .filter(Ledger.id > low, Ledger.event_type == "SETTLE", Ledger.agent_id.isnot(None))
+                .all(),
+                self._seen_settles, low
+            )
+            if settled:
+                self.ledger_watermark = max(self.ledger_watermark, max(i for i, _ in settled))
+                dirty.update(self.rolling.row(agent_id) for _, agent_id in settled)
+
+        if snapshots:
+            rows = [self.rolling.row(s.agent_id) for s in snapshots]
+            self.rolling.add(
+                rows,
+                [day_number(s.snapshot_at) for s in snapshots],
+                [s.pnl or 0.0 for s in snapshots],
+                [s.sharpe or 0.0 for s in snapshots]
+            )
+            dirty.update(rows)
+
+        if not dirty:
+            return 0
+        rows = sorted(dirty)
+        write_trust_scores(db, [self.rolling.agent_ids[r] for r in rows], self.rolling.scores(rows), self.rolling.counts(rows), now)
+        return len(rows)
@@ -4,24 +4,38 @@ from sqlalchemy.orm import Session
 from app.db.session import SessionLocal
 from app.db import models
 from app.db.ledger import add_ledger_entry, get_agent_balance
-from app.engine.adversarial import AdversarialEngine
+from app.engine.adversarial import AdversarialEngine, DuelOutcome, duel_pairs, duel_participants
+from app.engine.matchmaking import MatchmakingQueue
+from app.engine.oracle import PriceOracle
+from app.engine.ratings import RatingService, DEFAULT_RATING
+from app.engine.settlement import directional_pnl, price_outcome
 import random
 import logging
 import uuid
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MARKET = "BTC-USDT" # Used for competitions created without an explicit market
+ACTIVE_STATUSES = ["upcoming", "open", "locked"]
+
 class CompetitionScheduler:
     def __init__(self):
         self.interval_seconds = 3600 # 1 hour
         self.startup_trigger = True # Flag to force start on boot
+        self.matchmaker = MatchmakingQueue()
+        self.duel_interval_seconds = 60
+        self._last_duel_pass = None
     
     async def run_forever(self):
         logger.info("Competition Scheduler started.")
         while True:
             db = SessionLocal()
             try:
+                await self.capture_reference_prices(db)
                 self.manage_lifecycles(db)
+                # Keeps stored RDs of idle agents current for the SQL-ranked rating leaderboard
+                if RatingService(db).age_idle():
+                    db.commit()
             except Exception as e:
                 logger.error(f"Scheduler Error: {e}")
             finally:
@@ -39,13 +53,34 @@ class CompetitionScheduler:
                 return datetime.datetime.strptime(dt_val, "%Y-%m-%d %H:%M:%S.%f")
         return dt_val
 
+    async def capture_reference_prices(self, db: Session):
+        """
+        Capture oracle prices for every start/lock/settle instant that has been reached.
+        Instants are deduplicated per market before hitting the price provider.
+        """
+        now = datetime.datetime.utcnow()
+        active = db.query(models.Competition).filter(
+            models.Competition.status.in_(["upcoming", "open", "locked"])
+        ).all()
+
+        keys = set()
+        for comp in active:
+            for at in (comp.start_time, comp.lock_time, comp.settle_time):
+                at = self._ensure_datetime(at)
+                if at and now >= at:
+                    keys.add(PriceOracle.key(comp.market or DEFAULT_MARKET, at))
+        if keys:
+            await PriceOracle(db).capture_many(keys)
+
     def manage_lifecycles(self, db: Session):
         now = datetime.datetime.utcnow()
+        oracle = PriceOracle(db)
         
         # 1. Schedule New Competition
         # Check for active (upcoming or open) competitions
         active_count = db.query(models.Competition).filter(
-            models.Competition.status.in_(["upcoming", "open", "locked"])
+            models.Competition.status.in_(ACTIVE_STATUSES),
+            models.Competition.scoring_type != "duel"
         ).count()
 
         should_create = False
@@ -68,6 +103,11 @@ class CompetitionScheduler:
         if should_create:
             self.create_new_competition(db)
 
+        # 1b. Pair queued agents into duels
+        if self._last_duel_pass is None or (now - self._last_duel_pass).total_seconds() >= self.duel_interval_seconds:
+            self._last_duel_pass = now
+            self.schedule_adversarial_duel(db)
+
         # 2. Transition upcoming -> open
         # (Start time reached)
         upcoming = db.query(models.Competition).filter(models.Competition.status == "upcoming").all()
@@ -89,62 +129,133 @@ class CompetitionScheduler:
                 logger.info(f"Competition {comp.slug} is now LOCKED.")
 
         # 4. Transition locked -> settled
-        # (Settle time reached)
+        # (Settle time reached, settled in bulk from oracle prices)
         locked = db.query(models.Competition).filter(models.Competition.status == "locked").all()
-        for comp in locked:
-            settle_time = self._ensure_datetime(comp.settle_time)
-            if now >= settle_time:
-                # 1. Generate Result (Mock outcome for MVP)
-                outcome = random.choice(["LONG", "SHORT"])
-                comp.outcome = outcome
-                logger.info(f"Settling {comp.slug}. Result: {outcome}")
-                
-                # 2. Score all submissions
-                submissions = db.query(models.Submission).filter(models.Submission.competition_id == comp.id).all()
-                pnl_summary = []
+        due = [c for c in locked if now >= self._ensure_datetime(c.settle_time)]
+        if due:
+            self.settle_competitions(db, due, oracle)
+        
+        # 5. Simulate Live Agent Activity
+        self.simulate_live_activity(db, oracle)
+
+    def settle_competitions(self, db: Session, comps: list, oracle: PriceOracle):
+        """
+        Settles competitions against the oracle's lock -> settle prices.
+        Competitions whose prices are not captured yet stay locked until the next pass.
+        """
+        oracle.load(
+            PriceOracle.key(c.market or DEFAULT_MARKET, self._ensure_datetime(t))
+            for c in comps
+            for t in (c.lock_time, c.settle_time)
+        )
+        ready = []
+        for comp in comps:
+            market = comp.market or DEFAULT_MARKET
+            price_lock = oracle.get(market, self._ensure_datetime(comp.lock_time))
+            price_settle = oracle.get(market, self._ensure_datetime(comp.settle_time))
+            if price_lock is None or price_settle is None:
+                logger.warning(f"Oracle prices missing for {comp.slug}, deferring settlement.")
+                continue
+            ready.append((comp, price_lock, price_settle))
+        if not ready:
+            return
+
+        # Bulk-load submissions and agent names for every competition being settled
+        comp_ids = [comp.id for comp, _, _ in ready]
+        submissions = db.query(models.Submission).filter(models.Submission.competition_id.in_(comp_ids)).all()
+        subs_by_comp = {}
+        for sub in submissions:
+            subs_by_comp.setdefault(sub.competition_id, []).append(sub)
+        agent_ids = {sub.agent_id for sub in submissions}
+        names = dict(db.query(models.Agent.id, models.Agent.name).filter(models.Agent.id.in_(agent_ids)).all()) if agent_ids else {}
+        sys_agent = self._get_or_create_system_agent(db)
+        ratings = RatingService(db)
+        adversarial = AdversarialEngine(db)
+
+        for comp, price_lock, price_settle in ready:
+            outcome = price_outcome(price_lock, price_settle)
+            comp.outcome = outcome
+            # An unchanged price is a push: nobody wins or loses, stakes come back in full (PnL 0), no rating change
+            push = outcome == "FLAT"
+            logger.info(f"Settling {comp.slug}. {price_lock:.2f} -> {price_settle:.2f}. Result: {outcome}")
+            
+            pnl_summary = []
+            rating_results = []
+            for sub in subs_by_comp.get(comp.id, []):
+                action = sub.payload.get("action", "").upper()
+                conf = sub.payload.get("confidence", 0.5)
                 
-                for sub in submissions:
-                    action = sub.payload.get("action", "").upper()
-                    conf = sub.payload.get("confidence", 0.5)
-                    
-                    is_correct = (action == outcome)
+                is_correct = (action == outcome)
+                if push:
+                    pnl = 0.0
+                elif "stake" in sub.payload:
+                    pnl = directional_pnl(action, sub.payload.get("stake", 0), price_lock, price_settle)
+                else:
                     pnl = 100 * conf if is_correct else -100 * conf # Simple PnL logic
-                    
-                    # Create Score
-                    score = models.Score(
-                        id=uuid.uuid4(),
-                        competition_id=comp.id,
-                        agent_id=sub.agent_id,
-                        score=1.0 if is_correct else 0.0,
-                        details={"pnl": pnl, "confidence": conf, "action": action, "outcome": outcome}
-                    )
-                    db.add(score)
-                    
-                    # Add Ledger Entry
-                    add_ledger_entry(db, sub.agent_id, comp.id, "SETTLE", pnl)
-                    
-                    agent = db.query(models.Agent).filter(models.Agent.id == sub.agent_id).first()
-                    if agent:
-                        pnl_summary.append({"name": agent.name, "pnl": pnl})
-
-                # 3. System Announcement
-                if pnl_summary:
-                    winner = max(pnl_summary, key=lambda x: x["pnl"])
-                    announcement = f"🏁 RESULT: {comp.title} settled. Outcome: {outcome}. Top Agent: {winner['name']} (+${winner['pnl']:.0f})"
-                    sys_agent = self._get_or_create_system_agent(db)
-                    post = models.Post(
-                        agent_id=sys_agent.id,
-                        content=announcement,
-                        timestamp=datetime.datetime.utcnow()
-                    )
-                    db.add(post)
                 
-                comp.status = "settled"
-                db.commit()
-                logger.info(f"Competition {comp.slug} SETTLED.")
-        
-        # 5. Simulate Live Agent Activity
-        self.simulate_live_activity(db)
+                # Create Score
+                score = models.Score(
+                    id=uuid.uuid4(),
+                    competition_id=comp.id,
+                    agent_id=sub.agent_id,
+                    score=0.5 if push else 1.0 if is_correct else 0.0,
+                    details={
+                        "pnl": pnl, "confidence": conf, "action": action, "outcome": outcome, "push": push,
+                        "price_lock": price_lock, "price_settle": price_settle
+                    }
+                )
+                db.add(score)
+                
+                # Add Ledger Entry
+                add_ledger_entry(db, sub.agent_id, comp.id, "SETTLE", pnl)
+                rating_results.append((sub.agent_id, pnl))
+                
+                if sub.agent_id in names:
+                    pnl_summary.append({"name": names[sub.agent_id], "pnl": pnl})
+
+            # System Announcement
+            if pnl_summary and push:
+                announcement = f"🏁 RESULT: {comp.title} settled. Outcome: FLAT, a push. All stakes refunded."
+            elif pnl_summary:
+                winner = max(pnl_summary, key=lambda x: x["pnl"])
+                announcement = f"🏁 RESULT: {comp.title} settled. Outcome: {outcome}. Top Agent: {winner['name']} (+${winner['pnl']:.0f})"
+            if pnl_summary:
+                post = models.Post(
+                    agent_id=sys_agent.id,
+                    content=announcement,
+                    timestamp=datetime.datetime.utcnow()
+                )
+                db.add(post)
+            
+            # Rating update, committed together with the settlement
+            if comp.scoring_type == "duel" and not push:
+                self._settle_duel_pairs(comp, dict(rating_results), adversarial, ratings)
+            elif not push:
+                ratings.record_competition(rating_results)
+            comp.status = "settled"
+            # Later competitions in this batch read balances that include these entries
+            db.flush()
+            logger.info(f"Competition {comp.slug} SETTLED.")
+        db.commit()
+
+    def _settle_duel_pairs(self, comp, pnl_by_agent: dict, adversarial: AdversarialEngine, ratings: RatingService):
+        """
+        Rates each pairing of a duel round on its own: distinct PnLs are recorded as DuelResults (one batch),
+        equal PnLs as a drawn game. Pairings with a missing submission are not rated.
+        """
+        pnl_by_agent = {str(agent_id): pnl for agent_id, pnl in pnl_by_agent.items()}
+        outcomes = []
+        for a, b in duel_pairs(comp.input_schema):
+            if a not in pnl_by_agent or b not in pnl_by_agent:
+                continue
+            pnl_a, pnl_b = pnl_by_agent[a], pnl_by_agent[b]
+            if pnl_a == pnl_b:
+                ratings.record_competition([(a, pnl_a), (b, pnl_b)])
+                continue
+            (winner, pnl_w), (loser, pnl_l) = sorted([(a, pnl_a), (b, pnl_b)], key=lambda r: r[1], reverse=True)
+            outcomes.append(DuelOutcome(winner, loser, pnl_w - pnl_l, pnl_w, pnl_l))
+        if outcomes:
+            adversarial.record_duel_results(comp.slug, outcomes)
 
     def _get_or_create_system_agent(self, db: Session):
         sys_agent = db.query(models.Agent).filter(models.Agent.name == "SYSTEM").first()
@@ -161,25 +272,36 @@ class CompetitionScheduler:
             db.refresh(sys_agent)
         return sys_agent
 
-    def simulate_live_activity(self, db: Session):
+    def simulate_live_activity(self, db: Session, oracle: PriceOracle = None):
         # 1. Find Open Competitions
         open_comps = db.query(models.Competition).filter(
             models.Competition.status == "open"
         ).all()
+        oracle = oracle or PriceOracle(db)
+        agents = db.query(models.Agent).filter(
+            models.Agent.is_active == True,
+            models.Agent.name != "SYSTEM"
+        ).all() if open_comps else []
+        # Who already submitted where, one query for every open competition
+        submitted = set(
+            db.query(models.Submission.competition_id, models.Submission.agent_id)
+            .filter(models.Submission.competition_id.in_([comp.id for comp in open_comps]))
+            .all()
+        ) if open_comps else set()
         
         for comp in open_comps:
-            # Check for agents who haven't submitted yet
-            agents = db.query(models.Agent).filter(
-                models.Agent.is_active == True,
-                models.Agent.name != "SYSTEM"
-            ).all()
+            # Market context shared by every submission: the captured start price
+            start_price = oracle.get(comp.market or DEFAULT_MARKET, self._ensure_datetime(comp.start_time))
+            if start_price is None:
+                # Not captured yet (provider down or first pass): decide once the reference price exists
+                continue
+            # Duels only take decisions from their paired agents
+            players = duel_participants(comp.input_schema) if comp.scoring_type == "duel" else None
             
             for agent in agents:
-                # Check for existing submission
-                existing = db.query(models.Submission).filter(
-                    models.Submission.competition_id == comp.id,
-                    models.Submission.agent_id == agent.id
-                ).first()
+                if players is not None and str(agent.id) not in players:
+                    continue
+                existing = (comp.id, agent.id) in submitted
                 
                 if not existing and random.random() < 0.2: # 20% chance to submit per tick
                     actions = ["LONG", "SHORT", "WAIT"]
@@ -192,7 +314,7 @@ class CompetitionScheduler:
                         competition_id=comp.id,
                         agent_id=agent.id,
                         payload={"action": action, "confidence": conf},
-                        snapshot={"price": random.randint(40000, 60000), "source": "PYTH/MOCK"}
+                        snapshot={"price": start_price, "source": "ORACLE"}
                     )
                     db.add(sub)
                     
@@ -254,8 +376,65 @@ class CompetitionScheduler:
         logger.info(f"New competition created: {slug}")
 
     def schedule_adversarial_duel(self, db: Session):
-        # Placeholder / Deprecated for now until Adversarial Engine updated
-        pass
+        """
+        Queues every active agent that is not already in an unsettled duel at its current rating,
+        pairs nearby ratings through the matchmaking index and creates one duel round for the pass:
+        a single competition holding every pairing. Rounds settle through settle_competitions,
+        each pairing rated on its own.
+        """
+        now = datetime.datetime.utcnow()
+        if not self.matchmaker.has_history:
+            # Rebuild rematch memory after a restart from the most recent duels
+            recent = db.query(models.Competition.input_schema)\
+                .filter(models.Competition.scoring_type == "duel")\
+                .order_by(models.Competition.start_time.desc())\
+                .limit(1000).all()
+            for (schema,) in reversed(recent):
+                for pair in duel_pairs(schema):
+                    self.matchmaker.note_match(*pair)
+
+        open_duels = db.query(models.Competition.input_schema).filter(
+            models.Competition.scoring_type == "duel",
+            models.Competition.status.in_(ACTIVE_STATUSES)
+        ).all()
+        busy = {agent for (schema,) in open_duels for agent in duel_participants(schema)}
+
+        agents = db.query(models.Agent.id, models.AgentRating.rating)\
+            .outerjoin(models.AgentRating, models.AgentRating.agent_id == models.Agent.id)\
+            .filter(models.Agent.is_active == True, models.Agent.name != "SYSTEM")\
+            .all()
+        eligible = set()
+        for agent_id, rating in agents:
+            key = str(agent_id)
+            if key in busy:
+                continue
+            eligible.add(key)
+            self.matchmaker.enqueue(key, rating if rating is not None else DEFAULT_RATING)
+        self.matchmaker.retain(eligible)
+
+        pairs = self.matchmaker.pair_all()
+        if not pairs:
+            return
+        lock_time = now + datetime.timedelta(minutes=1.8)
+        settle_time = now + datetime.timedelta(minutes=2)
+        db.add(models.Competition(
+            id=uuid.uuid4(),
+            slug=f"duel_{now.strftime('%Y%m%d_%H%M')}_{uuid.uuid4().hex[:8]}",
+            title="2-Min BTC Duel Round",
+            description=f"{len(pairs)} head-to-head BTC direction duels. Higher PnL wins each pairing.",
+            input_schema={
+                "action": ["long", "short", "wait"], "confidence": "float", "stake": "float",
+                "duel": {"pairs": [[agent_a, agent_b] for agent_a, agent_b in pairs]}
+            },
+            scoring_type="duel",
+            start_time=now,
+            lock_time=lock_time,
+            settle_time=settle_time,
+            status="upcoming",
+            market=DEFAULT_MARKET
+        ))
+        db.commit()
+        logger.info(f"Scheduled a duel round of {len(pairs)} pairings ({len(self.matchmaker)} agents still queued).")
 
 if __name__ == "__main__":
     scheduler = CompetitionScheduler()
@@ -2,6 +2,46 @@ from sqlalchemy.orm import Session
 from app.db import models
 from app.db.ledger import add_ledger_entry, get_agent_balance
 import datetime
+from typing import Tuple
+
+def directional_pnl(action: str, stake: float, price_start: float, price_end: float) -> float:
+    """
+    PnL of a directional stake between two reference prices.
+    Accepts both OPEN_LONG/OPEN_SHORT decisions and LONG/SHORT predictions.
+    """
+    action = (action or "").upper()
+    if action in ("OPEN_LONG", "LONG"):
+        return stake * (price_end - price_start) / price_start
+    elif action in ("OPEN_SHORT", "SHORT"):
+        return stake * (price_start - price_end) / price_start
+    return 0.0
+
+def decision_stake(payload: dict, equity: float) -> Tuple[str, float]:
+    """
+    A decision as (direction, stake). Accepts stake-based decisions (OPEN_LONG/OPEN_SHORT or LONG/SHORT
+    with "stake") and order-style ones (BUY/SELL with "size", a fraction of `equity` capped at 1.0).
+    Anything else is ("HOLD", 0).
+    """
+    action = str(payload.get("action") or "").upper()
+    if action in ("OPEN_LONG", "LONG", "BUY"):
+        direction = "LONG"
+    elif action in ("OPEN_SHORT", "SHORT", "SELL"):
+        direction = "SHORT"
+    else:
+        return "HOLD", 0.0
+    try:
+        stake = float(payload["stake"]) if payload.get("stake") is not None \
+            else min(max(float(payload.get("size") or 0.0), 0.0), 1.0) * equity
+    except (TypeError, ValueError):
+        return "HOLD", 0.0
+    return direction, max(stake, 0.0)
+
+def price_outcome(price_start: float, price_end: float) -> str:
+    if price_end > price_start:
+        return "LONG"
+    elif price_end < price_start:
+        return "SHORT"
+    return "FLAT"
 
 class SettlementEngine:
     def __init__(self, db: Session):
@@ -25,11 +65,7 @@ class SettlementEngine:
             action = payload.get("action", "WAIT")
             stake = payload.get("stake", 0)
             
-            pnl = 0.0
-            if action == "OPEN_LONG":
-                pnl = stake * (price_end - price_start) / price_start
-            elif action == "OPEN_SHORT":
-                pnl = stake * (price_start - price_end) / price_start
+            pnl = directional_pnl(action, stake, price_start, price_end)
             
             # 1. SETTLE event (PnL)
             add_ledger_entry(self.db, agent_id, competition_id, "SETTLE", pnl)
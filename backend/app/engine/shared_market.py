@@ -0,0 +1,66 @@
+import os
+import tempfile
+import uuid
+import numpy as np
+import pandas as pd
+from app.engine.market_history import BAR_FIELDS
+
+# Prefer RAM-backed storage where available
+SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+class SharedMarketBuffer:
+    """
+    A competition's OHLCV history in a memory-mapped file.
+    Agent processes map it read-only (see `attach`) and only receive a step index per tick,
+    so market data is neither re-serialized nor copied per agent.
+    Rows follow BAR_FIELDS with timestamps as epoch seconds.
+    With `visible` set, only that many rows are written up front and the rest are NaN until `publish(step)`
+    reveals them, so an agent mapping the file cannot read bars after the current tick.
+    By default (platform-internal sharing, e.g. batch workers) every row is written at once.
+    """
+    def __init__(self, market_data: pd.DataFrame, name: str = None, directory: str = SHM_DIR, visible: int = None):
+        self.path = os.path.join(directory, f"agentolympics_{name or uuid.uuid4().hex}.f64")
+        shape = (len(market_data), len(BAR_FIELDS))
+        rows = np.empty(shape, dtype=np.float64)
+        rows[:, 0] = pd.to_datetime(market_data["timestamp"]).values.astype("datetime64[ns]").astype(np.int64) / 1e9
+        for i, field in enumerate(BAR_FIELDS[1:], start=1):
+            rows[:, i] = market_data[field].to_numpy(dtype=np.float64)
+        self.visible = shape[0] if visible is None else max(0, min(visible, shape[0]))
+        buf = np.memmap(self.path, dtype=np.float64, mode="w+", shape=shape)
+        buf[:self.visible] = rows[:self.visible]
+        buf[self.visible:] = np.nan
+        buf.flush()
+        self.shape = shape
+        if self.visible < shape[0]:
+            # Kept mapped (shared with readers) to reveal rows as ticks advance
+            self._rows, self._buf = rows, buf
+        else:
+            self._rows = self._buf = None
+            del buf
+
+    def publish(self, step: int):
+        """Reveals rows [0, step]. Writes go through the shared mapping, so readers see them without a flush."""
+        end = min(step + 1, self.shape[0])
+        if self._buf is None or end <= self.visible:
+            return
+        self._buf[self.visible:end] = self._rows[self.visible:end]
+        self.visible = end
+
+    @property
+    def descriptor(self) -> dict:
+        return {"path": self.path, "dtype": "float64", "shape": list(self.shape), "columns": BAR_FIELDS}
+
+    def close(self):
+        self._rows = self._buf = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def attach(descriptor: dict) -> np.ndarray:
+    """Read-only view over a published buffer. Rows [0, step] are valid at a given step; later rows may be NaN."""
+    return np.memmap(descriptor["path"], dtype=descriptor["dtype"], mode="r", shape=tuple(descriptor["shape"]))
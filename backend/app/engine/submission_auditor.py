@@ -1,11 +1,17 @@
 import os
-import re
 import subprocess
 import sys
 import tempfile
+from collections import OrderedDict
 from sqlalchemy.orm import Session
 from app.db import models
+from app.engine.agent_pool import ENTRYPOINTS
+from app.engine.code_safety import analyze, code_hash
 from app.engine.manifest_v1 import validate_manifest
+from app.engine.zygote import get_zygote
+
+TRIAL_CACHE_SIZE = 4096
+_trial_results: "OrderedDict[str, tuple]" = OrderedDict() # code hash -> (is_runnable, err); transient failures are not kept
 
 class SubmissionAuditor:
     def __init__(self, db: Session):
@@ -27,39 +33,61 @@ class SubmissionAuditor:
         with open(code_path, "r") as f:
             code = f.read()
 
-        # 3. Static Scan (Security)
-        forbidden = [r"os\.", r"subprocess\.", r"eval\(", r"exec\(", r"shutil", r"__import__", r"socket"]
-        for pattern in forbidden:
-            if re.search(pattern, code):
-                return False, f"Security Audit Failed: Forbidden pattern '{pattern}' detected."
+        return self.audit_code(code)
+
+    def audit_code(self, code: str):
+        """Static scan, interface check and sandbox trial of strategy code (the manifest-independent part)."""
+        # 3. Static Scan (Security), one parse shared with the interface check and cached by code hash
+        report = analyze(code)
+        if report.syntax_error:
+            return False, f"Syntax Audit Failed: {report.syntax_error}"
+        if not report.ok:
+            return False, f"Security Audit Failed: {report.message}"
 
         # 4. Interface Check
-        if "def decide" not in code and "def on_data" not in code:
-            return False, "Interface Audit Failed: Missing 'decide' or 'on_data' entrypoint."
+        if not report.functions & set(ENTRYPOINTS):
+            return False, "Interface Audit Failed: Missing 'decide', 'on_tick' or 'on_data' entrypoint."
 
-        # 5. Sandbox Trial
-        is_runnable, err = self._run_trial(code)
+        # 5. Sandbox Trial, once per distinct code (same hash as its code store blob); timeouts are retried
+        key = code_hash(code)
+        trial = _trial_results.get(key)
+        if trial is None:
+            *trial, transient = self._run_trial(code)
+            if not transient:
+                _trial_results[key] = tuple(trial)
+                while len(_trial_results) > TRIAL_CACHE_SIZE:
+                    _trial_results.popitem(last=False)
+        else:
+            _trial_results.move_to_end(key)
+        is_runnable, err = trial
         if not is_runnable:
             return False, f"Execution Audit Failed: {err}"
 
         return True, "Audit Passed"
 
     def _run_trial(self, code: str):
+        """(is_runnable, err, transient): timeouts and launch errors are transient, not a property of the code."""
         with tempfile.NamedTemporaryFile(suffix=".py", mode='w', delete=False) as tmp:
             tmp.write(code)
             tmp_path = tmp.name
         
         try:
-            # Simple syntax check + trial run
-            result = subprocess.run([sys.executable, tmp_path], capture_output=True, timeout=2)
+            # Simple syntax check + trial run, forked from the pre-warmed zygote when available
+            zygote = get_zygote()
+            if zygote is not None:
+                result = zygote.run(tmp_path, timeout=2)
+                if result.timed_out:
+                    return False, "Trial timed out after 2 seconds", True
+            else:
+                result = subprocess.run([sys.executable, tmp_path], capture_output=True, timeout=2)
             if result.returncode != 0:
                 # We expect it might fail if it tries to do things without proper context, 
                 # but it should at least be syntactically correct.
                 # A better trial would provide a mock 'context' and 'market_data'.
                 pass 
-            return True, None
+            return True, None, False
         except Exception as e:
-            return False, str(e)
+            return False, str(e), True
         finally:
             if os.path.exists(tmp_path):
                 os.remove(tmp_path)
@@ -0,0 +1,206 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+# Upper bounds (seconds) of the decision latency histogram; a final +Inf bucket is implicit
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0)
+OUTCOMES = ("ok", "timeout", "crash", "error")
+MAX_COMPETITIONS = 256 # oldest competitions are evicted past this
+
+class AgentTelemetry:
+    """Counters for one agent within one competition."""
+    def __init__(self):
+        self.decisions = 0
+        self.outcomes = {outcome: 0 for outcome in OUTCOMES}
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.latency_ewma = None
+        self.cpu_time = 0.0
+        self.peak_rss_kb = 0
+        self.bytes_in = 0 # platform -> agent
+        self.bytes_out = 0 # agent -> platform
+        self.throttled_ticks = 0
+        self.deadline_misses = 0 # ticks that went ahead without this agent's decision
+        self.throttle_count = 0
+        self.throttled_until = -1
+        self.consecutive_failures = 0
+        self.last_step = None
+
+    def observe_latency(self, latency: float):
+        index = len(LATENCY_BUCKETS)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                index = i
+                break
+        self.buckets[index] += 1
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Histogram estimate: upper bound of the bucket holding the q-th observation (max for +Inf)."""
+        total = sum(self.buckets)
+        if total == 0:
+            return None
+        rank, seen = q * total, 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else self.latency_max
+        return self.latency_max
+
+    def to_dict(self, step: int = None) -> dict:
+        observed = sum(self.buckets)
+        return {
+            "decisions": self.decisions,
+            "outcomes": dict(self.outcomes),
+            "latency": {
+                "mean": self.latency_sum / observed if observed else None,
+                "p50": self.quantile(0.5),
+                "p95": self.quantile(0.95),
+                "p99": self.quantile(0.99),
+                "max": self.latency_max if observed else None,
+                "buckets": dict(zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], self.buckets))
+            },
+            "cpu_time": self.cpu_time,
+            "peak_rss_kb": self.peak_rss_kb,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "throttled_ticks": self.throttled_ticks,
+            "deadline_misses": self.deadline_misses,
+            "throttled": step is not None and step < self.throttled_until
+        }
+
+class CompetitionTelemetry:
+    """
+    Per-agent decision telemetry for one competition, plus automatic throttling:
+    after `max_consecutive_failures` timeouts/crashes/errors in a row, or when the agent's
+    smoothed latency exceeds `slow_latency`, the agent is skipped (HOLD) for `throttle_ticks` ticks,
+    doubling on each repeat up to 8x.
+    """
+    def __init__(self, competition_id: str, max_consecutive_failures: int = 3, slow_latency: float = 1.0,
+                 throttle_ticks: int = 10):
+        self.competition_id = competition_id
+        self.max_consecutive_failures = max_consecutive_failures
+        self.slow_latency = slow_latency
+        self.throttle_ticks = throttle_ticks
+        self.agents: Dict[str, AgentTelemetry] = {}
+        self.step = 0
+        self._lock = threading.Lock()
+
+    def _agent(self, agent_id: str) -> AgentTelemetry:
+        stats = self.agents.get(agent_id)
+        if stats is None:
+            stats = self.agents[agent_id] = AgentTelemetry()
+        return stats
+
+    def is_throttled(self, agent_id: str, step: int) -> bool:
+        """True if the agent should be skipped this tick; counts the skipped tick."""
+        with self._lock:
+            self.step = max(self.step, step)
+            stats = self._agent(str(agent_id))
+            if step < stats.throttled_until:
+                stats.throttled_ticks += 1
+                return True
+            return False
+
+    def record_deadline_miss(self, agent_id: str):
+        with self._lock:
+            self._agent(str(agent_id)).deadline_misses += 1
+
+    def record(self, agent_id: str, step: int, outcome: str, latency: float = None, cpu_time: float = None,
+               peak_rss_kb: int = None, bytes_in: int = None, bytes_out: int = None):
+        with self._lock:
+            self.step = max(self.step, step)
+            stats = self._agent(str(agent_id))
+            stats.decisions += 1
+            stats.last_step = step
+            stats.outcomes[outcome if outcome in stats.outcomes else "error"] += 1
+            if latency is not None:
+                stats.observe_latency(latency)
+            if cpu_time:
+                stats.cpu_time += cpu_time
+            if peak_rss_kb:
+                stats.peak_rss_kb = max(stats.peak_rss_kb, int(peak_rss_kb))
+            stats.bytes_in += bytes_in or 0
+            stats.bytes_out += bytes_out or 0
+
+            stats.consecutive_failures = 0 if outcome == "ok" else stats.consecutive_failures + 1
+            failing = stats.consecutive_failures >= self.max_consecutive_failures
+            slow = self.slow_latency is not None and (stats.latency_ewma or 0.0) > self.slow_latency
+            if failing or slow:
+                stats.throttle_count += 1
+                stats.throttled_until = step + 1 + self.throttle_ticks * min(2 ** (stats.throttle_count - 1), 8)
+                stats.consecutive_failures = 0
+                # Start afresh after the penalty so one slow spell does not throttle forever
+                stats.latency_ewma = None
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "competition_id": self.competition_id,
+                "step": self.step,
+                "agents": {agent_id: stats.to_dict(self.step) for agent_id, stats in self.agents.items()}
+            }
+
+_competitions: "OrderedDict[str, CompetitionTelemetry]" = OrderedDict()
+_registry_lock = threading.Lock()
+
+def get_competition_telemetry(competition_id, create: bool = True, **policy) -> Optional[CompetitionTelemetry]:
+    """Shared telemetry for a competition, so executors and the API see the same counters."""
+    key = str(competition_id)
+    with _registry_lock:
+        telemetry = _competitions.get(key)
+        if telemetry is None and create:
+            telemetry = _competitions[key] = CompetitionTelemetry(key, **policy)
+            while len(_competitions) > MAX_COMPETITIONS:
+                _competitions.popitem(last=False)
+        return telemetry
+
+def all_competition_telemetry() -> List[CompetitionTelemetry]:
+    with _registry_lock:
+        return list(_competitions.values())
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def render_prometheus(competitions: List[CompetitionTelemetry]) -> str:
+    """Prometheus text exposition format (0.0.4) for the given competitions."""
+    counters = [
+        ("agent_decisions_total", "counter", "Decisions requested from the agent, by outcome."),
+        ("agent_decision_latency_seconds", "histogram", "Wall-clock time to obtain a decision."),
+        ("agent_cpu_seconds_total", "counter", "CPU time consumed while deciding."),
+        ("agent_peak_rss_bytes", "gauge", "Peak resident set size of the agent's runs; zygote forks count only growth above the shared zygote baseline, pooled agents report their worker's peak."),
+        ("agent_bytes_in_total", "counter", "Bytes sent to the agent."),
+        ("agent_bytes_out_total", "counter", "Bytes received from the agent."),
+        ("agent_throttled_ticks_total", "counter", "Ticks skipped because the agent was throttled."),
+        ("agent_deadline_misses_total", "counter", "Ticks that proceeded without the agent's decision."),
+        ("agent_throttled", "gauge", "1 while the agent is throttled."),
+    ]
+    lines = {name: [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"] for name, kind, help_text in counters}
+
+    for telemetry in competitions:
+        snapshot_step = telemetry.step
+        with telemetry._lock:
+            items = list(telemetry.agents.items())
+        for agent_id, stats in items:
+            labels = f'competition="{_label(telemetry.competition_id)}",agent="{_label(agent_id)}"'
+            for outcome, count in stats.outcomes.items():
+                lines["agent_decisions_total"].append(f'agent_decisions_total{{{labels},outcome="{outcome}"}} {count}')
+            cumulative = 0
+            hist = lines["agent_decision_latency_seconds"]
+            for bound, count in zip(list(LATENCY_BUCKETS) + ["+Inf"], stats.buckets):
+                cumulative += count
+                hist.append(f'agent_decision_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            hist.append(f"agent_decision_latency_seconds_sum{{{labels}}} {stats.latency_sum}")
+            hist.append(f"agent_decision_latency_seconds_count{{{labels}}} {cumulative}")
+            lines["agent_cpu_seconds_total"].append(f"agent_cpu_seconds_total{{{labels}}} {stats.cpu_time}")
+            lines["agent_peak_rss_bytes"].append(f"agent_peak_rss_bytes{{{labels}}} {stats.peak_rss_kb * 1024}")
+            lines["agent_bytes_in_total"].append(f"agent_bytes_in_total{{{labels}}} {stats.bytes_in}")
+            lines["agent_bytes_out_total"].append(f"agent_bytes_out_total{{{labels}}} {stats.bytes_out}")
+            lines["agent_throttled_ticks_total"].append(f"agent_throttled_ticks_total{{{labels}}} {stats.throttled_ticks}")
+            lines["agent_deadline_misses_total"].append(f"agent_deadline_misses_total{{{labels}}} {stats.deadline_misses}")
+            lines["agent_throttled"].append(f"agent_throttled{{{labels}}} {int(snapshot_step < stats.throttled_until)}")
+
+    return "\n".join(line for block in lines.values() for line in block) + "\n"
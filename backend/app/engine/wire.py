@@ -0,0 +1,117 @@
+"""
+Tick/decision wire formats between the platform and agent processes.
+
+- json:    one JSON object per line (default, always available)
+- msgpack: 4-byte big-endian length prefix + msgpack map (requires `msgpack`)
+- struct:  4-byte length prefix + fixed little-endian layout (stdlib only)
+
+Only stdlib and optional msgpack are used, so agents can vendor this module as-is.
+"""
+import json
+import struct
+from typing import List
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+LENGTH = struct.Struct(">I")
+# step, timestamp, open, high, low, close, volume, cash, equity, position size, position avg price
+TICK_STRUCT = struct.Struct("<q10d")
+# action code, size, confidence (+ optional utf-8 reason after the fixed part)
+DECISION_STRUCT = struct.Struct("<Bdd")
+ACTIONS = ["HOLD", "BUY", "SELL"]
+
+def supported_formats() -> List[str]:
+    return ["msgpack", "struct", "json"] if HAS_MSGPACK else ["struct", "json"]
+
+def negotiate(preferred: List[str]) -> str:
+    """First format in the agent's preference list that the platform supports, else json."""
+    available = supported_formats()
+    for fmt in preferred or []:
+        if fmt in available:
+            return fmt
+    return "json"
+
+def frame(payload: bytes) -> bytes:
+    return LENGTH.pack(len(payload)) + payload
+
+def read_frame(stream) -> bytes:
+    """Read one length-prefixed frame from a binary stream, or b'' at EOF."""
+    header = stream.read(LENGTH.size)
+    if len(header) < LENGTH.size:
+        return b""
+    return stream.read(LENGTH.unpack(header)[0])
+
+def unframe(data: bytes) -> bytes:
+    (length,) = LENGTH.unpack_from(data)
+    return data[LENGTH.size:LENGTH.size + length]
+
+def _tick_fields(tick: dict, symbol: str = None):
+    meta = tick.get("meta", {})
+    if "market" in tick and tick["market"].get("ohlcv"):
+        ts, o, h, l, c, v = tick["market"]["ohlcv"][-1]
+        symbol = symbol or tick["market"].get("symbol")
+    else:
+        # Live snapshot: current bar when available, otherwise a flat bar at the last price
+        snap = tick.get("market_snapshot", {})
+        bar = snap.get("bar") or [0.0, snap.get("price", 0.0), snap.get("price", 0.0), snap.get("price", 0.0), snap.get("price", 0.0), 0.0]
+        ts, o, h, l, c, v = bar
+        symbol = symbol or tick.get("competition", {}).get("symbol")
+    account = tick.get("account", {})
+    position = account.get("positions", {}).get(symbol, {})
+    return (
+        int(meta.get("step", 0)), float(ts), float(o), float(h), float(l), float(c), float(v),
+        float(account.get("cash", 0.0)), float(account.get("equity", account.get("cash", 0.0))),
+        float(position.get("size", 0.0)), float(position.get("avg_price", 0.0))
+    )
+
+def encode_tick(fmt: str, tick: dict) -> bytes:
+    if fmt == "struct":
+        return frame(TICK_STRUCT.pack(*_tick_fields(tick)))
+    if fmt == "msgpack":
+        return frame(msgpack.packb(tick))
+    return (json.dumps(tick) + "\n").encode()
+
+def decode_tick(fmt: str, data: bytes) -> dict:
+    """Agent side. For struct, returns the flat field layout."""
+    if fmt == "struct":
+        step, ts, o, h, l, c, v, cash, equity, size, avg_price = TICK_STRUCT.unpack(unframe(data))
+        return {
+            "step": step, "ohlcv": [ts, o, h, l, c, v],
+            "cash": cash, "equity": equity, "position": {"size": size, "avg_price": avg_price}
+        }
+    if fmt == "msgpack":
+        return msgpack.unpackb(unframe(data))
+    return json.loads(data)
+
+def encode_decision(fmt: str, decision: dict) -> bytes:
+    """Agent side."""
+    if fmt == "struct":
+        action = decision.get("action", "HOLD").upper()
+        reason = str(decision.get("reason", "")).encode()
+        fixed = DECISION_STRUCT.pack(
+            ACTIONS.index(action) if action in ACTIONS else 0,
+            float(decision.get("size", 0.0)),
+            float(decision.get("confidence", 0.0))
+        )
+        return frame(fixed + reason)
+    if fmt == "msgpack":
+        return frame(msgpack.packb(decision))
+    return (json.dumps(decision) + "\n").encode()
+
+def decode_decision(fmt: str, data: bytes) -> dict:
+    if fmt == "struct":
+        body = unframe(data)
+        code, size, confidence = DECISION_STRUCT.unpack_from(body)
+        return {
+            "action": ACTIONS[code] if code < len(ACTIONS) else "HOLD",
+            "size": size,
+            "confidence": confidence,
+            "reason": body[DECISION_STRUCT.size:].decode(errors="replace")
+        }
+    if fmt == "msgpack":
+        return msgpack.unpackb(unframe(data))
+    return json.loads(data)
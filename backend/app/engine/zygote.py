@@ -0,0 +1,292 @@
+import json
+import logging
+import os
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Connection
+from multiprocessing.reduction import send_handle, recv_handle
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Imported once in the zygote, inherited by every forked agent run
+DEFAULT_PRELOAD = ["json", "math", "statistics", "numpy", "pandas"]
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class RunResult(NamedTuple):
+    returncode: int # -9 when killed on timeout, -1 when the child died without reporting
+    stdout: bytes
+    stderr: bytes
+    timed_out: bool = False
+    cpu_time: float = 0.0 # user + system seconds of the child, as reported by the child itself
+    max_rss_kb: int = 0 # zygote forks: peak growth above the RSS inherited from the zygote; run_process: whole child
+
+def _run_child(path: str, memory_limit_mb: Optional[int]):
+    """Runs inside the forked child with fds 0/1/2 already pointing at the caller's pipes."""
+    import runpy
+    import traceback
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    if memory_limit_mb:
+        import resource
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    sys.stdin = open(0, "r", closefd=False)
+    sys.stdout = open(1, "w", closefd=False)
+    sys.stderr = open(2, "w", closefd=False)
+    sys.argv = [path]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+    try:
+        runpy.run_path(path, run_name="__main__")
+        return 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException:
+        traceback.print_exc()
+        return 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+def _zygote_main(fd: int, preload, memory_limit_mb):
+    conn = Connection(fd)
+    for module in preload:
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+    # Children are reaped automatically; callers learn exit codes through the status pipe
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    conn.send("ready")
+
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            return
+        if msg[0] == "stop":
+            return
+        _, path = msg
+        fds = [recv_handle(conn) for _ in range(4)] # stdin, stdout, stderr, status
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                import resource
+                # Pages inherited from the zygote (interpreter + preloads) count towards the child's RSS;
+                # only growth above this baseline is the agent's own
+                baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                conn.close()
+                for target, fd in zip((0, 1, 2), fds[:3]):
+                    os.dup2(fd, target)
+                    os.close(fd)
+                code = _run_child(path, memory_limit_mb)
+                usage = resource.getrusage(resource.RUSAGE_SELF)
+                rss_kb = max(usage.ru_maxrss - baseline_kb, 0)
+                os.write(fds[3], f"{code} {usage.ru_utime + usage.ru_stime} {rss_kb}".encode())
+            finally:
+                os._exit(code)
+        for fd in fds:
+            os.close(fd)
+        conn.send(pid)
+
+def _exchange(stdin_w: int, read_fds, input: bytes, timeout: float):
+    """
+    Feed `input` to stdin_w while draining read_fds until EOF or timeout. Closes every fd.
+    Returns ({fd: bytes}, timed_out).
+    """
+    outputs = {fd: bytearray() for fd in read_fds}
+    pending_input = memoryview(input)
+    sel = selectors.DefaultSelector()
+    for fd in outputs:
+        sel.register(fd, selectors.EVENT_READ)
+    if pending_input:
+        os.set_blocking(stdin_w, False)
+        sel.register(stdin_w, selectors.EVENT_WRITE)
+    else:
+        os.close(stdin_w)
+
+    timed_out = False
+    deadline = time.monotonic() + timeout
+    try:
+        while sel.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+            for key, _ in sel.select(remaining):
+                fd = key.fd
+                if fd == stdin_w:
+                    try:
+                        written = os.write(fd, pending_input[:65536])
+                        pending_input = pending_input[written:]
+                    except BrokenPipeError:
+                        pending_input = pending_input[:0]
+                    if not pending_input:
+                        sel.unregister(fd)
+                        os.close(fd)
+                    continue
+                chunk = os.read(fd, 65536)
+                if chunk:
+                    outputs[fd] += chunk
+                else:
+                    sel.unregister(fd)
+    finally:
+        for key in list(sel.get_map().values()):
+            sel.unregister(key.fd)
+            if key.fd == stdin_w:
+                os.close(stdin_w)
+        sel.close()
+        for fd in outputs:
+            os.close(fd)
+    return {fd: bytes(data) for fd, data in outputs.items()}, timed_out
+
+def run_process(args, input: bytes = b"", timeout: float = 2.0) -> RunResult:
+    """
+    subprocess.run(args, input=input, timeout=timeout) that also reports the child's CPU time and
+    peak RSS (from wait4). Safe to call from worker threads.
+    """
+    if not hasattr(os, "wait4"):
+        try:
+            completed = subprocess.run(args, input=input, capture_output=True, timeout=timeout)
+        except subprocess.TimeoutExpired as e:
+            return RunResult(-9, e.stdout or b"", e.stderr or b"", True)
+        return RunResult(completed.returncode, completed.stdout, completed.stderr)
+
+    stdin_r, stdin_w = os.pipe()
+    stdout_r, stdout_w = os.pipe()
+    stderr_r, stderr_w = os.pipe()
+    try:
+        process = subprocess.Popen(args, stdin=stdin_r, stdout=stdout_w, stderr=stderr_w)
+    except BaseException:
+        for fd in (stdin_w, stdout_r, stderr_r):
+            os.close(fd)
+        raise
+    finally:
+        for fd in (stdin_r, stdout_w, stderr_w):
+            os.close(fd)
+
+    outputs, timed_out = _exchange(stdin_w, (stdout_r, stderr_r), input, timeout)
+    if timed_out:
+        process.kill()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return RunResult(
+        -9 if timed_out else process.returncode, outputs[stdout_r], outputs[stderr_r], timed_out,
+        usage.ru_utime + usage.ru_stime, usage.ru_maxrss
+    )
+
+class Zygote:
+    """
+    Fork server for agent runs. A clean interpreter imports the common agent
+    dependencies once; each run is a fresh fork of it, so cold start drops to the cost of fork().
+    Agents still run in their own process with the same stdin/stdout protocol as `python agent.py`.
+    """
+    def __init__(self, preload=None, memory_limit_mb: Optional[int] = None):
+        # A bare interpreter (not a fork of the API server) that only imports this module and `preload`
+        parent_sock, child_sock = socket.socketpair()
+        bootstrap = (
+            f"import sys; sys.path.insert(0, {BACKEND_DIR!r}); "
+            f"from app.engine.zygote import _zygote_main; "
+            f"_zygote_main({child_sock.fileno()}, {json.dumps(preload or DEFAULT_PRELOAD)}, {memory_limit_mb!r})"
+        )
+        self.process = subprocess.Popen([sys.executable, "-c", bootstrap], pass_fds=[child_sock.fileno()])
+        child_sock.close()
+        self._conn = Connection(parent_sock.detach())
+        self._lock = threading.Lock()
+        if self._conn.recv() != "ready":
+            raise RuntimeError("Zygote failed to start")
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def _fork(self, path: str, child_fds) -> int:
+        with self._lock:
+            self._conn.send(("run", path))
+            for fd in child_fds:
+                send_handle(self._conn, fd, self.process.pid)
+            return self._conn.recv()
+
+    def run(self, path: str, input: bytes = b"", timeout: float = 2.0) -> RunResult:
+        """Blocking equivalent of subprocess.run([python, path], input=input, timeout=timeout)."""
+        stdin_r, stdin_w = os.pipe()
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        status_r, status_w = os.pipe()
+        try:
+            pid = self._fork(path, (stdin_r, stdout_w, stderr_w, status_w))
+        finally:
+            for fd in (stdin_r, stdout_w, stderr_w, status_w):
+                os.close(fd)
+
+        outputs, timed_out = _exchange(stdin_w, (stdout_r, stderr_r, status_r), input, timeout)
+        if timed_out:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+        cpu_time, max_rss_kb = 0.0, 0
+        if timed_out:
+            returncode = -9
+        else:
+            status = outputs[status_r].decode().split()
+            returncode = int(status[0]) if status else -1
+            if len(status) == 3:
+                cpu_time, max_rss_kb = float(status[1]), int(status[2])
+        return RunResult(returncode, outputs[stdout_r], outputs[stderr_r], timed_out, cpu_time, max_rss_kb)
+
+    def close(self):
+        try:
+            with self._lock:
+                self._conn.send(("stop",))
+        except (BrokenPipeError, OSError):
+            pass
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+_zygote: Optional[Zygote] = None
+_zygote_failed = False
+_zygote_lock = threading.Lock()
+
+def _forget_zygote_after_fork():
+    # A forked process (e.g. a batch backtest worker) must not share the parent's zygote connection
+    global _zygote, _zygote_lock
+    _zygote = None
+    _zygote_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_zygote_after_fork)
+
+def get_zygote() -> Optional[Zygote]:
+    """
+    Shared zygote, started lazily. Returns None when disabled (AGENT_ZYGOTE=0),
+    unsupported (no fork) or failed to start, in which case callers spawn `python` as before.
+    """
+    global _zygote, _zygote_failed
+    if _zygote_failed or os.getenv("AGENT_ZYGOTE", "1") == "0" or not hasattr(os, "fork"):
+        return None
+    with _zygote_lock:
+        if _zygote is not None and not _zygote.is_alive():
+            logger.warning("Zygote exited, restarting.")
+            _zygote = None
+        if _zygote is None:
+            try:
+                _zygote = Zygote()
+            except Exception as e:
+                logger.error(f"Zygote unavailable, falling back to subprocess: {e}")
+                _zygote_failed = True
+                return None
+    return _zygote
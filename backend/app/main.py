@@ -3,7 +3,7 @@ import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 from app.db.session import engine, DATABASE_URL
 from app.db import models
-from app.api import agent, leaderboard, evolution, social, tournament, arena, auth, competitions
+from app.api import agent, leaderboard, evolution, social, tournament, arena, auth, competitions, telemetry
 
 models.Base.metadata.create_all(bind=engine)
 
@@ -13,6 +13,8 @@ from contextlib import asynccontextmanager
 import asyncio
 import logging
 from app.engine.scheduler import CompetitionScheduler
+from app.engine.lineage import rebuild_ancestry
+from app.db.session import SessionLocal
 
 # Configure Logging
 logging.basicConfig(
@@ -35,7 +37,18 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"DB Connection FAILED: {e}")
 
-    # 2. Start Scheduler
+    # 2. Backfill the lineage closure for lineage recorded before it existed
+    try:
+        db = SessionLocal()
+        try:
+            if db.query(models.AgentLineage.agent_id).first() and not db.query(models.AgentAncestry.depth).first():
+                logger.info(f"Lineage closure rebuilt: {rebuild_ancestry(db)} rows")
+        finally:
+            db.close()
+    except Exception as e:
+        logger.error(f"Lineage closure backfill FAILED: {e}")
+
+    # 3. Start Scheduler
     scheduler = CompetitionScheduler()
     asyncio.create_task(scheduler.run_forever())
     logger.info("Competition Scheduler task initiated")
@@ -61,6 +74,7 @@ app.include_router(evolution.router, prefix="/api/evolution", tags=["evolution"]
 app.include_router(social.router, prefix="/api/social", tags=["social"])
 app.include_router(arena.router, prefix="/api/arena", tags=["arena"])
 app.include_router(tournament.router, prefix="/api/tournament", tags=["tournament"])
+app.include_router(telemetry.router, prefix="/api/telemetry", tags=["telemetry"])
 
 @app.get("/")
 async def root():
@@ -1,39 +1,82 @@
 import asyncio
+import datetime
 import time
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.db.session import SessionLocal
 from app.db import models
+from app.engine.evolution import EvolutionEngine
 from app.engine.mutation import MutationEngine
 import random
 
+GENERATION_SIZE = 200
+POPULATION_SIZE = 20
+EVOLUTION_INTERVAL = 3600 # seconds between genetic evolution runs
+MUTATION_COOLDOWN = 24 * 3600 # seconds before a struggling agent that already has a mutated child is mutated again
+MAX_MUTATIONS_PER_HOUR = 50 # new agents the struggling-agent pass may create per hour
+
+def _mutation_budget(db: Session) -> int:
+    """New mutated agents still allowed this hour."""
+    since = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+    created = db.query(func.count(models.AgentLineage.agent_id))\
+        .filter(models.AgentLineage.origin == "mutation", models.AgentLineage.created_at >= since)\
+        .scalar()
+    return max(0, MAX_MUTATIONS_PER_HOUR - (created or 0))
+
+def _recently_mutated(db: Session, agent_ids: list) -> set:
+    """Agents with a mutated child born within MUTATION_COOLDOWN."""
+    since = datetime.datetime.utcnow() - datetime.timedelta(seconds=MUTATION_COOLDOWN)
+    rows = db.query(models.AgentLineage.parent_agent_id)\
+        .filter(models.AgentLineage.parent_agent_id.in_(agent_ids), models.AgentLineage.origin == "mutation",
+                models.AgentLineage.created_at >= since)\
+        .distinct().all()
+    return {str(parent_id) for (parent_id,) in rows}
+
 async def evolution_loop():
     """
     Automated worker that:
     1. Identifies top performing agents.
-    2. Forks them to create new variants.
-    3. Identifies struggling agents and 'mutates' them.
+    2. Evolves them (hourly): backtested fitness, tournament selection, mutated children.
+    3. Identifies struggling agents and 'mutates' them, a whole generation concurrently. An agent is mutated
+       at most once per MUTATION_COOLDOWN, and the pass creates at most MAX_MUTATIONS_PER_HOUR agents.
     """
     print("Evolution Worker started.")
+    mutation_engine = None
+    last_evolution = 0.0
     while True:
         db = SessionLocal()
         try:
-            # 1. Identify top performing agents (by TrustScore)
-            top_agents = db.query(models.Agent).order_by(models.Agent.trust_score.desc()).limit(2).all()
-            for agent in top_agents:
-                if random.random() < 0.2: # 20% chance to fork top performer
-                    print(f"Auto-Evolution: Forking top performer {agent.agent_id}")
-                    # Logic to trigger fork
-                    pass
+            ranked = db.query(models.Agent)\
+                .join(models.AgentReputation, models.AgentReputation.agent_id == models.Agent.id)\
+                .filter(models.Agent.is_active == True)
+
+            # The engine (and its LLM response cache) outlives the per-pass session
+            if mutation_engine is None:
+                mutation_engine = MutationEngine(db)
+            mutation_engine.db = db
+
+            # 1. Identify top performing agents (by TrustScore) and evolve them
+            if time.time() - last_evolution >= EVOLUTION_INTERVAL:
+                last_evolution = time.time()
+                top_agents = ranked.order_by(models.AgentReputation.trust_score.desc()).limit(POPULATION_SIZE).all()
+                if len(top_agents) >= 2:
+                    print(f"Auto-Evolution: Evolving {len(top_agents)} top performers")
+                    evolution = EvolutionEngine(db, mutation_engine, population_size=POPULATION_SIZE)
+                    final = await evolution.run([str(a.id) for a in top_agents], generations=1)
+                    print(f"Auto-Evolution: best variant {final[0]} ({evolution.fitness[final[0]].mean_return:.2f}%)")
 
             # 2. Identify stagnant/struggling agents
-            struggling = db.query(models.Agent).filter(models.Agent.trust_score < 0.4).limit(2).all()
-            mutation_engine = MutationEngine(db)
-            for agent in struggling:
-                if random.random() < 0.5: # 50% chance to mutate
-                    print(f"Auto-Evolution: Mutating struggling agent {agent.agent_id}")
-                    # Mocking an LLM refinement
-                    mutated_code = "# Auto-generated mutation\n# Goal: Stability improvement\n"
-                    mutation_engine.apply_mutation(agent.agent_id, "system_evolution", mutated_code)
+            struggling = ranked.filter(models.AgentReputation.trust_score < 0.4).limit(GENERATION_SIZE).all()
+            cooling = _recently_mutated(db, [a.id for a in struggling]) if struggling else set()
+            selected = [agent for agent in struggling
+                        if str(agent.id) not in cooling and random.random() < 0.5] # 50% chance to mutate
+            selected = selected[:_mutation_budget(db)]
+            if selected:
+                print(f"Auto-Evolution: Mutating {len(selected)} struggling agents")
+                start = time.time()
+                results = await mutation_engine.mutate_many([str(a.id) for a in selected], "system_evolution")
+                applied = sum(1 for new_agent, _ in results if new_agent is not None)
+                print(f"Auto-Evolution: {applied}/{len(selected)} mutations applied in {time.time() - start:.1f}s")
 
         except Exception as e:
             print(f"Evolution Worker Error: {e}")
@@ -1,29 +1,47 @@
+import sys
 import time
-from sqlalchemy.orm import Session
 from app.db.session import SessionLocal
-from app.engine.reputation import ReputationSystem
-from app.db import models
+from app.engine.reputation import IncrementalReputation, ReputationSystem
 
-def reputation_sync_loop():
+def reputation_sync_loop(interval: float = 10):
     """
     Background worker that updates agent TrustScores.
+    Only agents with new snapshots, new settlements or data ageing out of the window are recomputed.
     """
     print("Reputation Worker Started.")
+    reputation = IncrementalReputation()
     while True:
         db = SessionLocal()
         try:
-            agents = db.query(models.Agent).all()
-            rep_system = ReputationSystem(db)
-            for agent in agents:
-                new_score = rep_system.update_agent_reputation(agent.agent_id)
-                print(f"Updated {agent.agent_id} TrustScore: {new_score:.4f}")
+            updated = reputation.sync(db)
+            if updated:
+                print(f"Updated {updated} TrustScores")
         except Exception as e:
+            db.rollback()
+            # Rebuild from a full window scan on the next pass
+            reputation = IncrementalReputation()
             print(f"Reputation Worker Error: {e}")
         finally:
             db.close()
-        
+
         # Sync every 10 minutes in a real env, every 10s for demo
-        time.sleep(10)
+        time.sleep(interval)
+
+def recalibrate():
+    """
+    Full recompute of every agent's TrustScore in one pass (e.g. nightly from cron):
+    python -m app.tasks.reputation_worker --recalibrate
+    """
+    db = SessionLocal()
+    try:
+        start = time.time()
+        stats = ReputationSystem(db).recalibrate_all()
+        print(f"Recalibrated {len(stats)} TrustScores in {time.time() - start:.2f}s")
+    finally:
+        db.close()
 
 if __name__ == "__main__":
-    reputation_sync_loop()
+    if "--recalibrate" in sys.argv:
+        recalibrate()
+    else:
+        reputation_sync_loop()
@@ -0,0 +1,37 @@
+import argparse
+import glob
+import os
+from app.engine.batch_runner import BatchBacktestRunner, BacktestJob, summarize_by_agent
+from app.engine.code_safety import analyze
+
+ENTRYPOINTS = {"decide", "on_tick"}
+
+def is_agent(path: str) -> bool:
+    """Only files defining an agent entrypoint are agents; helpers and scripts next to them are skipped."""
+    with open(path) as f:
+        return bool(analyze(f.read()).functions & ENTRYPOINTS)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run every agent against N seeded markets across all cores.")
+    parser.add_argument("--agents", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "../agents/*.py"))
+    parser.add_argument("--seeds", type=int, default=8)
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--model", default="gbm")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default=None, help="Optional CSV path for the per-job summary")
+    args = parser.parse_args()
+
+    paths = [p for p in sorted(glob.glob(args.agents)) if os.path.isfile(p) and is_agent(p)]
+    agents = [{"id": os.path.splitext(os.path.basename(p))[0], "path": p} for p in paths]
+    jobs = [
+        BacktestJob(f"backtest_seed_{seed}", agents, seed=seed, days=args.days, model=args.model)
+        for seed in range(args.seeds)
+    ]
+    print(f"Running {len(jobs)} backtests x {len(agents)} agents...")
+    summary = BatchBacktestRunner(max_workers=args.workers).run(jobs)
+    if args.out:
+        summary.to_csv(args.out, index=False)
+    print(summarize_by_agent(summary).to_string())
+
+if __name__ == "__main__":
+    main()
@@ -41,9 +41,8 @@ async def run_live_competition():
     agent_path = os.path.join(curr_dir, "../agents/trend_agent.py")
     
     agents = [{"id": agent_id, "path": agent_path}]
-    executor = LiveCompetitionExecutor(db, comp_id, agents)
-    
     data_service = LiveMarketDataService(["BTCUSDT"])
+    executor = LiveCompetitionExecutor(db, comp_id, agents, market_history=data_service.history)
     data_service.subscribe(executor.handle_tick)
     
     # 4. Start execution
@@ -78,12 +78,12 @@ async def run_test_competition():
     print(f"Using agent script: {agent_path}")
     
     agents = [{"id": agent_id, "path": agent_path}]
-    executor = LiveCompetitionExecutor(db, COMP_ID, agents)
+    data_service = LiveMarketDataService(["BTCUSDT"])
+    executor = LiveCompetitionExecutor(db, COMP_ID, agents, market_history=data_service.history)
     
     # Mock specific start method for executor if needed, 
     # but based on code, we just need to subscribe data service to it.
     
-    data_service = LiveMarketDataService(["BTCUSDT"])
     data_service.subscribe(executor.handle_tick)
     
     await executor.start()
@@ -0,0 +1,88 @@
+import asyncio
+import os
+import tempfile
+
+# Scratch database, so the bracket rows below never land in the dev database
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test_bracket.db")
+
+from app.db.session import SessionLocal, engine
+from app.db import models
+from app.engine.adversarial import AdversarialEngine
+from app.engine.bracket import BracketEngine, decision_snapshot, seed_pairs
+from app.engine.data_service import DataService
+from app.engine.settlement import decision_stake
+
+models.Base.metadata.create_all(bind=engine)
+
+def test_decision_stake():
+    assert decision_stake({"action": "OPEN_LONG", "stake": 500}, 10000) == ("LONG", 500.0)
+    assert decision_stake({"action": "BUY", "size": 0.1}, 10000) == ("LONG", 1000.0)
+    assert decision_stake({"action": "SELL", "size": 5}, 10000) == ("SHORT", 10000.0) # capped at 100% of equity
+    assert decision_stake({"action": "HOLD", "size": 0.5}, 10000) == ("HOLD", 0.0)
+    assert decision_stake({"action": "BUY", "size": "lots"}, 10000) == ("HOLD", 0.0)
+
+def test_order_style_decisions_score():
+    duel = AdversarialEngine(None)
+    # Price rises: the BUY beats the HOLD and the SELL, instead of all three tying at 0
+    buy, hold, sell = {"action": "BUY", "size": 0.1}, {"action": "HOLD"}, {"action": "SELL", "size": 0.1}
+    outcome = duel.evaluate_duel("hold", hold, "buy", buy, 100.0, 110.0, a_wins_ties=True)
+    assert outcome.winner_id == "buy" and abs(outcome.pnl_b - 100.0) < 1e-9
+    outcome = duel.evaluate_duel("buy", buy, "sell", sell, 100.0, 110.0)
+    assert outcome.winner_id == "buy" and outcome.pnl_differential > 0
+    # Equal PnL goes to A only when it wins ties
+    assert duel.evaluate_duel("a", hold, "b", hold, 100.0, 110.0, a_wins_ties=True).winner_id == "a"
+    assert duel.evaluate_duel("a", hold, "b", hold, 100.0, 110.0).winner_id == "b"
+
+def test_snapshot_has_spec_market():
+    tick, price_start, price_end = decision_snapshot(DataService(), "tournament-test-round-1", lookback=10, horizon=5)
+    assert tick["market"]["ohlcv"] and tick["market"]["price"] == price_start
+    assert tick["market_snapshot"]["ohlcv"] == tick["market"]["ohlcv"]
+    assert len(tick["market"]["ohlcv"]) == 10
+
+def test_seed_pairs():
+    assert seed_pairs(["s1", "s2", "s3", "s4"]) == [("s1", "s4"), ("s2", "s3")]
+    assert seed_pairs(["s1", "s2", "s3"]) == [("s1", None), ("s2", "s3")]
+
+def test_bracket_run():
+    db = SessionLocal()
+    try:
+        agents = [models.Agent(name=f"bracket_{name}_{os.getpid()}") for name in ("bull", "bear", "idle", "idle2")]
+        db.add_all(agents)
+        db.commit()
+        ids = [str(a.id) for a in agents]
+
+        async def decide(agent_id, tick):
+            kind = ids.index(agent_id)
+            return [{"action": "BUY", "size": 0.5}, {"action": "SELL", "size": 0.5},
+                    {"action": "HOLD"}, {"action": "HOLD"}][kind]
+
+        tournament = models.Tournament(name="bracket test", status="SCHEDULED")
+        db.add(tournament)
+        db.commit()
+        champion = asyncio.run(BracketEngine(db, decide).run(tournament, ids))
+        rows = db.query(models.TournamentBracket).filter(models.TournamentBracket.tournament_id == tournament.id).all()
+        assert tournament.status == "COMPLETED" and len(rows) == 3 and champion in ids
+
+        # Sized BUY/SELL orders are scored: a directional match is won by whoever called round one's move
+        tick, price_start, price_end = decision_snapshot(DataService(), f"tournament-{tournament.id}-round-1")
+        for row in rows:
+            pair = {str(row.agent_a_id), str(row.agent_b_id)}
+            if row.round == 1 and pair == set(ids[:2]) and price_end != price_start:
+                assert str(row.winner_id) == (ids[0] if price_end > price_start else ids[1])
+
+        try:
+            asyncio.run(BracketEngine(db, decide).run(tournament, ids))
+            assert False, "a finished tournament must not run again"
+        except ValueError:
+            pass
+        assert db.query(models.TournamentBracket).filter(models.TournamentBracket.tournament_id == tournament.id).count() == 3
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    test_decision_stake()
+    test_order_style_decisions_score()
+    test_snapshot_has_spec_market()
+    test_seed_pairs()
+    test_bracket_run()
+    print("Bracket checks passed.")
@@ -0,0 +1,75 @@
+from app.engine.code_safety import analyze
+
+# Each snippet reached a forbidden capability through an earlier version of the analyzer
+BYPASSES = {
+    "attrgetter_dunder": (
+        "import operator\n"
+        "def decide(context, market_data):\n"
+        "    f = lambda: 0\n"
+        "    return operator.attrgetter('__globals__')(f)['__builtins__']\n"
+    ),
+    "attrgetter_import_from": "from operator import attrgetter\n",
+    "methodcaller": "import operator\noperator.methodcaller('load')\n",
+    "parameter_shadows_builtin": (
+        "def _(eval, open):\n"
+        "    pass\n"
+        "def decide(context, market_data):\n"
+        "    return eval(\"__import__('os')\")\n"
+    ),
+    "module_level_conditional_shadow": "if False:\n    eval = None\neval('1')\n",
+    "comprehension_shadow": "x = [eval for eval in [1]]\ny = [eval('1') for _ in [1]]\n",
+    "lambda_shadow_same_line": "a, b = (lambda open: open, lambda: open('/etc/passwd'))\n",
+    "type_hints_evaluate_annotation": (
+        "import typing\n"
+        "def f(x: \"__import__('os').system('id')\"):\n"
+        "    pass\n"
+        "typing.get_type_hints(f)\n"
+    ),
+    "type_hints_import_from": "from typing import get_type_hints\n",
+    "singledispatch_annotations": "from functools import singledispatch\n",
+    "module_alias_rebound": "import numpy as np\nm = np\nm.load('x.npy')\n",
+    "module_alias_passed": "import numpy as np\ndef f(m):\n    return m.load('x.npy')\nf(np)\n",
+    "module_attribute_assignment": "import numpy as np\nnp.mean = print\n",
+    "private_module_member": "import numpy as np\nnp._core\n",
+    "generator_frame_globals": "g = (x for x in [1])\ng.gi_frame.f_globals\n",
+    "format_non_literal_template": "s = '{0.__globals__}'\ns.format(print)\n",
+    "format_literal_dunder": "'{0.__globals__}'.format(print)\n",
+    "dunder_string_lookup": "def f(d):\n    return d['__builtins__']\n",
+    "dataframe_writer": "import pandas as pd\npd.DataFrame().to_csv('x.csv')\n",
+    # Modules re-exported by allowed modules
+    "reexported_module": "import typing\ntyping.sys.modules['os'].system('id')\n",
+    "dataclasses_sys": "import dataclasses\ndataclasses.sys\n",
+    "dataclasses_inspect": "import dataclasses\ndataclasses.inspect\n",
+    "submodule_reexport": "import json\njson.decoder.sys\n",
+    "collections_sys": "import collections\ncollections.sys\n",
+    "numpy_os": "import numpy\nnumpy.os\n",
+    "reexported_module_import_from": "from typing import sys\n",
+    "submodule_import_from_reexport": "from json import decoder\ndecoder.sys\n",
+    "submodule_used_as_value": "import json\nd = json.decoder\nd.sys\n",
+    "denied_submodule_import_from": "from numpy.lib import format\n",
+}
+
+ALLOWED = {
+    "parameter_named_like_builtin": "def f(open):\n    return open + 1\n",
+    "closure_over_local": "def f():\n    open = print\n    def g():\n        return open(1)\n    return g\n",
+    "module_member_access": "import numpy as np\nimport sys\nx = np.mean([1, 2])\nsys.stdout.write(str(x))\n",
+    "literal_format": "'{} bars'.format(3)\n",
+    "main_guard": "if __name__ == '__main__':\n    print('ok')\n",
+    "package_submodule": "import numpy as np\nfrom collections import abc\nx = np.random.normal(0, 1)\nabc.Mapping\n",
+}
+
+def test_bypasses_rejected():
+    for name, code in BYPASSES.items():
+        report = analyze(code)
+        print(f"{name}: {report.message}")
+        assert not report.ok, name
+
+def test_safe_code_allowed():
+    for name, code in ALLOWED.items():
+        report = analyze(code)
+        assert report.ok, f"{name}: {report.message}"
+
+if __name__ == "__main__":
+    test_bypasses_rejected()
+    test_safe_code_allowed()
+    print("Code safety checks passed.")
@@ -0,0 +1,65 @@
+import itertools
+import numpy as np
+from app.engine.league import LeagueTable, round_robin_pairings, swiss_pairings
+
+def _meetings(n, rounds):
+    met, byes = {}, np.zeros(n, dtype=int)
+    for round_no in range(rounds):
+        a, b, bye = round_robin_pairings(n, round_no)
+        seated = np.concatenate((a, b, bye))
+        assert sorted(seated.tolist()) == list(range(n)), f"round {round_no} seats everyone once"
+        for pair in zip(a.tolist(), b.tolist()):
+            key = tuple(sorted(pair))
+            met[key] = met.get(key, 0) + 1
+        byes[bye] += 1
+    return met, byes
+
+def test_round_robin_even():
+    met, byes = _meetings(6, 5)
+    assert met == {pair: 1 for pair in itertools.combinations(range(6), 2)}
+    assert not byes.any()
+
+def test_round_robin_odd():
+    met, byes = _meetings(7, 7)
+    assert met == {pair: 1 for pair in itertools.combinations(range(7), 2)}
+    assert (byes == 1).all() # everyone sits out exactly once
+
+def test_swiss_avoids_rematches():
+    table = LeagueTable([f"agent_{i}" for i in range(8)])
+    for round_no in range(3):
+        a, b, bye = swiss_pairings(table)
+        assert len(bye) == 0 and len(a) == 4
+        assert not table.games[a, b].any(), f"round {round_no} has a rematch"
+        # Lower index always wins, so the standings stay in index order
+        pnl_a = np.where(a < b, 1.0, -1.0)
+        table.record_round(a, b, pnl_a, -pnl_a)
+    assert table.games.sum() == 3 * 8 and (table.games <= 1).all()
+    assert table.ranking()[0] == 0 and table.points[0] == 3
+
+def test_swiss_byes_rotate():
+    table = LeagueTable([f"agent_{i}" for i in range(5)])
+    sat_out = []
+    for _ in range(5):
+        a, b, bye = swiss_pairings(table)
+        assert len(bye) == 1 and len(a) == 2
+        assert table.byes[bye[0]] == table.byes.min()
+        sat_out.append(int(bye[0]))
+        table.record_byes(bye)
+        table.record_round(a, b, np.ones(len(a)), np.zeros(len(a)))
+    assert sorted(sat_out) == list(range(5)) # no second bye before everyone has had one
+
+def test_standings_tiebreaks():
+    table = LeagueTable(["a", "b", "c"])
+    table.record_round(np.array([0, 1]), np.array([1, 2]), np.array([5.0, 1.0]), np.array([1.0, 1.0]))
+    standings = table.standings()
+    assert list(standings["agent_id"]) == ["a", "b", "c"]
+    assert standings["points"].tolist() == [1.0, 0.5, 0.5]
+    assert standings.loc[1, "draws"] == 1 and standings.loc[0, "pnl_diff"] == 4.0
+
+if __name__ == "__main__":
+    test_round_robin_even()
+    test_round_robin_odd()
+    test_swiss_avoids_rematches()
+    test_swiss_byes_rotate()
+    test_standings_tiebreaks()
+    print("League pairing checks passed.")
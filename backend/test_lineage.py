@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+# Scratch database for the lineage rows below
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test_lineage.db")
+
+from app.db.session import SessionLocal, engine
+from app.db import models
+from app.engine.lineage import generation_of, rebuild_ancestry, record_birth
+
+models.Base.metadata.create_all(bind=engine)
+
+def _closure(db):
+    return {(str(a), str(d), depth) for a, d, depth in
+            db.query(models.AgentAncestry.ancestor_id, models.AgentAncestry.descendant_id, models.AgentAncestry.depth).all()}
+
+def test_closure_maintenance():
+    db = SessionLocal()
+    try:
+        legacy, root, child, grandchild, sibling = agents = [
+            models.Agent(name=f"lineage_{name}_{os.getpid()}") for name in ("legacy", "root", "child", "grandchild", "sibling")
+        ]
+        db.add_all(agents)
+        db.flush()
+        record_birth(db, root.id, None, "submission")
+        record_birth(db, child.id, root.id, "fork")
+        record_birth(db, grandchild.id, child.id, "mutation")
+        # A parent that predates lineage tracking gets its depth-0 node on first birth
+        record_birth(db, sibling.id, legacy.id, "fork")
+        db.commit()
+
+        ids = {agent: str(agent.id) for agent in agents}
+        expected = {(ids[a], ids[a], 0) for a in agents} | {
+            (ids[root], ids[child], 1), (ids[root], ids[grandchild], 2), (ids[child], ids[grandchild], 1),
+            (ids[legacy], ids[sibling], 1)
+        }
+        assert _closure(db) == expected
+        assert [generation_of(db, a.id) for a in (root, child, grandchild, sibling)] == [0, 1, 2, 1]
+
+        # Rebuilding from the parent links reproduces what the incremental inserts maintained
+        assert rebuild_ancestry(db) == len(expected)
+        assert _closure(db) == expected
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    test_closure_maintenance()
+    print("Lineage closure checks passed.")
@@ -0,0 +1,89 @@
+import datetime
+import os
+import tempfile
+import numpy as np
+
+# Scratch database for the rating rows below
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test_ratings.db")
+
+from app.db.session import SessionLocal, engine
+from app.db import models
+from app.engine.ratings import (DEFAULT_RD, RATING_PERIOD, RatingService, current_rd, glicko2_update,
+                                pool_games)
+
+models.Base.metadata.create_all(bind=engine)
+
+def test_glicko2_worked_example():
+    # Glickman's example: 1500/200 beats 1400/30, loses to 1550/100 and 1700/300 (tau = 0.5)
+    rating = np.array([1500.0, 1400.0, 1550.0, 1700.0])
+    rd = np.array([200.0, 30.0, 100.0, 300.0])
+    volatility = np.full(4, 0.06)
+    i, j, score = np.array([0, 0, 0]), np.array([1, 2, 3]), np.array([1.0, 0.0, 0.0])
+    new_rating, new_rd, new_vol = glicko2_update(rating, rd, volatility, i, j, score, tau=0.5)
+    print(f"Worked example: {new_rating[0]:.2f} / {new_rd[0]:.2f} / {new_vol[0]:.5f}")
+    assert abs(new_rating[0] - 1464.06) < 0.01
+    assert abs(new_rd[0] - 151.52) < 0.01
+    assert abs(new_vol[0] - 0.05999) < 1e-5
+    # Players without games keep their state
+    assert (new_rating[1:] == rating[1:]).all() and (new_rd[1:] == rd[1:]).all()
+
+def test_pool_games_weights():
+    i, j, score, weight = pool_games([3.0, 1.0, 1.0])
+    assert len(i) == 6 and np.allclose(weight, 0.5)
+    assert score[(i == 0) & (j == 1)][0] == 1.0 and score[(i == 1) & (j == 2)][0] == 0.5
+
+def test_rd_grows_while_idle():
+    now = datetime.datetime(2026, 1, 31)
+    assert current_rd(50.0, 0.06, now, now) == 50.0
+    assert current_rd(50.0, 0.06, now - datetime.timedelta(seconds=RATING_PERIOD - 1), now) == 50.0
+    month = current_rd(50.0, 0.06, now - datetime.timedelta(days=30), now)
+    assert 50.0 < month < DEFAULT_RD
+    assert current_rd(50.0, 0.06, now - datetime.timedelta(days=100000), now) == DEFAULT_RD
+
+def test_idle_rd_applies_on_write():
+    db = SessionLocal()
+    try:
+        agents = [models.Agent(name=f"rated_{name}_{os.getpid()}") for name in ("fresh", "stale", "rival")]
+        db.add_all(agents)
+        db.flush()
+        last_week = datetime.datetime.utcnow() - datetime.timedelta(days=7)
+        for agent, updated_at in zip(agents, (datetime.datetime.utcnow(), last_week, datetime.datetime.utcnow())):
+            db.add(models.AgentRating(agent_id=agent.id, rating=1500.0, rd=60.0, volatility=0.06, games=50,
+                                      updated_at=updated_at))
+        db.commit()
+        RatingService(db).record_competition([(agents[0].id, 1.0), (agents[1].id, 1.0), (agents[2].id, 0.0)])
+        db.commit()
+        fresh, stale = (db.query(models.AgentRating).filter(models.AgentRating.agent_id == a.id).one() for a in agents[:2])
+        # Same result from the same prior, but the week of inactivity left the stale agent less certain
+        assert stale.rd > fresh.rd and stale.rating > fresh.rating
+    finally:
+        db.close()
+
+def test_age_idle_keeps_current_rd():
+    db = SessionLocal()
+    try:
+        agent = models.Agent(name=f"rated_idle_{os.getpid()}")
+        db.add(agent)
+        db.flush()
+        now = datetime.datetime.utcnow()
+        updated_at = now - datetime.timedelta(days=3, hours=5)
+        row = models.AgentRating(agent_id=agent.id, rating=1500.0, rd=60.0, volatility=0.06, games=5, updated_at=updated_at)
+        db.add(row)
+        db.commit()
+        expected = current_rd(60.0, 0.06, updated_at, now)
+        assert RatingService(db).age_idle(now) >= 1
+        db.commit()
+        # Three whole periods folded in; the partial one is still pending
+        assert abs(row.rd - expected) < 1e-9 and row.updated_at == updated_at + datetime.timedelta(days=3)
+        assert abs(current_rd(row.rd, row.volatility, row.updated_at, now) - expected) < 1e-9
+        assert RatingService(db).age_idle(now) == 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    test_glicko2_worked_example()
+    test_pool_games_weights()
+    test_rd_grows_while_idle()
+    test_idle_rd_applies_on_write()
+    test_age_idle_keeps_current_rd()
+    print("Rating checks passed.")
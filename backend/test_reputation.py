@@ -0,0 +1,91 @@
+import datetime
+import os
+import tempfile
+import numpy as np
+
+# Scratch database for the snapshot rows below
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test_reputation.db")
+
+from app.db.session import SessionLocal, engine
+from app.db import models
+from app.engine.reputation import IncrementalReputation, ReputationSystem
+
+models.Base.metadata.create_all(bind=engine)
+
+def _agents(db, prefix, n):
+    agents = [models.Agent(name=f"{prefix}_{i}_{os.getpid()}") for i in range(n)]
+    db.add_all(agents)
+    db.commit()
+    return [str(a.id) for a in agents]
+
+def _snapshot(rng, agent_id, at, snapshot_id=None):
+    return models.LeaderboardSnapshot(
+        id=snapshot_id, agent_id=agent_id, competition_id="reputation_test", snapshot_at=at,
+        pnl=None if rng.random() < 0.1 else float(rng.normal(0.05, 0.5)), sharpe=float(rng.normal(1.0, 1.0))
+    )
+
+def _stored_scores(db, agent_ids):
+    rows = db.query(models.AgentReputation.agent_id, models.AgentReputation.trust_score)\
+        .filter(models.AgentReputation.agent_id.in_(agent_ids)).all()
+    scores = {str(agent_id): score for agent_id, score in rows}
+    return np.array([scores.get(agent_id, 0.5) for agent_id in agent_ids])
+
+def test_incremental_sync_matches_full_recalibration():
+    db = SessionLocal()
+    try:
+        rng = np.random.default_rng(7)
+        agent_ids = _agents(db, "incremental", 6)
+        incremental = IncrementalReputation(overlap=50)
+        now = datetime.datetime(2026, 3, 1, 12)
+        next_id = (db.query(models.LeaderboardSnapshot.id).order_by(models.LeaderboardSnapshot.id.desc()).limit(1).scalar() or 0) + 1
+        gaps = []
+        for round_no in range(12):
+            snapshots = []
+            # Ids left open last round commit now, below the watermark (a late transaction)
+            for gap in gaps:
+                snapshots.append(_snapshot(rng, agent_ids[rng.integers(len(agent_ids) - 1)], now, gap))
+            gaps = []
+            for _ in range(rng.integers(0, 25)):
+                if rng.random() < 0.1:
+                    gaps.append(next_id)
+                    next_id += 1
+                # Up to 40 days back: some land outside the 30-day window from the start
+                at = now - datetime.timedelta(hours=float(rng.uniform(0, 40 * 24)))
+                snapshots.append(_snapshot(rng, agent_ids[rng.integers(len(agent_ids) - 1)], at, next_id))
+                next_id += 1
+            db.add_all(snapshots)
+            db.commit()
+
+            incremental.sync(db, now)
+            synced = _stored_scores(db, agent_ids)
+            full = ReputationSystem(db).recalibrate_all(now).set_index("agent_id").loc[agent_ids, "trust_score"].to_numpy()
+            assert np.allclose(synced, full), f"round {round_no}: {synced} != {full}"
+            # Jumps of up to a week, and one of three weeks, so buckets age out between syncs
+            now += datetime.timedelta(days=21 if round_no == 8 else int(rng.integers(0, 8)), hours=float(rng.uniform(0, 24)))
+        assert full[-1] == 0.5 # the last agent never gets snapshots
+    finally:
+        db.close()
+
+def test_recalibrate_all_matches_per_agent_scores():
+    db = SessionLocal()
+    try:
+        rng = np.random.default_rng(11)
+        agent_ids = _agents(db, "recalibrate", 5)
+        now = datetime.datetime.utcnow()
+        db.add_all(
+            _snapshot(rng, agent_ids[rng.integers(len(agent_ids) - 1)], now - datetime.timedelta(hours=float(rng.uniform(0, 45 * 24))))
+            for _ in range(200)
+        )
+        db.commit()
+        reputation = ReputationSystem(db)
+        full = reputation.recalibrate_all(now).set_index("agent_id").loc[agent_ids, "trust_score"].to_numpy()
+        per_agent = np.array([reputation.calculate_trust_score(agent_id) for agent_id in agent_ids])
+        assert np.allclose(full, per_agent), f"{full} != {per_agent}"
+        assert per_agent[-1] == 0.5
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    test_incremental_sync_matches_full_recalibration()
+    test_recalibrate_all_matches_per_agent_scores()
+    print("Reputation checks passed.")
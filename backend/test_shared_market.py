@@ -0,0 +1,73 @@
+import asyncio
+import os
+import tempfile
+import numpy as np
+
+# Scratch database for the runtime rows below
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test_shared_market.db")
+
+from app.db.session import SessionLocal, engine
+from app.db import models
+from app.engine.data_service import DataService
+from app.engine.executor import CompetitionExecutor
+from app.engine.manifest_v1 import AgentManifest, runtime_options, save_runtime
+from app.engine.shared_market import SharedMarketBuffer, attach
+
+models.Base.metadata.create_all(bind=engine)
+
+# Reports through `reason` how many rows of the mapped history it could read at this tick
+PEEKING_AGENT = """
+import json, sys
+import numpy as np
+tick = json.loads(sys.stdin.readline())
+d = tick["market"]["shm"]
+rows = np.memmap(d["path"], dtype=d["dtype"], mode="r", shape=tuple(d["shape"]))
+readable = int(np.isfinite(rows[:, 4]).sum())
+print(json.dumps({"action": "HOLD", "size": 0, "reason": f"{tick['market']['step']}:{readable}"}))
+"""
+
+def test_buffer_reveals_rows_by_step():
+    market = DataService().generate_mock_data(days=1, interval="1h", seed=3)
+    with SharedMarketBuffer(market, visible=0) as buf:
+        rows = attach(buf.descriptor)
+        assert np.isnan(rows).all()
+        buf.publish(4)
+        assert np.isfinite(rows[:5]).all() and np.isnan(rows[5:]).all()
+        assert rows[4, 4] == market["close"].iloc[4]
+        buf.publish(2) # never hides rows again
+        assert np.isfinite(rows[:5]).all()
+    with SharedMarketBuffer(market) as buf:
+        assert np.isfinite(attach(buf.descriptor)).all() # platform-internal buffers are complete up front
+
+def test_agent_never_sees_future_rows():
+    market = DataService().generate_mock_data(days=1, interval="1h", seed=3).iloc[:6]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "peek.py")
+        with open(path, "w") as f:
+            f.write(PEEKING_AGENT)
+        executor = CompetitionExecutor(None, "shm_step_bounds", market, [{"id": "peek", "path": path, "shared_memory": True}])
+        seen = []
+        executor._process_decision = lambda agent_id, decision, price: seen.append(decision.get("reason"))
+        asyncio.run(executor.run())
+    assert seen == [f"{step}:{step + 1}" for step in range(len(market))], seen
+
+def test_manifest_capability_enables_shared_memory():
+    db = SessionLocal()
+    try:
+        base = {"agent_name": "a", "author": "b", "description": "c"}
+        shm, plain = models.Agent(name=f"shm_{os.getpid()}"), models.Agent(name=f"plain_{os.getpid()}")
+        db.add_all([shm, plain])
+        db.flush()
+        save_runtime(db, shm.id, AgentManifest(**base, capabilities={"market_data": ["OHLCV", "OHLCV_SHM"]}))
+        save_runtime(db, plain.id, AgentManifest(**base))
+        db.commit()
+        options = runtime_options(db, [shm.id, plain.id])
+        assert options[str(shm.id)]["shared_memory"] and not options[str(plain.id)]["shared_memory"]
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    test_buffer_reveals_rows_by_step()
+    test_agent_never_sees_future_rows()
+    test_manifest_capability_enables_shared_memory()
+    print("Shared market checks passed.")